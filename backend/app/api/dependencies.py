@@ -1,16 +1,18 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from mysql.connector import MySQLConnection
-from ..core.database import get_db
+from ..core.async_database import AsyncConnection, ThreadedConnection, get_async_db, get_async_read_db
+from ..core.config import settings
+from ..core.database import get_read_db
+from ..core.idempotency import IdempotencyClaim, key_hash, request_hash
 from ..core.security import decode_access_token
-from ..models.user import get_user_by_id
+from ..models.user import principal_changed_since
+from ..models.aio.user import get_user_principal
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    conn: MySQLConnection = Depends(get_db)
-):
+async def _authenticate(credentials: HTTPAuthorizationCredentials, conn: AsyncConnection):
     token = credentials.credentials
     payload = decode_access_token(token)
     if payload is None:
@@ -23,7 +25,22 @@ async def get_current_user(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    user = get_user_by_id(conn, int(user_id))
+    user_id = int(user_id)
+    # Roles signed into the token: no lookup unless an admin changed the
+    # user after the token was issued.
+    if (settings.JWT_EMBED_ROLES and "roles" in payload
+            and not principal_changed_since(user_id, payload.get("iat", 0))):
+        return {
+            "id": user_id,
+            "username": payload.get("username"),
+            "email": payload.get("email"),
+            "is_active": True,
+            "roles": payload["roles"],
+        }
+
+    # Cached principal; on a miss the lookup is awaited on the async driver
+    # (or offloaded to the worker pool when DB_ASYNC is off).
+    user = await get_user_principal(conn, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     if not user["is_active"]:
@@ -31,9 +48,61 @@ async def get_current_user(
     
     return user
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn: AsyncConnection = Depends(get_async_db)
+):
+    return await _authenticate(credentials, conn)
+
+async def get_current_reader(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn: AsyncConnection = Depends(get_async_read_db)
+):
+    """get_current_user for read-only routes: looks the user up on the request's
+    read connection, so replica-backed routes hold no primary connection."""
+    return await _authenticate(credentials, conn)
+
+async def get_current_sync_reader(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn: MySQLConnection = Depends(get_read_db)
+):
+    """get_current_reader for sync routes on get_read_db (reports, exports):
+    looks the user up on the route's own connection, so the request holds
+    that single connection and no other, with or without DB_ASYNC."""
+    return await _authenticate(credentials, ThreadedConnection(conn))
+
 async def get_current_active_manager(current_user = Depends(get_current_user)):
     roles = current_user.get("roles", "")
     print(f"🔍 DEBUG - User {current_user['username']} has roles: '{roles}'")  
     if "manager" not in roles and "admin" not in roles:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return current_user
\ No newline at end of file
+    return current_user
+
+def idempotent_write(status_code: int = 200, response_model=None):
+    """Dependency: honour an Idempotency-Key header on a write route.
+
+    Yields an IdempotencyClaim; the route returns `await claim.complete(result)`.
+    A retry of a completed request is answered with the stored response
+    (see IdempotentReplay in app.main). Declare it after the auth
+    dependency so permission errors are not stored.
+    """
+    async def claim_key(
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+        current_user = Depends(get_current_user),
+        conn: AsyncConnection = Depends(get_async_db)
+    ):
+        if not idempotency_key:
+            yield IdempotencyClaim(conn)
+            return
+        fingerprint = request_hash(request.method, request.url.path, await request.body())
+        claim = await IdempotencyClaim.claim(
+            conn, key_hash(current_user["id"], idempotency_key), fingerprint,
+            status_code=status_code, response_model=response_model,
+        )
+        try:
+            yield claim
+        finally:
+            # Not completed (the route raised): free the key for a retry.
+            await claim.release()
+    return claim_key
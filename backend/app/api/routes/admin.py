@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from mysql.connector import MySQLConnection
 from typing import List, Optional
 from datetime import datetime, date 
@@ -11,9 +11,16 @@ from ...schemas.admin import (
 from ...schemas.product import CategoryResponse, CategoryCreate
 from ...schemas.inventory import MovementTypeResponse
 from ...models import admin as admin_model
+from ...models import integration as integration_model
+from ...models.user import user_cache
 from ...models import product as product_model
 from ...models import stock_movement as movement_model
-from ...core.database import get_db
+from ...core.database import get_db, get_pool, get_replica_pool, replica_monitor
+from ...core.async_database import async_pool_stats, async_replica_pool_stats
+from ...core.etag import bump_table_version, conditional_get, table_versions
+from ...core.pagination import set_next_cursor
+from ...core.retry import retry_metrics
+from ...core.unit_of_work import UnitOfWorkRoute, on_commit
 from ...api.dependencies import get_current_active_manager  # managers can also access admin? We'll use admin-only for now, but you can change.
 
 # For stricter admin-only, define:
@@ -23,7 +30,7 @@ async def get_current_admin(current_user = Depends(get_current_active_manager)):
         raise HTTPException(status_code=403, detail="Admin privileges required")
     return current_user
 
-router = APIRouter(prefix="/admin", tags=["Admin"])
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=UnitOfWorkRoute)
 
 # ---------- User Management ----------
 @router.get("/users", response_model=List[UserAdminResponse])
@@ -92,7 +99,8 @@ def delete_user(
 @router.get("/settings", response_model=List[SettingResponse])
 def get_settings(
     conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_admin)
+    current_user = Depends(get_current_admin),
+    etag = Depends(conditional_get("system_settings"))
 ):
     return admin_model.get_all_settings(conn)
 
@@ -186,8 +194,11 @@ def update_category(
     cursor = conn.cursor()
     cursor.execute("UPDATE categories SET name=%s, description=%s WHERE id=%s",
                    (category.name, category.description, category_id))
+    bump_table_version(conn, "categories")
     conn.commit()
+    on_commit(conn, table_versions.invalidate, "categories")
     cursor.close()
+    on_commit(conn, product_model.product_cache.clear)  # cached product rows carry category_name
     return product_model.get_category_by_id(conn, category_id)
 
 @router.delete("/categories/{category_id}", status_code=204)
@@ -203,8 +214,10 @@ def delete_category(
     if count > 0:
         raise HTTPException(status_code=400, detail="Cannot delete category with existing products")
     cursor.execute("DELETE FROM categories WHERE id = %s", (category_id,))
-    conn.commit()
     affected = cursor.rowcount
+    bump_table_version(conn, "categories")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "categories")
     cursor.close()
     if not affected:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -217,7 +230,7 @@ def get_movement_types(
     current_user = Depends(get_current_admin)
 ):
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, name, description, sign FROM movement_types ORDER BY name")
+    cursor.execute(movement_model.MOVEMENT_TYPES_SELECT + " ORDER BY name")
     types = cursor.fetchall()
     cursor.close()
     return types
@@ -231,11 +244,13 @@ def create_movement_type(
     cursor = conn.cursor()
     cursor.execute("INSERT INTO movement_types (name, description, sign) VALUES (%s, %s, %s)",
                    (mt.name, mt.description, mt.sign))
-    conn.commit()
     type_id = cursor.lastrowid
+    bump_table_version(conn, "movement_types")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "movement_types")
     cursor.close()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, name, description, sign FROM movement_types WHERE id = %s", (type_id,))
+    cursor.execute(movement_model.MOVEMENT_TYPES_SELECT + " WHERE id = %s", (type_id,))
     result = cursor.fetchone()
     cursor.close()
     return result
@@ -250,13 +265,15 @@ def update_movement_type(
     cursor = conn.cursor()
     cursor.execute("UPDATE movement_types SET name=%s, description=%s, sign=%s WHERE id=%s",
                    (mt.name, mt.description, mt.sign, type_id))
-    conn.commit()
     affected = cursor.rowcount
+    bump_table_version(conn, "movement_types")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "movement_types")
     cursor.close()
     if not affected:
         raise HTTPException(status_code=404, detail="Movement type not found")
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, name, description, sign FROM movement_types WHERE id = %s", (type_id,))
+    cursor.execute(movement_model.MOVEMENT_TYPES_SELECT + " WHERE id = %s", (type_id,))
     result = cursor.fetchone()
     cursor.close()
     return result
@@ -274,16 +291,51 @@ def delete_movement_type(
     if count > 0:
         raise HTTPException(status_code=400, detail="Cannot delete movement type with existing movements")
     cursor.execute("DELETE FROM movement_types WHERE id = %s", (type_id,))
-    conn.commit()
     affected = cursor.rowcount
+    bump_table_version(conn, "movement_types")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "movement_types")
     cursor.close()
     if not affected:
         raise HTTPException(status_code=404, detail="Movement type not found")
     return None
 
+# ---------- Database Pool ----------
+@router.get("/db/pool-stats")
+def get_pool_stats(current_user = Depends(get_current_admin)):
+    """Live connection pool stats: checkouts, waits, wait-time histogram, exhaustion, recycles."""
+    replica = get_replica_pool()
+    return {
+        "primary": get_pool().stats(),
+        "async": async_pool_stats(),
+        "replica": replica.stats() if replica else None,
+        "async_replica": async_replica_pool_stats(),
+        "replica_health": replica_monitor.stats()
+    }
+
+@router.get("/db/retry-stats")
+def get_retry_stats(current_user = Depends(get_current_admin)):
+    """Deadlocks / lock wait timeouts per write operation, and how their retries went."""
+    return retry_metrics.snapshot()
+
+# ---------- Caches ----------
+@router.get("/cache/stats")
+def get_cache_stats(current_user = Depends(get_current_admin)):
+    """Hit/miss counters of the in-process caches."""
+    return {
+        "products": product_model.product_cache.stats(),
+        "users": user_cache.stats(),
+        "api_keys": {
+            **integration_model.api_key_cache.stats(),
+            "usage_pending": integration_model.api_key_usage.pending(),
+            "usage_flushed": integration_model.api_key_usage.flushed
+        }
+    }
+
 # ---------- Audit Log ----------
 @router.get("/audit-logs", response_model=List[AuditLogEntry])
 def get_audit_logs(
+    response: Response,
     table_name: Optional[str] = None,
     user_id: Optional[int] = None,
     from_date: Optional[datetime] = None,
@@ -291,7 +343,13 @@ def get_audit_logs(
     operation: Optional[str] = None,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     conn: MySQLConnection = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
-    return admin_model.get_audit_logs(conn, table_name, user_id, from_date, to_date, operation, limit, offset)
\ No newline at end of file
+    keyset = admin_model.AUDIT_KEYSET
+    logs = admin_model.get_audit_logs(
+        conn, table_name, user_id, from_date, to_date, operation, limit, offset, keyset.decode(cursor)
+    )
+    set_next_cursor(response, keyset.next_cursor(logs, limit))
+    return logs
\ No newline at end of file
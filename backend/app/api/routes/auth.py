@@ -7,9 +7,10 @@ from ...models.user import create_user, get_user_by_username, get_user_by_id
 from ...core.database import get_db
 from ...core.security import verify_password, create_access_token
 from ...core.config import settings
+from ...core.unit_of_work import UnitOfWorkRoute
 from ...api.dependencies import get_current_user
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=UnitOfWorkRoute)
 
 @router.post("/register", response_model=UserResponse)
 def register(user: UserCreate, conn: MySQLConnection = Depends(get_db)):
@@ -30,8 +31,14 @@ def login(user_data: UserLogin, conn: MySQLConnection = Depends(get_db)):
     if not user or not verify_password(user_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     
+    claims = {"sub": str(user["id"])}
+    if settings.JWT_EMBED_ROLES:
+        # The token alone will authorize requests, so never issue one to an inactive user.
+        if not user["is_active"]:
+            raise HTTPException(status_code=401, detail="Inactive user")
+        claims.update(username=user["username"], email=user["email"], roles=user["roles"] or "")
     access_token = create_access_token(
-        data={"sub": str(user["id"])},
+        data=claims,
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return Token(access_token=access_token)
@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends, Query
-from mysql.connector import MySQLConnection
 from datetime import date
 from typing import List, Optional
 
@@ -10,57 +9,58 @@ from ...schemas.dashboard import (
     ProductPerformance,
     DashboardSummary
 )
-from ...models import dashboard as dashboard_model
-from ...core.database import get_db
-from ...api.dependencies import get_current_user
+from ...models.aio import dashboard as dashboard_model
+from ...core.async_database import AsyncConnection, get_async_read_db
+from ...api.dependencies import get_current_reader
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 @router.get("/low-stock", response_model=List[LowStockAlert])
-def get_low_stock_alerts(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)  # any authenticated user, but UI will hide for clerk
+async def get_low_stock_alerts(
+    conn: AsyncConnection = Depends(get_async_read_db),
+    current_user = Depends(get_current_reader)  # any authenticated user, but UI will hide for clerk
 ):
     """Get all products with stock below reorder threshold."""
-    return dashboard_model.get_low_stock_alerts(conn)
+    return await dashboard_model.get_low_stock_alerts(conn)
 
 @router.get("/daily-sales", response_model=Optional[DailySalesSummary])
-def get_daily_sales(
+async def get_daily_sales(
     transaction_date: date = Query(default_factory=lambda: date.today()),
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: AsyncConnection = Depends(get_async_read_db),
+    current_user = Depends(get_current_reader)
 ):
     """Get sales summary for a specific date."""
-    return dashboard_model.get_daily_sales_summary(conn, transaction_date)
+    return await dashboard_model.get_daily_sales_summary(conn, transaction_date)
 
 @router.get("/inventory", response_model=List[CurrentInventoryItem])
-def get_current_inventory(
+async def get_current_inventory(
     active_only: bool = True,
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: AsyncConnection = Depends(get_async_read_db),
+    current_user = Depends(get_current_reader)
 ):
     """Get current inventory snapshot."""
-    return dashboard_model.get_current_inventory(conn, active_only)
+    return await dashboard_model.get_current_inventory(conn, active_only)
 
 @router.get("/product-performance", response_model=List[ProductPerformance])
-def get_product_performance(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_product_performance(
+    conn: AsyncConnection = Depends(get_async_read_db),
+    current_user = Depends(get_current_reader)
 ):
     """Get product sales performance for last 30 days."""
-    return dashboard_model.get_product_performance(conn)
+    return await dashboard_model.get_product_performance(conn)
 
 @router.get("/summary", response_model=DashboardSummary)
-def get_dashboard_summary(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_dashboard_summary(
+    conn: AsyncConnection = Depends(get_async_read_db),
+    current_user = Depends(get_current_reader)
 ):
     """Get summary metrics for the dashboard."""
     today = date.today()
+    counts = await dashboard_model.get_summary_counts(conn)
     return {
-        "total_products": dashboard_model.get_total_products_count(conn),
-        "total_stock_value": dashboard_model.get_total_stock_value(conn),
-        "low_stock_count": dashboard_model.get_low_stock_count(conn),
-        "out_of_stock_count": dashboard_model.get_out_of_stock_count(conn),
-        "today_sales": dashboard_model.get_daily_sales_summary(conn, today)
+        "total_products": int(counts["total_products"]),
+        "total_stock_value": counts["total_stock_value"],
+        "low_stock_count": int(counts["low_stock_count"]),
+        "out_of_stock_count": int(counts["out_of_stock_count"]),
+        "today_sales": await dashboard_model.get_daily_sales_summary(conn, today)
     }
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Header
 from mysql.connector import MySQLConnection
 from typing import List, Optional
 
@@ -9,25 +9,30 @@ from ...schemas.integration import (
 from ...schemas.integration import IntegrationStatus
 from ...models import integration as integration_model
 from ...models import product, stock_movement, sale
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
+from ...core.async_database import ThreadedConnection
+from ...core.unit_of_work import UnitOfWorkRoute
+from ...models.aio import integration as aio_integration_model
 from ..dependencies import get_current_active_manager
 
-router = APIRouter(prefix="/intergration", tags=["intergration"])
+router = APIRouter(prefix="/intergration", tags=["intergration"], route_class=UnitOfWorkRoute)
 
 # ---------- Public API endpoints (authenticated by API key) ----------
-async def verify_api_key(
+async def verify_api_key_reader(
     x_api_key: str = Header(...),
-    conn: MySQLConnection = Depends(get_db)
+    conn: MySQLConnection = Depends(get_read_db)
 ):
-    key = integration_model.validate_api_key(conn, x_api_key)
+    """Checks the key on the public route's own get_read_db connection, so a
+    replica read holds no primary connection (cf. get_current_sync_reader)."""
+    key = await aio_integration_model.validate_api_key(ThreadedConnection(conn), x_api_key)
     if not key:
         raise HTTPException(status_code=401, detail="Invalid or expired API key")
     return key
 
 @router.get("/public/products")
 def public_get_products(
-    api_key: dict = Depends(verify_api_key),
-    conn: MySQLConnection = Depends(get_db)
+    api_key: dict = Depends(verify_api_key_reader),
+    conn: MySQLConnection = Depends(get_read_db)
 ):
     """Public API endpoint to fetch all products (active)."""
     return product.get_all_products(conn, active_only=True)
@@ -35,8 +40,8 @@ def public_get_products(
 @router.get("/public/stock/{sku}")
 def public_get_stock(
     sku: str,
-    api_key: dict = Depends(verify_api_key),
-    conn: MySQLConnection = Depends(get_db)
+    api_key: dict = Depends(verify_api_key_reader),
+    conn: MySQLConnection = Depends(get_read_db)
 ):
     """Public API endpoint to get current stock for a product."""
     prod = product.get_product_by_sku(conn, sku)
@@ -47,11 +52,12 @@ def public_get_stock(
 @router.get("/public/sales/recent")
 def public_get_recent_sales(
     limit: int = 10,
-    api_key: dict = Depends(verify_api_key),
-    conn: MySQLConnection = Depends(get_db)
+    items: str = Query(sale.ITEMS_NONE, pattern="^(full|count|none)$"),
+    api_key: dict = Depends(verify_api_key_reader),
+    conn: MySQLConnection = Depends(get_read_db)
 ):
-    """Public API endpoint to get recent sales."""
-    return sale.get_transactions(conn, limit=limit)
+    """Public API endpoint to get recent sales (line items in one batched query)."""
+    return sale.load_transaction_items(conn, sale.get_transactions(conn, limit=limit), items)
 
 # ---------- Admin endpoints for managing intergration (manager/admin only) ----------
 @router.get("/api-keys", response_model=List[ApiKeyResponse])
@@ -1,5 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from mysql.connector import MySQLConnection
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from typing import List, Optional
 
 from ...schemas.inventory import (
@@ -7,45 +6,53 @@ from ...schemas.inventory import (
     StockAdjustmentCreate,
     StockMovementResponse,
     MovementTypeResponse,
-    StockLevelResponse
+    StockLevelResponse,
+    StockEscrowUpdate,
+    StockEscrowResponse
 )
-from ...models import stock_movement as movement_model
-from ...models import product as product_model
-from ...core.database import get_db
-from ...api.dependencies import get_current_user, get_current_active_manager
+from ...models.aio import stock_movement as movement_model
+from ...models.aio import product as product_model
+from ...models.stock_movement import StockMovementRejected
+from ...core.async_database import AsyncConnection, get_async_db
+from ...core.etag import conditional_get
+from ...core.pagination import set_next_cursor
+from ...core.retry import LockConflictError
+from ...core.unit_of_work import UnitOfWorkRoute
+from ...api.dependencies import get_current_user, get_current_active_manager, idempotent_write
 
-router = APIRouter(prefix="/inventory", tags=["Inventory"])
+router = APIRouter(prefix="/inventory", tags=["Inventory"], route_class=UnitOfWorkRoute)
 
 # ---------- PUBLIC (any authenticated user) ----------
 @router.get("/movement-types", response_model=List[MovementTypeResponse])
-def get_movement_types(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)  # any auth user
+async def get_movement_types(
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user),  # any auth user
+    etag = Depends(conditional_get("movement_types"))
 ):
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, name, description, sign FROM movement_types ORDER BY name")
-    types = cursor.fetchall()
-    cursor.close()
-    return types
+    return await movement_model.get_movement_types(conn)
 
 @router.get("/movements", response_model=List[StockMovementResponse])
-def get_movements(
+async def get_movements(
+    response: Response,
     product_sku: Optional[str] = None,
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
-    conn: MySQLConnection = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)  # any auth user
 ):
-    movements = movement_model.get_stock_movements(conn, product_sku, limit, offset)
+    keyset = movement_model.MOVEMENT_KEYSET
+    movements = await movement_model.get_stock_movements(conn, product_sku, limit, offset, keyset.decode(cursor))
+    set_next_cursor(response, keyset.next_cursor(movements, limit))
     return movements
 
 @router.get("/stock/{sku}", response_model=StockLevelResponse)
-def get_stock_level(
+async def get_stock_level(
     sku: str,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)  # any auth user
 ):
-    product = product_model.get_product_by_sku(conn, sku)
+    product = await product_model.get_product_by_sku(conn, sku)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     status_label = "Low Stock" if product["quantity_in_stock"] <= product["reorder_threshold"] else "OK"
@@ -59,65 +66,47 @@ def get_stock_level(
 
 # ---------- PROTECTED (manager/admin only) ----------
 @router.post("/receipt", status_code=status.HTTP_201_CREATED)
-def receive_stock(
+async def receive_stock(
     receipt: StockReceiptCreate,
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_active_manager)  # 🔒 MANAGER/ADMIN ONLY
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager),  # 🔒 MANAGER/ADMIN ONLY
+    idempotency = Depends(idempotent_write(status.HTTP_201_CREATED))
 ):
-    product = product_model.get_product_by_sku(conn, receipt.product_sku)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if not product["is_active"]:
-        raise HTTPException(status_code=400, detail="Cannot receive stock for inactive product")
-
+    # One procedure call validates, applies and logs the receipt
     try:
-        movement_id = movement_model.create_stock_receipt(
+        movement = await movement_model.create_stock_receipt(
             conn,
             receipt.product_sku,
             receipt.quantity,
             receipt.reference_id,
             current_user["id"]
         )
-        new_qty = movement_model.get_product_stock_level(conn, receipt.product_sku)
-        return {
-            "message": "Stock received successfully",
-            "movement_id": movement_id,
-            "new_quantity": new_qty
-        }
+    except StockMovementRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except LockConflictError:
+        raise    # 503, see main.py
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to record receipt: {str(e)}")
+    return await idempotency.complete({
+        "message": "Stock received successfully",
+        **movement
+    })
 
 @router.post("/adjust", status_code=status.HTTP_201_CREATED)
-def adjust_stock(
+async def adjust_stock(
     adjustment: StockAdjustmentCreate,
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_active_manager)  # 🔒 MANAGER/ADMIN ONLY
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager),  # 🔒 MANAGER/ADMIN ONLY
+    idempotency = Depends(idempotent_write(status.HTTP_201_CREATED))
 ):
-    product = product_model.get_product_by_sku(conn, adjustment.product_sku)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
     valid_types = ["adjustment", "damage", "return"]
     if adjustment.movement_type not in valid_types:
         raise HTTPException(status_code=400, detail=f"Movement type must be one of: {valid_types}")
 
-    # Check stock for decrease operations
-    movement_type_id = movement_model.get_movement_type_id(conn, adjustment.movement_type)
-    cursor = conn.cursor()
-    cursor.execute("SELECT sign FROM movement_types WHERE id = %s", (movement_type_id,))
-    sign = cursor.fetchone()[0]
-    cursor.close()
-
-    if sign == -1:
-        current_stock = movement_model.get_product_stock_level(conn, adjustment.product_sku)
-        if current_stock is not None and adjustment.quantity > current_stock:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock. Available: {current_stock}, tried to remove: {adjustment.quantity}"
-            )
-
+    # The procedure checks the product and, for removals, the stock in the
+    # same statement that changes it: no check-then-act window
     try:
-        movement_id = movement_model.create_stock_adjustment(
+        movement = await movement_model.create_stock_adjustment(
             conn,
             adjustment.product_sku,
             adjustment.quantity,
@@ -125,13 +114,43 @@ def adjust_stock(
             adjustment.reason,
             current_user["id"]
         )
-        new_qty = movement_model.get_product_stock_level(conn, adjustment.product_sku)
-        return {
-            "message": f"Stock {adjustment.movement_type} recorded successfully",
-            "movement_id": movement_id,
-            "new_quantity": new_qty
-        }
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    except StockMovementRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except LockConflictError:
+        raise    # 503, see main.py
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to record adjustment: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to record adjustment: {str(e)}")
+    return await idempotency.complete({
+        "message": f"Stock {adjustment.movement_type} recorded successfully",
+        **movement
+    })
+
+@router.get("/escrow", response_model=List[StockEscrowResponse])
+async def get_stock_escrow(
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager)  # 🔒 MANAGER/ADMIN ONLY
+):
+    """Hot SKUs selling from escrow slots, with their unconsolidated sales."""
+    return await movement_model.get_stock_escrow(conn)
+
+@router.put("/escrow/{sku}")
+async def set_stock_escrow(
+    sku: str,
+    escrow: StockEscrowUpdate,
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager)  # 🔒 MANAGER/ADMIN ONLY
+):
+    """Split a hot SKU's stock over escrow slots so concurrent sales don't queue
+    on its row lock (slots=0 returns the stock to the product row).
+
+    Its quantity_in_stock then trails sales by up to STOCK_ESCROW_CONSOLIDATE_SECONDS.
+    """
+    product = await product_model.get_product_by_sku(conn, sku)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    await movement_model.set_stock_escrow(conn, sku, escrow.slots)
+    return {
+        "message": f"Stock escrow {'enabled' if escrow.slots else 'disabled'} for {sku}",
+        "sku": sku,
+        "slots": escrow.slots
+    }
@@ -1,5 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from mysql.connector import MySQLConnection
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from typing import List, Optional
 
 from ...schemas.product import (
@@ -7,121 +6,224 @@ from ...schemas.product import (
     CategoryCreate, CategoryResponse,
     SupplierCreate, SupplierResponse
 )
-from ...models import product as product_model
-from ...core.database import get_db
+from ...schemas.catalog import (
+    BulkProductUpdate, BulkUpdateResult, CatalogSync, ProductImportResult, ProductSearchResult
+)
+from ...models.aio import product as product_model
+from ...core.async_database import AsyncConnection, get_async_db
+from ...core.config import settings
+from ...core.etag import conditional_get
+from ...core.pagination import set_next_cursor
+from ...core.streaming import detect_format, iter_records
+from ...core.unit_of_work import UnitOfWorkRoute
 from ...api.dependencies import get_current_user, get_current_active_manager
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], route_class=UnitOfWorkRoute)
 
 # -------------------- CATEGORY ENDPOINTS --------------------
 @router.get("/categories", response_model=List[CategoryResponse])
-def get_categories(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_categories(
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    etag = Depends(conditional_get("categories"))
 ):
-    return product_model.get_all_categories(conn)
+    return await product_model.get_all_categories(conn)
 
 @router.post("/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
-def create_category(
+async def create_category(
     category: CategoryCreate,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_active_manager)
 ):
-    category_id = product_model.create_category(conn, category.name, category.description)
-    return product_model.get_category_by_id(conn, category_id)
+    category_id = await product_model.create_category(conn, category.name, category.description)
+    return await product_model.get_category_by_id(conn, category_id)
 
 # -------------------- SUPPLIER ENDPOINTS --------------------
 @router.get("/suppliers", response_model=List[SupplierResponse])
-def get_suppliers(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+async def get_suppliers(
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    etag = Depends(conditional_get("suppliers"))
 ):
-    return product_model.get_all_suppliers(conn)
+    return await product_model.get_all_suppliers(conn)
 
 @router.post("/suppliers", response_model=SupplierResponse, status_code=status.HTTP_201_CREATED)
-def create_supplier(
+async def create_supplier(
     supplier: SupplierCreate,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_active_manager)
 ):
-    supplier_id = product_model.create_supplier(conn, supplier.dict())
-    return product_model.get_supplier_by_id(conn, supplier_id)
+    supplier_id = await product_model.create_supplier(conn, supplier.dict())
+    return await product_model.get_supplier_by_id(conn, supplier_id)
 
 # -------------------- PRODUCT ENDPOINTS --------------------
 @router.get("", response_model=List[ProductResponse])
-def get_products(
+async def get_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     active_only: bool = True,
-    conn: MySQLConnection = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    keyset = product_model.PRODUCT_KEYSET
+    products = await product_model.get_all_products(conn, skip, limit, active_only, keyset.decode(cursor))
+    set_next_cursor(response, keyset.next_cursor(products, limit))
+    return products
+
+@router.get("/search", response_model=List[ProductSearchResult])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Partial name, SKU prefix or barcode"),
+    limit: int = Query(20, ge=1, le=100),
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Ranked search over the active catalog (exact SKU/barcode, SKU prefix, name tokens)."""
+    if settings.PRODUCT_SEARCH_BACKEND == "fulltext":
+        return await product_model.search_products_fulltext(conn, q, limit)
+    await product_model.refresh_search_index(conn)
+    return product_model.product_search.search(q, limit)
+
+@router.get("/changes", response_model=CatalogSync)
+async def get_catalog_changes(
+    since: int = Query(0, ge=0, description="`version` from the previous sync or snapshot"),
+    limit: int = Query(5000, ge=1, le=50000),
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Products created, updated or deactivated since a catalog version (POS delta sync).
+
+    Keep calling with the returned `version` while `has_more` is true.
+    """
+    return await product_model.get_catalog_changes(conn, since, limit)
+
+@router.get("/snapshot", response_model=CatalogSync)
+async def get_catalog_snapshot(
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    return product_model.get_all_products(conn, skip, limit, active_only)
+    """Full active catalog for bootstrapping a terminal, then sync via /changes."""
+    return await product_model.get_catalog_snapshot(conn)
 
 @router.get("/{sku}", response_model=ProductResponse)
-def get_product(
+async def get_product(
     sku: str,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    product = product_model.get_product_by_sku(conn, sku)
+    product = await product_model.get_product_by_sku(conn, sku)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
-def create_product(
+async def create_product(
     product: ProductCreate,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_active_manager)
 ):
     # Check if SKU or barcode already exists
-    existing = product_model.get_product_by_sku(conn, product.sku)
+    existing = await product_model.get_product_by_sku(conn, product.sku)
     if existing:
         raise HTTPException(status_code=400, detail="SKU already exists")
-    existing = product_model.get_product_by_barcode(conn, product.barcode)
+    existing = await product_model.get_product_by_barcode(conn, product.barcode)
     if existing:
         raise HTTPException(status_code=400, detail="Barcode already exists")
     
     try:
-        sku = product_model.create_product(conn, product.model_dump())
-        return product_model.get_product_by_sku(conn, sku)
+        sku = await product_model.create_product(conn, product.model_dump())
+        return await product_model.get_product_by_sku(conn, sku)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create product: {str(e)}")
 
 @router.put("/{sku}", response_model=ProductResponse)
-def update_product(
+async def update_product(
     sku: str,
     product_update: ProductUpdate,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_active_manager)
 ):
     # Verify product exists
-    existing = product_model.get_product_by_sku(conn, sku)
+    existing = await product_model.get_product_by_sku(conn, sku)
     if not existing:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # If barcode is being updated, check it's not taken by another product
     if product_update.barcode and product_update.barcode != existing["barcode"]:
-        barcode_exists = product_model.get_product_by_barcode(conn, product_update.barcode)
+        barcode_exists = await product_model.get_product_by_barcode(conn, product_update.barcode)
         if barcode_exists and barcode_exists["sku"] != sku:
             raise HTTPException(status_code=400, detail="Barcode already in use by another product")
     
-    success = product_model.update_product(conn, sku, product_update.model_dump(exclude_unset=True))
+    success = await product_model.update_product(conn, sku, product_update.model_dump(exclude_unset=True))
     if not success:
         raise HTTPException(status_code=500, detail="Failed to update product")
-    return product_model.get_product_by_sku(conn, sku)
+    return await product_model.get_product_by_sku(conn, sku)
 
 @router.delete("/{sku}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(
+async def delete_product(
     sku: str,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_active_manager)
 ):
-    existing = product_model.get_product_by_sku(conn, sku)
+    existing = await product_model.get_product_by_sku(conn, sku)
     if not existing:
         raise HTTPException(status_code=404, detail="Product not found")
-    success = product_model.delete_product(conn, sku)
+    success = await product_model.delete_product(conn, sku)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete product")
-    return None
\ No newline at end of file
+    return None
+
+# -------------------- BULK IMPORT --------------------
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the Content-Type"),
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager)
+):
+    """Stream a CSV (with header row) or NDJSON catalog into products.
+
+    Rows are validated with ProductCreate, deduplicated within the upload and
+    against the database, and inserted PRODUCT_IMPORT_BATCH_SIZE at a time.
+    Valid rows are imported even when others fail; failures are listed per row.
+    """
+    fmt = detect_format(request.headers.get("content-type"), format)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+    category_ids, supplier_ids = await product_model.get_reference_ids(conn)
+    job = product_model.ProductImport(conn, ProductCreate, category_ids, supplier_ids)
+    async for row, record, error in iter_records(fmt, request.stream()):
+        await job.add(row, record, error)
+    await job.flush()
+    return job.result
+
+# -------------------- BULK UPDATE --------------------
+@router.patch("/bulk", response_model=BulkUpdateResult)
+async def bulk_update_products(
+    update: BulkProductUpdate,
+    dry_run: bool = Query(False, description="Return the diffs without applying them"),
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_active_manager)
+):
+    """Set-based catalog update: filter + changes and/or per-SKU patches, in one transaction."""
+    filters = update.filter.model_dump(exclude_none=True) if update.filter else None
+    changes = update.changes.model_dump(exclude_none=True) if update.changes else None
+    patches = [patch.model_dump(exclude_none=True) for patch in update.patches]
+
+    category_ids, supplier_ids = await product_model.get_reference_ids(conn)
+    for values in ([changes] if changes else []) + patches:
+        if values.get("category_id") is not None and values["category_id"] not in category_ids:
+            raise HTTPException(status_code=400, detail=f"Unknown category_id {values['category_id']}")
+        if values.get("supplier_id") is not None and values["supplier_id"] not in supplier_ids:
+            raise HTTPException(status_code=400, detail=f"Unknown supplier_id {values['supplier_id']}")
+
+    try:
+        return await product_model.bulk_update_products(
+            conn, filters, changes, patches, current_user["id"], dry_run
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk update failed: {str(e)}")
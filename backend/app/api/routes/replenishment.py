@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from mysql.connector import MySQLConnection
-from typing import List
+from typing import List, Optional
 
 from ...schemas.replenishment import (
     ReplenishmentSuggestionCreate,
@@ -9,9 +9,11 @@ from ...schemas.replenishment import (
 )
 from ...models import replenishment as replenishment_model
 from ...core.database import get_db
+from ...core.pagination import set_next_cursor
+from ...core.unit_of_work import UnitOfWorkRoute
 from ...api.dependencies import get_current_active_manager  # manager/admin only
 
-router = APIRouter(prefix="/replenishment", tags=["Replenishment"])
+router = APIRouter(prefix="/replenishment", tags=["Replenishment"], route_class=UnitOfWorkRoute)
 
 @router.post("/generate", status_code=status.HTTP_201_CREATED)
 def generate_suggestions(
@@ -33,14 +35,19 @@ def generate_suggestions(
 
 @router.get("/suggestions", response_model=List[ReplenishmentSuggestionResponse])
 def get_suggestions(
+    response: Response,
     active_only: bool = True,
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     conn: MySQLConnection = Depends(get_db),
     current_user = Depends(get_current_active_manager)  # 🔒 manager/admin only
 ):
     """Get list of replenishment suggestions."""
-    return replenishment_model.get_suggestions(conn, active_only, limit, offset)
+    keyset = replenishment_model.SUGGESTION_KEYSET
+    suggestions = replenishment_model.get_suggestions(conn, active_only, limit, offset, keyset.decode(cursor))
+    set_next_cursor(response, keyset.next_cursor(suggestions, limit))
+    return suggestions
 
 @router.post("/actions")
 def take_action(
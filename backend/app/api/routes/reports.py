@@ -9,8 +9,10 @@ from ...schemas.report import (
     ProductPerformanceFilter, ProductPerformanceItem
 )
 from ...models import report as report_model
-from ...core.database import get_db
-from ...api.dependencies import get_current_user
+from ...core.database import get_read_db
+from ...core.etag import conditional_get
+from ...core.export import export_response
+from ...api.dependencies import get_current_sync_reader
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
@@ -19,8 +21,8 @@ def get_sales_report(
     from_date: date,
     to_date: date,
     group_by: str = Query("day", pattern="^(day|week|month)$"),
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)  # any authenticated user
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader)  # any authenticated user
 ):
     """Get sales report grouped by day/week/month within date range."""
     if from_date > to_date:
@@ -34,36 +36,53 @@ def get_stock_movement_report(
     product_sku: Optional[str] = None,
     movement_type: Optional[str] = None,
     limit: int = Query(1000, ge=1, le=10000),
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader)
 ):
     """Get stock movement report with optional filters."""
     return report_model.get_stock_movement_report(
         conn, from_date, to_date, product_sku, movement_type, limit
     )
 
+@router.get("/stock-movements/export")
+def export_stock_movements(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    product_sku: Optional[str] = None,
+    movement_type: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader)
+):
+    """Stream every matching stock movement as CSV or NDJSON, oldest first."""
+    query, params = report_model.stock_movement_export_query(from_date, to_date, product_sku, movement_type)
+    return export_response(conn, query, params, format, gzip, "stock_movements")
+
 @router.get("/product-performance", response_model=List[ProductPerformanceItem])
 def get_product_performance(
     sort_by: str = Query("total_sold_30d", pattern="^(total_sold_30d|avg_daily_sales|stock|slow_movers|name)$"),
     limit: int = Query(50, ge=1, le=500),
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader)
 ):
     """Get product performance report (top sellers, slow movers, etc.)."""
     return report_model.get_product_performance_report(conn, sort_by, limit)
 
 @router.get("/filter-options/movement-types")
 def get_movement_types(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader),
+    etag = Depends(conditional_get("movement_types", read_replica=True))
 ):
     """Get list of movement types for filter dropdown."""
     return report_model.get_distinct_movement_types(conn)
 
 @router.get("/filter-options/products")
 def get_products(
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader),
+    etag = Depends(conditional_get("products", read_replica=True))
 ):
     """Get list of products (sku + name) for filter dropdown."""
     return report_model.get_distinct_product_skus(conn)
\ No newline at end of file
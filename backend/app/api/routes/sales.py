@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from mysql.connector import MySQLConnection
 from typing import List, Optional
 from datetime import datetime, date
@@ -6,47 +8,47 @@ from datetime import datetime, date
 from ...schemas.sale import (
     SaleCreate, SaleTransactionResponse, SaleItemResponse, SaleSummaryResponse
 )
-from ...models import sale as sale_model
-from ...core.database import get_db
-from ...api.dependencies import get_current_user
+from ...schemas.sale_batch import SaleBatch, SaleBatchResult
+from ...models.aio import sale as sale_model
+from ...core.async_database import AsyncConnection, get_async_db
+from ...core.config import settings
+from ...core.database import get_read_db
+from ...core.export import export_response
+from ...core.pagination import set_next_cursor
+from ...core.retry import LockConflictError
+from ...core.unit_of_work import UnitOfWorkRoute
+from ...api.dependencies import get_current_sync_reader, get_current_user, idempotent_write
 
-router = APIRouter(prefix="/sales", tags=["Sales"])
+router = APIRouter(prefix="/sales", tags=["Sales"], route_class=UnitOfWorkRoute)
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=SaleTransactionResponse)
-def create_sale(
+async def create_sale(
     sale: SaleCreate,
-    conn: MySQLConnection = Depends(get_db),
-    current_user = Depends(get_current_user)  # any authenticated user (clerk, manager, admin)
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user),  # any authenticated user (clerk, manager, admin)
+    idempotency = Depends(idempotent_write(status.HTTP_201_CREATED, SaleTransactionResponse))
 ):
-    """Process a sale transaction."""
-    # Validate that all SKUs exist (optional – the procedure will also validate)
-    # But we can do quick existence check
-    from ...models.product import get_product_by_sku
-    for item in sale.items:
-        product = get_product_by_sku(conn, item.sku)
-        if not product:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Product with SKU '{item.sku}' not found"
-            )
-        if not product["is_active"]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Product '{item.sku}' is inactive and cannot be sold"
-            )
+    """Process a sale transaction (retry-safe with an Idempotency-Key header)."""
+    # Prepare items list for the stored procedure
+    items_data = [
+        {
+            "sku": item.sku,
+            "quantity": item.quantity,
+            "unit_price": float(item.unit_price)  # convert Decimal to float for JSON
+        }
+        for item in sale.items
+    ]
+
+    # One query validates existence, active flag and stock for the whole basket
+    # (the procedure's trigger still enforces stock under lock)
+    problem = await sale_model.check_sale_items(conn, items_data)
+    if problem:
+        status_code, detail = problem
+        raise HTTPException(status_code=status_code, detail=detail)
 
     try:
-        # Prepare items list for the stored procedure
-        items_data = [
-            {
-                "sku": item.sku,
-                "quantity": item.quantity,
-                "unit_price": float(item.unit_price)  # convert Decimal to float for JSON
-            }
-            for item in sale.items
-        ]
-        
-        transaction_id = sale_model.create_sale(
+        # ProcessSale returns the finished transaction and its line items
+        transaction = await sale_model.create_sale(
             conn,
             sale.transaction_number,
             current_user["id"],
@@ -54,12 +56,8 @@ def create_sale(
             items_data
         )
         
-        # Fetch the complete transaction with items
-        transaction = sale_model.get_transaction_by_id(conn, transaction_id)
-        items = sale_model.get_transaction_items(conn, transaction_id)
-        transaction["items"] = items
-        return transaction
-        
+    except LockConflictError:
+        raise    # 503, see main.py
     except Exception as e:
         # Check for specific error messages from the stored procedure
         error_msg = str(e)
@@ -67,46 +65,97 @@ def create_sale(
             raise HTTPException(status_code=400, detail=error_msg)
         raise HTTPException(status_code=500, detail=f"Failed to process sale: {error_msg}")
 
+    return await idempotency.complete(transaction, committed=True)    # ProcessSale commits on its own
+
+@router.post("/batch", response_model=SaleBatchResult)
+async def create_sales_batch(
+    batch: SaleBatch,
+    conn: AsyncConnection = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Ingest sales queued offline by a POS terminal.
+
+    Sales already recorded (by transaction_number) are reported as
+    duplicates, so a batch can be replayed after a timeout. Each sale gets
+    its own outcome; a rejected sale does not abort the rest of the batch.
+    """
+    sales = [
+        {
+            "transaction_number": sale.transaction_number,
+            "transaction_date": sale.transaction_date,
+            "items": [
+                {"sku": item.sku, "quantity": item.quantity, "unit_price": float(item.unit_price)}
+                for item in sale.items
+            ],
+        }
+        for sale in batch.sales
+    ]
+    return await sale_model.process_sale_batch(conn, sales, current_user["id"], settings.SALE_BATCH_CHUNK_SIZE)
+
 @router.get("/transactions", response_model=List[SaleTransactionResponse])
-def get_transactions(
+async def get_transactions(
+    response: Response,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
-    conn: MySQLConnection = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    items: str = Query("full", pattern="^(full|count|none)$", description="Line items, per-transaction counts, or headers only"),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Get sales transactions (paginated, optionally filtered by date)."""
-    transactions = sale_model.get_transactions(conn, from_date, to_date, limit, offset)
-    
-    # Fetch items for each transaction
-    for t in transactions:
-        t["items"] = sale_model.get_transaction_items(conn, t["id"])
+    keyset = sale_model.TRANSACTION_KEYSET
+    transactions = await sale_model.get_transactions(conn, from_date, to_date, limit, offset, keyset.decode(cursor))
+    next_page = keyset.next_cursor(transactions, limit)
     
-    return transactions
+    # Items for the whole page in one query
+    await sale_model.load_transaction_items(conn, transactions, items)
+    if items == sale_model.ITEMS_FULL:
+        set_next_cursor(response, next_page)
+        return transactions
+
+    # Counts / headers only don't match SaleTransactionResponse; return them as they are
+    summaries = JSONResponse(jsonable_encoder(transactions))
+    set_next_cursor(summaries, next_page)
+    return summaries
+
+@router.get("/export")
+def export_transactions(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    lines: bool = Query(False, description="One row per line item instead of per transaction"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    conn: MySQLConnection = Depends(get_read_db),
+    current_user = Depends(get_current_sync_reader)
+):
+    """Stream transactions as CSV or NDJSON, oldest first (dates inclusive)."""
+    query, params = sale_model.transaction_export_query(from_date, to_date, lines)
+    return export_response(conn, query, params, format, gzip, "sale_lines" if lines else "sales")
 
 @router.get("/transactions/{transaction_id}", response_model=SaleTransactionResponse)
-def get_transaction(
+async def get_transaction(
     transaction_id: int,
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Get a single transaction by ID."""
-    transaction = sale_model.get_transaction_by_id(conn, transaction_id)
+    transaction = await sale_model.get_transaction_by_id(conn, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    transaction["items"] = sale_model.get_transaction_items(conn, transaction_id)
+    transaction["items"] = await sale_model.get_transaction_items(conn, transaction_id)
     return transaction
 
 @router.get("/summary/daily", response_model=SaleSummaryResponse)
-def get_daily_summary(
+async def get_daily_summary(
     transaction_date: date = Query(default_factory=lambda: datetime.now().date()),
-    conn: MySQLConnection = Depends(get_db),
+    conn: AsyncConnection = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Get sales summary for a specific day."""
-    summary = sale_model.get_daily_summary(conn, transaction_date)
+    summary = await sale_model.get_daily_summary(conn, transaction_date)
     if not summary:
         summary = {"total_transactions": 0, "total_revenue": 0, "total_items_sold": 0}
     return summary
\ No newline at end of file
@@ -0,0 +1,352 @@
+import asyncio
+import time
+from typing import Dict
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from mysql.connector import MySQLConnection
+from .config import settings
+from mysql.connector.errors import PoolError
+from .instrumentation import AsyncInstrumentedCursor, attributed_to, find_caller
+from .unit_of_work import commit_now, on_commit, register
+from .database import (
+    PoolMetrics, get_db, get_read_db, get_replica_pool, replica_monitor, use_replica
+)
+
+try:
+    import aiomysql
+except ImportError:  # only required when DB_ASYNC is enabled
+    aiomysql = None
+
+# ----------------------------------------------------------------------
+# Async connection facade
+#
+# The app.models.aio modules are written against this small interface
+# (await conn.cursor(), await cursor.execute(...), await conn.commit()),
+# which mirrors aiomysql. Two backends implement it:
+#   * AiomysqlConnection – native asyncio driver, no worker thread held
+#   * ThreadedConnection – blocking mysql.connector, each call offloaded
+#     to the AnyIO thread pool (the DB_ASYNC=false fallback)
+# ----------------------------------------------------------------------
+
+class AsyncConnection:
+    from_replica = False
+    # True while a unit of work holds writes not committed yet (see
+    # app.core.unit_of_work); plain connections commit straight away.
+    pending = False
+
+    async def cursor(self, dictionary: bool = False):
+        raise NotImplementedError
+
+    async def commit(self):
+        raise NotImplementedError
+
+    async def rollback(self):
+        raise NotImplementedError
+
+    async def commit_now(self):
+        await self.commit()
+
+    def after_commit(self, fn, *args):
+        fn(*args)
+
+
+class AiomysqlConnection(AsyncConnection):
+    def __init__(self, pool, conn, from_replica: bool = False):
+        self._pool = pool
+        self._conn = conn
+        self.from_replica = from_replica
+
+    async def cursor(self, dictionary: bool = False):
+        if dictionary:
+            return AsyncInstrumentedCursor(await self._conn.cursor(aiomysql.DictCursor))
+        return AsyncInstrumentedCursor(await self._conn.cursor())
+
+    async def commit(self):
+        await self._conn.commit()
+
+    async def rollback(self):
+        await self._conn.rollback()
+
+    async def release(self):
+        # aiomysql drops connections released mid-transaction; end any
+        # read snapshot first so the connection goes back to the pool.
+        if self._conn.get_transaction_status():
+            await self._conn.rollback()
+        self._pool.release(self._conn)
+
+
+async def _offload(fn, *args, **kwargs):
+    # Resolve the calling model here, on the event loop thread, so the
+    # instrumented cursor on the worker thread can attribute the statement.
+    with attributed_to(find_caller()):
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+
+class ThreadedCursor:
+    def __init__(self, cursor, dictionary: bool):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._result_sets = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    async def execute(self, query, params=None):
+        self._result_sets = None
+        return await _offload(self._cursor.execute, query, params)
+
+    async def executemany(self, query, seq_params):
+        self._result_sets = None
+        return await _offload(self._cursor.executemany, query, seq_params)
+
+    async def callproc(self, procname, args=()):
+        """Call a procedure and buffer its result sets (aiomysql semantics)."""
+        def _call():
+            self._cursor.callproc(procname, args)
+            result_sets = []
+            for res in self._cursor.stored_results():
+                rows = res.fetchall()
+                if self._dictionary and rows and not isinstance(rows[0], dict):
+                    rows = [dict(zip(res.column_names, row)) for row in rows]
+                result_sets.append(rows)
+            return result_sets
+        self._result_sets = await _offload(_call)
+        return args
+
+    async def nextset(self):
+        if self._result_sets:
+            self._result_sets.pop(0)
+        return bool(self._result_sets)
+
+    async def fetchone(self):
+        if self._result_sets is not None:
+            rows = self._result_sets[0] if self._result_sets else []
+            return rows.pop(0) if rows else None
+        return await run_in_threadpool(self._cursor.fetchone)
+
+    async def fetchall(self):
+        if self._result_sets is not None:
+            rows = self._result_sets[0] if self._result_sets else []
+            if self._result_sets:
+                self._result_sets[0] = []
+            return rows
+        return await run_in_threadpool(self._cursor.fetchall)
+
+    async def close(self):
+        await run_in_threadpool(self._cursor.close)
+
+
+class ThreadedConnection(AsyncConnection):
+    def __init__(self, conn: MySQLConnection):
+        self._conn = conn
+        self.from_replica = getattr(conn, "from_replica", False)
+
+    async def cursor(self, dictionary: bool = False):
+        cursor = await run_in_threadpool(self._conn.cursor, dictionary=dictionary)
+        return ThreadedCursor(cursor, dictionary)
+
+    async def commit(self):
+        await run_in_threadpool(self._conn.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self._conn.rollback)
+
+    # get_db's UnitOfWork does the bookkeeping; a read connection has none.
+    @property
+    def pending(self):
+        return getattr(self._conn, "pending", False)
+
+    async def commit_now(self):
+        await run_in_threadpool(commit_now, self._conn)
+
+    def after_commit(self, fn, *args):
+        on_commit(self._conn, fn, *args)
+
+
+class AsyncUnitOfWork(AsyncConnection):
+    """UnitOfWork (app.core.unit_of_work) for a native async connection."""
+
+    def __init__(self, conn: AsyncConnection):
+        self._conn = conn
+        self.from_replica = conn.from_replica
+        self.pending = False
+        self._after_commit = []
+
+    async def cursor(self, dictionary: bool = False):
+        return await self._conn.cursor(dictionary=dictionary)
+
+    async def commit(self):
+        self.pending = True
+
+    async def commit_now(self):
+        await self._conn.commit()
+        self.pending = False
+        callbacks, self._after_commit = self._after_commit, []
+        for fn, args in callbacks:
+            fn(*args)
+
+    async def rollback(self):
+        await self._conn.rollback()
+        self.pending = False
+        self._after_commit = []
+
+    def after_commit(self, fn, *args):
+        if self.pending:
+            self._after_commit.append((fn, args))
+        else:
+            fn(*args)
+
+    async def finish(self):
+        if self.pending:
+            await self.commit_now()
+
+# ----------------------------------------------------------------------
+# Native pool (only created when DB_ASYNC is enabled)
+# ----------------------------------------------------------------------
+async_pool = None
+async_pool_metrics = PoolMetrics()
+
+async_replica_pool = None
+async_replica_metrics = PoolMetrics()
+
+async def _create_async_pool(host, port, user, password, size):
+    if aiomysql is None:
+        raise RuntimeError("DB_ASYNC is enabled but aiomysql is not installed")
+    return await aiomysql.create_pool(
+        host=host,
+        port=int(port or 3306),
+        db=settings.DB_NAME,
+        user=user,
+        password=password,
+        minsize=min(1, size),
+        maxsize=size + settings.DB_POOL_MAX_OVERFLOW,
+        pool_recycle=int(settings.DB_POOL_MAX_AGE),
+        autocommit=False,
+    )
+
+async def init_async_pool():
+    global async_pool
+    if async_pool is None:
+        async_pool = await _create_async_pool(
+            settings.DB_HOST, settings.DB_PORT, settings.DB_USER, settings.DB_PASSWORD,
+            settings.DB_POOL_SIZE,
+        )
+    return async_pool
+
+async def init_async_replica_pool():
+    global async_replica_pool
+    if async_replica_pool is None and settings.DB_REPLICA_HOST:
+        async_replica_pool = await _create_async_pool(
+            settings.DB_REPLICA_HOST, settings.DB_REPLICA_PORT,
+            settings.DB_REPLICA_USER, settings.DB_REPLICA_PASSWORD,
+            settings.DB_REPLICA_POOL_SIZE,
+        )
+    return async_replica_pool
+
+async def close_async_pool():
+    global async_pool, async_replica_pool
+    for pool in (async_pool, async_replica_pool):
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+    async_pool = async_replica_pool = None
+
+async def acquire_async_connection(replica: bool = False) -> AiomysqlConnection:
+    """Check out a native connection, waiting at most DB_POOL_TIMEOUT seconds."""
+    if replica:
+        pool, metrics = await init_async_replica_pool(), async_replica_metrics
+    else:
+        pool, metrics = await init_async_pool(), async_pool_metrics
+    started = time.monotonic()
+    waited = pool.freesize == 0 and pool.size >= pool.maxsize
+    while True:
+        try:
+            raw = await asyncio.wait_for(pool.acquire(), settings.DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            metrics.incr("exhausted")
+            raise PoolError(
+                f"Async {'replica ' if replica else ''}connection pool exhausted (maxsize={pool.maxsize}, timeout={settings.DB_POOL_TIMEOUT}s)"
+            )
+        # aiomysql recycles idle connections (pool_recycle); additionally
+        # ping ones that sat idle long enough to have been dropped server-side.
+        if asyncio.get_running_loop().time() - raw.last_usage <= settings.DB_POOL_PING_AFTER:
+            break
+        try:
+            await raw.ping(reconnect=False)
+            break
+        except Exception:
+            metrics.incr("stale")
+            raw.close()
+            pool.release(raw)
+    metrics.record_checkout((time.monotonic() - started) * 1000, waited)
+    return AiomysqlConnection(pool, raw, from_replica=replica)
+
+def _async_stats(name, pool, metrics) -> Dict:
+    stats = {"name": name, "enabled": pool is not None}
+    if pool is not None:
+        stats.update(
+            size=pool.size,
+            free=pool.freesize,
+            maxsize=pool.maxsize,
+            in_use=pool.size - pool.freesize,
+        )
+    stats.update(metrics.snapshot())
+    return stats
+
+def async_pool_stats() -> Dict:
+    return _async_stats("async", async_pool, async_pool_metrics)
+
+def async_replica_pool_stats() -> Dict:
+    return _async_stats("async_replica", async_replica_pool, async_replica_metrics)
+
+async def _native_async_db(request: Request):
+    conn = await acquire_async_connection()
+    unit_of_work = AsyncUnitOfWork(conn)
+    register(request, unit_of_work)
+    try:
+        yield unit_of_work
+        if unit_of_work.pending:
+            await unit_of_work.commit_now()
+    finally:
+        # release() rolls back whatever was left uncommitted.
+        await conn.release()
+
+async def _threaded_async_db(conn: MySQLConnection = Depends(get_db)):
+    # Shares the request's get_db connection, so sync and async
+    # dependencies in one request never hold two pool slots.
+    yield ThreadedConnection(conn)
+
+async def _native_async_read_db(request: Request):
+    conn = None
+    if use_replica(request):
+        replica = get_replica_pool()
+        if replica_monitor.check_due():
+            await run_in_threadpool(replica_monitor.refresh, replica)
+        if replica_monitor.healthy:
+            try:
+                conn = await acquire_async_connection(replica=True)
+            except PoolError:
+                raise
+            except Exception as e:
+                replica_monitor.mark_down(e)
+        if conn is None:
+            replica_monitor.record_fallback()
+    if conn is None:
+        conn = await acquire_async_connection()
+    try:
+        yield conn
+    finally:
+        await conn.release()
+
+async def _threaded_async_read_db(conn: MySQLConnection = Depends(get_read_db)):
+    yield ThreadedConnection(conn)
+
+# FastAPI dependency: yields an AsyncConnection for `async def` routes.
+get_async_db = _native_async_db if settings.DB_ASYNC else _threaded_async_db
+# Read-only counterpart of get_read_db: replica with primary fallback.
+get_async_read_db = _native_async_read_db if settings.DB_ASYNC else _threaded_async_read_db
@@ -0,0 +1,111 @@
+"""In-process LRU/TTL caches used by the model layer."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    Every invalidation bumps `version`. A reader captures it before
+    querying and passes it to put(), so a row read before a concurrent
+    write is not cached. Dict values are copied in and out so callers
+    cannot mutate cached rows.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _copy(entry[1])
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, version: int = None, ttl: float = None):
+        """Cache a value; skipped if an invalidation happened since `version` was read.
+
+        `ttl` may shorten the default lifetime (e.g. for rows with their own expiry).
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._drop(key)
+            value = _copy(value)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._on_store(key, value)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self.version += 1
+            for key in keys:
+                if self._drop(key):
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self.invalidations += len(self._entries)
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # Hooks for secondary indexes; called with the lock held.
+    def _on_store(self, key: Hashable, value: Any):
+        pass
+
+    def _on_drop(self, key: Hashable, value: Any):
+        pass
+
+    def _drop(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._on_drop(key, entry[1])
+        return True
+
+def cacheable(conn) -> bool:
+    """Rows read from a (possibly lagging) replica connection are not cached."""
+    return not getattr(conn, "from_replica", False)
+
+def _copy(value: Any) -> Any:
+    return dict(value) if isinstance(value, dict) else value
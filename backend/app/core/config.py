@@ -10,10 +10,75 @@ class Settings:
     DB_NAME = os.getenv("DB_NAME")
     DB_USER = os.getenv("DB_USER")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
+    # Use the native asyncio driver (aiomysql) for async routes; when off they
+    # run the blocking mysql.connector path in the worker thread pool.
+    DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+    # Connection pool (shared by the sync pool and the aiomysql pool)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))            # seconds to wait for a free connection
+    DB_POOL_MAX_AGE = float(os.getenv("DB_POOL_MAX_AGE", 1800))          # recycle connections older than this
+    DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))      # ping connections idle longer than this
+    # Read replica for dashboard / reports / public API reads (unset = use the primary)
+    DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+    DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+    DB_REPLICA_USER = os.getenv("DB_REPLICA_USER", DB_USER)
+    DB_REPLICA_PASSWORD = os.getenv("DB_REPLICA_PASSWORD", DB_PASSWORD)
+    DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", DB_POOL_SIZE))
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))                # seconds behind before falling back
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))  # how often lag is re-checked
+    DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 10))  # pin a writer's reads to the primary
+    # Query instrumentation
+    DEBUG = os.getenv("DEBUG", "false").lower() == "true"                      # adds X-DB-* response headers
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))               # slow-query log threshold
+    DB_SLOW_QUERY_LOG_FILE = os.getenv("DB_SLOW_QUERY_LOG_FILE")               # optional file for the slow-query log
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 10))    # same statement shape per request
+    # In-process product cache (SKU / barcode lookups)
+    PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 10000))
+    PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 30))        # seconds; 0 disables the cache
+    PRODUCT_CACHE_PRELOAD = os.getenv("PRODUCT_CACHE_PRELOAD", "true").lower() == "true"
+    # Authenticated-user cache (user id -> user row with roles)
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 10))              # seconds; 0 disables the cache
+    # API-key validation cache and write-behind last_used_at
+    API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", 10000))
+    API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", 30))              # seconds; 0 disables the cache
+    API_KEY_USAGE_FLUSH_SECONDS = float(os.getenv("API_KEY_USAGE_FLUSH_SECONDS", 30))
+    # Product search (GET /products/search): in-memory index or MySQL FULLTEXT
+    PRODUCT_SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND", "memory").lower()        # memory | fulltext
+    PRODUCT_SEARCH_REBUILD_SECONDS = float(os.getenv("PRODUCT_SEARCH_REBUILD_SECONDS", 600))  # full reload; 0 disables
+    # POS catalog delta sync (GET /products/changes, /products/snapshot)
+    CATALOG_SYNC_SETTLE_SECONDS = int(os.getenv("CATALOG_SYNC_SETTLE_SECONDS", 10))     # > longest product-writing transaction
+    CATALOG_VERSION_PRUNE_SECONDS = float(os.getenv("CATALOG_VERSION_PRUNE_SECONDS", 3600))
+    # ETags for reference data (categories, suppliers, movement types, settings)
+    ETAG_VERSION_TTL = float(os.getenv("ETAG_VERSION_TTL", 5))              # seconds table versions are cached
+    REFERENCE_CACHE_MAX_AGE = int(os.getenv("REFERENCE_CACHE_MAX_AGE", 0))  # Cache-Control max-age
+    # Bulk catalog import (POST /products/import)
+    PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", 1000))   # rows per insert + commit
+    PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", 1000))   # row errors listed in the report
+    # Idempotency-Key on POST /sales, /inventory/receipt, /inventory/adjust
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))            # seconds a stored response is replayed
+    IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_SECONDS", 60))  # > slowest write; then a claim lapses
+    IDEMPOTENCY_PRUNE_SECONDS = float(os.getenv("IDEMPOTENCY_PRUNE_SECONDS", 600))
+    # Offline POS replay (POST /sales/batch)
+    SALE_BATCH_CHUNK_SIZE = int(os.getenv("SALE_BATCH_CHUNK_SIZE", 50))    # sales per transaction
+    # Retry of sale / stock transactions that hit a deadlock or lock wait timeout
+    DB_RETRY_MAX_ATTEMPTS = int(os.getenv("DB_RETRY_MAX_ATTEMPTS", 4))
+    DB_RETRY_BUDGET_MS = float(os.getenv("DB_RETRY_BUDGET_MS", 2000))           # total time before giving up (503)
+    DB_RETRY_BASE_BACKOFF_MS = float(os.getenv("DB_RETRY_BASE_BACKOFF_MS", 20))  # doubled per retry, jittered
+    DB_RETRY_MAX_BACKOFF_MS = float(os.getenv("DB_RETRY_MAX_BACKOFF_MS", 500))
+    # Hot-SKU stock escrow (PUT /inventory/escrow/{sku})
+    STOCK_ESCROW_CONSOLIDATE_SECONDS = float(os.getenv("STOCK_ESCROW_CONSOLIDATE_SECONDS", 2))  # stock levels of hot SKUs lag by this
+    STOCK_ESCROW_MIN_PER_SLOT = int(os.getenv("STOCK_ESCROW_MIN_PER_SLOT", 5))                 # below this, sales lock the product row
+    # Streaming exports (GET /sales/export, /reports/stock-movements/export)
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))               # rows fetched and sent per chunk
+    EXPORT_NET_WRITE_TIMEOUT = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT", 600))  # seconds the server waits on a slow reader
     
     # JWT
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    # Sign username/email/roles into access tokens so requests authorize without a user lookup
+    JWT_EMBED_ROLES = os.getenv("JWT_EMBED_ROLES", "false").lower() == "true"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
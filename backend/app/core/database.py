@@ -1,9 +1,17 @@
-import mysql.connector.pooling
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import mysql.connector
+from fastapi import Request
+from mysql.connector import MySQLConnection
+from mysql.connector.errors import PoolError
 from .config import settings
+from .instrumentation import instrument
+from .unit_of_work import UnitOfWork, register
 
 db_config = {
-    "pool_name": "smart_inventory_pool",
-    "pool_size": 5,
     "host": settings.DB_HOST,
     "port": settings.DB_PORT,
     "database": settings.DB_NAME,
@@ -11,12 +19,443 @@ db_config = {
     "password": settings.DB_PASSWORD,
 }
 
-connection_pool = mysql.connector.pooling.MySQLConnectionPool(**db_config)
+replica_config = {
+    "host": settings.DB_REPLICA_HOST,
+    "port": settings.DB_REPLICA_PORT,
+    "database": settings.DB_NAME,
+    "user": settings.DB_REPLICA_USER,
+    "password": settings.DB_REPLICA_PASSWORD,
+}
+
+# Upper bounds (ms) of the checkout wait-time histogram buckets.
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 250, 500, 1000, 5000)
+
+class PoolMetrics:
+    """Checkout counters and wait-time histogram shared by the sync and async pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "exhausted": 0,
+            "created": 0,
+            "recycled": 0,
+            "stale": 0,
+        }
+        self._wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total_ms = 0.0
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_checkout(self, wait_ms: float, waited: bool):
+        with self._lock:
+            self.counters["checkouts"] += 1
+            if waited:
+                self.counters["waits"] += 1
+            self._wait_total_ms += wait_ms
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self._wait_histogram[i] += 1
+                    break
+            else:
+                self._wait_histogram[-1] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            histogram = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self._wait_histogram)}
+            histogram[f"gt_{WAIT_BUCKETS_MS[-1]}ms"] = self._wait_histogram[-1]
+            checkouts = self.counters["checkouts"]
+            return {
+                **self.counters,
+                "avg_wait_ms": round(self._wait_total_ms / checkouts, 3) if checkouts else 0.0,
+                "wait_histogram": histogram,
+            }
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: MySQLConnection):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Thread-safe MySQL pool with overflow, checkout timeout and live stats.
+
+    Up to `size` connections are kept idle; `max_overflow` extra ones may be
+    opened under load and are closed again on release. Connections older
+    than `max_age` seconds are recycled, and connections idle for longer
+    than `ping_after` seconds are pinged before being handed out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict,
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        max_age: float = 1800.0,
+        ping_after: float = 30.0
+    ):
+        self.name = name
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_age = max_age
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._in_use = {}
+        self._lock = threading.Condition()
+        self._overflow_peak = 0
+        self.metrics = PoolMetrics()
+
+    # ------------------------------------------------------------------
+    def get_connection(self) -> MySQLConnection:
+        started = time.monotonic()
+        waited = False
+        with self._lock:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if len(self._in_use) < self.size + self.max_overflow:
+                    pooled = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.metrics.incr("exhausted")
+                    raise PoolError(
+                        f"Connection pool '{self.name}' exhausted "
+                        f"(size={self.size}, overflow={self.max_overflow}, timeout={self.timeout}s)"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+            # Reserve the slot before doing any network I/O outside the lock.
+            placeholder = object()
+            self._in_use[id(placeholder)] = placeholder
+
+        try:
+            pooled = self._validate(pooled) if pooled else None
+            if pooled is None:
+                pooled = _PooledConnection(mysql.connector.connect(**self.config))
+                self.metrics.incr("created")
+        except Exception:
+            with self._lock:
+                del self._in_use[id(placeholder)]
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            del self._in_use[id(placeholder)]
+            self._in_use[id(pooled.conn)] = pooled
+            self._overflow_peak = max(self._overflow_peak, len(self._in_use) - self.size)
+        self.metrics.record_checkout((time.monotonic() - started) * 1000, waited)
+        return pooled.conn
+
+    def release(self, conn: MySQLConnection):
+        with self._lock:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            conn.close()
+            return
+        keep = True
+        try:
+            if conn.unread_result:
+                # An unbuffered read was abandoned mid-result (e.g. a client
+                # dropped a streamed export): the rest is still on the wire.
+                keep = False
+            elif conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            keep = False
+        with self._lock:
+            # Overflow connections are closed rather than kept idle.
+            if keep and len(self._idle) < self.size:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                conn = None
+            self._lock.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_use, idle, overflow_peak = len(self._in_use), len(self._idle), self._overflow_peak
+        return {
+            "name": self.name,
+            "size": self.size,
+            "max_overflow": self.max_overflow,
+            "timeout_seconds": self.timeout,
+            "max_age_seconds": self.max_age,
+            "in_use": in_use,
+            "idle": idle,
+            "overflow_peak": overflow_peak,
+            **self.metrics.snapshot(),
+        }
+
+    def close(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._close_quietly(pooled.conn)
+
+    # ------------------------------------------------------------------
+    def _validate(self, pooled: _PooledConnection) -> Optional[_PooledConnection]:
+        """Return the connection if still usable, otherwise None (a new one is opened)."""
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_age:
+            self._close_quietly(pooled.conn)
+            self.metrics.incr("recycled")
+            return None
+        if now - pooled.last_used > self.ping_after:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(pooled.conn)
+                self.metrics.incr("stale")
+                return None
+        return pooled
+
+    @staticmethod
+    def _close_quietly(conn: MySQLConnection):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# ----------------------------------------------------------------------
+# Primary pool – built on first use, not at import time
+# ----------------------------------------------------------------------
+_pool_lock = threading.Lock()
+connection_pool: Optional[ConnectionPool] = None
+
+def get_pool() -> ConnectionPool:
+    global connection_pool
+    if connection_pool is None:
+        with _pool_lock:
+            if connection_pool is None:
+                connection_pool = ConnectionPool(
+                    "smart_inventory_pool",
+                    db_config,
+                    size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    max_age=settings.DB_POOL_MAX_AGE,
+                    ping_after=settings.DB_POOL_PING_AFTER,
+                )
+    return connection_pool
+
+def close_pool():
+    if connection_pool is not None:
+        connection_pool.close()
+
+def get_db(request: Request):
+    """FastAPI dependency: yields the request's unit of work on an (instrumented) connection.
+
+    UnitOfWorkRoute commits it before the response is sent; an exception
+    rolls it back. Routes outside a UnitOfWorkRoute router commit here, once
+    the response is out.
+    """
+    pool = get_pool()
+    conn = pool.get_connection()
+    unit_of_work = UnitOfWork(instrument(conn))
+    register(request, unit_of_work)
+    try:
+        yield unit_of_work
+        if unit_of_work.pending:
+            unit_of_work.commit_now()
+    finally:
+        # Work left uncommitted (the request raised) is rolled back on release.
+        pool.release(conn)
+
+# ----------------------------------------------------------------------
+# Read replica – heavy read-only routes opt in with Depends(get_read_db)
+# ----------------------------------------------------------------------
+replica_pool: Optional[ConnectionPool] = None
+
+def get_replica_pool() -> Optional[ConnectionPool]:
+    """The replica pool, or None when no DB_REPLICA_HOST is configured."""
+    global replica_pool
+    if replica_pool is None and settings.DB_REPLICA_HOST:
+        with _pool_lock:
+            if replica_pool is None:
+                replica_pool = ConnectionPool(
+                    "smart_inventory_replica_pool",
+                    replica_config,
+                    size=settings.DB_REPLICA_POOL_SIZE,
+                    max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    max_age=settings.DB_POOL_MAX_AGE,
+                    ping_after=settings.DB_POOL_PING_AFTER,
+                )
+    return replica_pool
+
+def close_replica_pool():
+    if replica_pool is not None:
+        replica_pool.close()
+
+
+class ReplicaMonitor:
+    """Caches replica health so the lag query runs at most once per interval.
+
+    The replica is considered unhealthy when it cannot be reached, when
+    replication is stopped, or when it is more than `max_lag` seconds behind.
+    """
+
+    def __init__(self, max_lag: float, interval: float):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at = 0.0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= self.interval
+
+    def is_healthy(self, pool: ConnectionPool) -> bool:
+        if self.check_due():
+            self.refresh(pool)
+        return self.healthy
+
+    def refresh(self, pool: ConnectionPool):
+        # One thread checks; concurrent callers keep using the last result.
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if not self.check_due():
+                return
+            lag, error = None, None
+            try:
+                conn = pool.get_connection()
+                try:
+                    lag = self._read_lag(conn)
+                finally:
+                    pool.release(conn)
+            except Exception as e:
+                error = str(e)
+            self.lag_seconds = lag
+            self.last_error = error
+            self.healthy = error is None and lag is not None and lag <= self.max_lag
+            self.checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def mark_down(self, error: Exception):
+        """Record a failed replica checkout; reads stay on the primary until the next check."""
+        self.healthy = False
+        self.last_error = str(error)
+        self.checked_at = time.monotonic()
+
+    def record_fallback(self):
+        self.fallbacks += 1
+
+    @staticmethod
+    def _read_lag(conn: MySQLConnection) -> Optional[float]:
+        """Seconds behind the source; 0 for a standalone read copy, None if replication is stopped."""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+            status = cursor.fetchone()
+        finally:
+            cursor.close()
+        if not status:
+            return 0.0
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return float(lag) if lag is not None else None
+
+    def stats(self) -> Dict:
+        return {
+            "configured": bool(settings.DB_REPLICA_HOST),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag,
+            "last_error": self.last_error,
+            "fallbacks_to_primary": self.fallbacks,
+        }
+
+replica_monitor = ReplicaMonitor(settings.DB_REPLICA_MAX_LAG, settings.DB_REPLICA_CHECK_INTERVAL)
+
+# ----------------------------------------------------------------------
+# Read-your-writes: clients that just wrote read from the primary
+# ----------------------------------------------------------------------
+READ_CONSISTENCY_HEADER = "X-Read-Consistency"
+_RECENT_WRITES_MAX = 10000
+_recent_writes: Dict[str, float] = {}
+_recent_writes_lock = threading.Lock()
+
+def _client_identity(request: Request) -> Optional[str]:
+    credential = request.headers.get("authorization") or request.headers.get("x-api-key")
+    if not credential:
+        return None
+    return hashlib.sha256(credential.encode()).hexdigest()
+
+def record_write(request: Request):
+    """Pin the caller's reads to the primary for DB_READ_YOUR_WRITES_SECONDS."""
+    identity = _client_identity(request)
+    if identity is None:
+        return
+    now = time.monotonic()
+    with _recent_writes_lock:
+        if len(_recent_writes) >= _RECENT_WRITES_MAX:
+            cutoff = now - settings.DB_READ_YOUR_WRITES_SECONDS
+            for key in [k for k, ts in _recent_writes.items() if ts < cutoff]:
+                del _recent_writes[key]
+        _recent_writes[identity] = now
+
+def requires_primary(request: Request) -> bool:
+    """True if the request asked for primary reads or its caller wrote recently."""
+    if request.headers.get(READ_CONSISTENCY_HEADER, "").lower() in ("primary", "strong"):
+        return True
+    identity = _client_identity(request)
+    if identity is None:
+        return False
+    written_at = _recent_writes.get(identity)
+    return written_at is not None and time.monotonic() - written_at < settings.DB_READ_YOUR_WRITES_SECONDS
+
+def use_replica(request: Request) -> bool:
+    """Whether this request's reads may go to the replica (without checking its health)."""
+    return bool(settings.DB_REPLICA_HOST) and not requires_primary(request)
+
+def get_read_db(request: Request):
+    """FastAPI dependency: yields a replica connection for read-only routes.
 
-def get_db():
-    """FastAPI dependency: yields a database connection."""
-    conn = connection_pool.get_connection()
+    Falls back to the primary when no replica is configured, the replica
+    is down or lagging, or the caller needs to read its own writes.
+    """
+    pool = get_pool()
+    conn = None
+    replica = get_replica_pool() if use_replica(request) else None
+    if replica is not None:
+        if replica_monitor.is_healthy(replica):
+            try:
+                conn = replica.get_connection()
+                pool = replica
+            except PoolError:
+                raise
+            except Exception as e:
+                replica_monitor.mark_down(e)
+        if conn is None:
+            replica_monitor.record_fallback()
+    if conn is None:
+        conn = pool.get_connection()
+    read_conn = instrument(conn)
+    # Lets in-process caches skip rows that may lag the primary.
+    read_conn.from_replica = pool is not connection_pool
     try:
-        yield conn
+        yield read_conn
     finally:
-        conn.close()
\ No newline at end of file
+        pool.release(conn)
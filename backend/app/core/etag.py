@@ -0,0 +1,101 @@
+"""Conditional GET (ETag / If-None-Match) for reference-data endpoints.
+
+Each table behind such an endpoint has a change version in `table_versions`.
+Writers bump it in their own transaction and invalidate the cached copy
+after commit. The ETag is a hash of the request path and the versions, so
+it is the same on every worker. Versions are cached for ETAG_VERSION_TTL
+seconds, so a matching If-None-Match is answered with 304 without a query.
+The TTL also bounds how long writes made by other workers go unnoticed.
+
+Endpoints that read from the replica take their versions from the replica
+too. A version that is newer than the body it tags would pin a stale body
+in client caches.
+"""
+import hashlib
+from typing import Dict, Sequence
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from .cache import TTLCache
+from .config import settings
+from .database import get_pool, get_replica_pool, use_replica
+
+TABLE_VERSION_BUMP = """
+    INSERT INTO table_versions (table_name, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+# products changes with every catalog write; its catalog_version already tracks that.
+TABLE_VERSIONS_SELECT = """
+    SELECT table_name, version FROM table_versions
+    UNION ALL
+    SELECT 'products', COALESCE(MAX(catalog_version), 0) FROM products
+"""
+
+table_versions = TTLCache(maxsize=64, ttl=settings.ETAG_VERSION_TTL)   # primary: table -> version
+replica_table_versions = TTLCache(maxsize=64, ttl=settings.ETAG_VERSION_TTL)
+
+def bump_table_version(conn, table: str):
+    """Record a change to `table` in the caller's transaction (invalidate after commit)."""
+    cursor = conn.cursor()
+    cursor.execute(TABLE_VERSION_BUMP, (table,))
+    cursor.close()
+
+async def bump_table_version_async(conn, table: str):
+    cursor = await conn.cursor()
+    await cursor.execute(TABLE_VERSION_BUMP, (table,))
+    await cursor.close()
+
+def _cached_versions(cache: TTLCache, tables: Sequence[str]):
+    versions = {table: cache.get(table) for table in tables}
+    return None if None in versions.values() else versions
+
+def load_table_versions(tables: Sequence[str], replica: bool = False) -> Dict[str, int]:
+    cache = replica_table_versions if replica else table_versions
+    versions = _cached_versions(cache, tables)
+    if versions is not None:
+        return versions
+    cache_version = cache.version
+    pool = (get_replica_pool() if replica else None) or get_pool()
+    conn = pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(TABLE_VERSIONS_SELECT)
+        current = {table: 0 for table in tables}   # never bumped yet
+        current.update(cursor.fetchall())
+        cursor.close()
+    finally:
+        pool.release(conn)
+    for table, version in current.items():
+        cache.put(table, version, cache_version)
+    return {table: current[table] for table in tables}
+
+def make_etag(request: Request, versions: Dict[str, int]) -> str:
+    key = request.url.path + "?" + request.url.query + "|" + ",".join(
+        f"{table}={versions[table]}" for table in sorted(versions)
+    )
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:24] + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cache_control() -> str:
+    return f"private, max-age={settings.REFERENCE_CACHE_MAX_AGE}, must-revalidate"
+
+def conditional_get(*tables: str, read_replica: bool = False):
+    """Dependency: tag the response with an ETag for `tables`; 304 if the client has it.
+
+    Pass read_replica=True for routes on get_read_db. Declare it after the
+    auth dependency so unauthenticated requests still get 401.
+    """
+    async def check(request: Request, response: Response):
+        replica = read_replica and use_replica(request)
+        versions = _cached_versions(replica_table_versions if replica else table_versions, tables)
+        if versions is None:
+            versions = await run_in_threadpool(load_table_versions, tables, replica)
+        etag = make_etag(request, versions)
+        headers = {"ETag": etag, "Cache-Control": cache_control()}
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return check
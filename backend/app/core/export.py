@@ -0,0 +1,98 @@
+"""Streaming CSV / NDJSON exports.
+
+Rows are read from an unbuffered cursor (the server streams the result as
+the client consumes it) in batches of EXPORT_BATCH_SIZE, encoded and sent
+batch by batch, so memory stays flat however large the export is.
+
+Exports stream on the route's get_read_db connection (authenticated on
+that same connection, see get_current_sync_reader), which FastAPI releases
+once the response has been sent. The generator is primed inside the
+route: the query starts before the response begins, so a bad query is
+still an ordinary error response.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Sequence
+from mysql.connector import MySQLConnection
+from fastapi.responses import StreamingResponse
+from .config import settings
+from .streaming import CSV, NDJSON
+
+MEDIA_TYPES = {CSV: "text/csv; charset=utf-8", NDJSON: "application/x-ndjson"}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def encode_csv(columns: Sequence[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()   # header only: no rows
+
+def encode_ndjson(columns: Sequence[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":")) + "\n"
+            for row in batch
+        ).encode()
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _export_chunks(conn: MySQLConnection, query: str, params: tuple, fmt: str, compress: bool) -> Iterator[bytes]:
+    cursor = conn.cursor()   # unbuffered: rows arrive as they are fetched
+    # The server gives up on a client that stops reading for this long.
+    cursor.execute("SET SESSION net_write_timeout = %s", (settings.EXPORT_NET_WRITE_TIMEOUT,))
+    cursor.execute(query, params)
+    columns = [c[0] for c in cursor.description]
+    yield b""   # primed: query running
+
+    def batches():
+        while True:
+            rows = cursor.fetchmany(settings.EXPORT_BATCH_SIZE)
+            if not rows:
+                return
+            yield rows
+
+    chunks = (encode_csv if fmt == CSV else encode_ndjson)(columns, batches())
+    yield from (gzip_chunks(chunks) if compress else chunks)
+    # Only reached once every row was read; an abandoned stream leaves the
+    # rest of the result unread and the pool discards the connection.
+    cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+    cursor.close()
+
+def export_response(conn: MySQLConnection, query: str, params: tuple, fmt: str, compress: bool, filename: str) -> StreamingResponse:
+    """Stream the result of `query` as an attachment named `filename`.<fmt>[.gz].
+
+    Call from a sync route with its get_read_db connection: the query is
+    started here, so its errors are still regular error responses.
+    """
+    chunks = _export_chunks(conn, query, params, fmt, compress)
+    next(chunks)
+    filename = f"{filename}.{fmt}" + (".gz" if compress else "")
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if compress else MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,156 @@
+"""Idempotency-Key store for retried writes (sales, receipts, adjustments).
+
+A request carrying an Idempotency-Key first claims the key: one row in
+`idempotency_keys`, keyed by a hash of the caller and the key, with a hash
+of the request itself. The claim is committed before the write runs, so a
+concurrent retry sees it (409 while in flight). The finished response is
+stored on the same row, in the write's transaction (or committed right
+away when the write committed on its own, like ProcessSale), and later
+retries get it back without re-running the write. A request that fails
+before its write returns releases its claim, so it can be retried; once
+the write has returned the claim is kept and, if the request still fails,
+lapses after IDEMPOTENCY_PENDING_SECONDS.
+
+Claims last IDEMPOTENCY_PENDING_SECONDS until completed, so a worker that
+dies mid-request does not block the key for the whole TTL. Completed rows
+expire after IDEMPOTENCY_KEY_TTL; expired rows are reclaimed in place and
+pruned in the background.
+"""
+import hashlib
+import json
+import uuid
+from typing import Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from .async_database import AsyncConnection
+from .config import settings
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Expired rows (including abandoned claims) are taken over by the new claim.
+# expires_at must be assigned last: the other IF()s read its old value.
+IDEMPOTENCY_CLAIM = """
+    INSERT INTO idempotency_keys (key_hash, request_hash, claim_token, expires_at)
+    VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+    ON DUPLICATE KEY UPDATE
+        request_hash = IF(expires_at < NOW(), VALUES(request_hash), request_hash),
+        claim_token = IF(expires_at < NOW(), VALUES(claim_token), claim_token),
+        status_code = IF(expires_at < NOW(), NULL, status_code),
+        response_body = IF(expires_at < NOW(), NULL, response_body),
+        expires_at = IF(expires_at < NOW(), VALUES(expires_at), expires_at)
+"""
+
+IDEMPOTENCY_SELECT = """
+    SELECT request_hash, claim_token, status_code, response_body
+    FROM idempotency_keys WHERE key_hash = %s
+"""
+
+IDEMPOTENCY_COMPLETE = """
+    UPDATE idempotency_keys
+    SET status_code = %s, response_body = %s, expires_at = NOW() + INTERVAL %s SECOND
+    WHERE key_hash = %s AND claim_token = %s
+"""
+
+IDEMPOTENCY_RELEASE = "DELETE FROM idempotency_keys WHERE key_hash = %s AND claim_token = %s"
+
+IDEMPOTENCY_PRUNE = "DELETE FROM idempotency_keys WHERE expires_at < NOW() LIMIT %s"
+
+
+class IdempotentReplay(Exception):
+    """Raised by the dependency when a stored response answers the request."""
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+
+
+def key_hash(user_id, key: str) -> bytes:
+    return hashlib.sha256(f"{user_id}:{key}".encode()).digest()
+
+def request_hash(method: str, path: str, body: bytes) -> bytes:
+    return hashlib.sha256(method.encode() + b" " + path.encode() + b"\n" + body).digest()
+
+def claim_outcome(row, claim_token: str, fingerprint: bytes) -> Optional[IdempotentReplay]:
+    """None if this request owns the key; a replay for a completed request; else HTTPException."""
+    if row["claim_token"] == claim_token:
+        return None
+    if bytes(row["request_hash"]) != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if row["status_code"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    return IdempotentReplay(row["status_code"], row["response_body"])
+
+
+class IdempotencyClaim:
+    """A claimed key, or a no-op when the request had no Idempotency-Key."""
+
+    def __init__(self, conn: AsyncConnection, key: Optional[bytes] = None, token: Optional[str] = None,
+                 status_code: int = 200, response_model=None):
+        self.conn = conn
+        self.key = key
+        self.token = token
+        self.status_code = status_code
+        self.response_model = response_model
+
+    @classmethod
+    async def claim(cls, conn: AsyncConnection, key: bytes, fingerprint: bytes, **options) -> "IdempotencyClaim":
+        token = uuid.uuid4().hex
+        cursor = await conn.cursor(dictionary=True)
+        await cursor.execute(IDEMPOTENCY_CLAIM, (key, fingerprint, token, settings.IDEMPOTENCY_PENDING_SECONDS))
+        await cursor.execute(IDEMPOTENCY_SELECT, (key,))
+        row = await cursor.fetchone()
+        await conn.commit_now()
+        await cursor.close()
+        replay = claim_outcome(row, token, fingerprint)
+        if replay is not None:
+            raise replay
+        return cls(conn, key, token, **options)
+
+    async def complete(self, result, committed: bool = False):
+        """Store the response for retries and return it unchanged.
+
+        Pass committed=True when the write has already committed on its own.
+        """
+        if self.key is None:
+            return result
+        # The write has returned: never release this claim from here on. If
+        # storing or committing fails, the claim lapses after
+        # IDEMPOTENCY_PENDING_SECONDS, so a retry cannot write twice.
+        key, self.key = self.key, None
+        body = result
+        if self.response_model is not None:
+            body = self.response_model.model_validate(result).model_dump(mode="json")
+        cursor = await self.conn.cursor()
+        await cursor.execute(IDEMPOTENCY_COMPLETE, (
+            self.status_code, json.dumps(jsonable_encoder(body)), settings.IDEMPOTENCY_KEY_TTL, key, self.token
+        ))
+        if committed:
+            await self.conn.commit_now()
+        else:
+            await self.conn.commit()    # joins the write's transaction
+        await cursor.close()
+        return result
+
+    async def release(self):
+        """Drop an unfinished claim so the request can be retried."""
+        if self.key is None:
+            return
+        await self.conn.rollback()
+        cursor = await self.conn.cursor()
+        await cursor.execute(IDEMPOTENCY_RELEASE, (self.key, self.token))
+        await self.conn.commit_now()
+        await cursor.close()
+        self.key = None
+
+
+def prune_idempotency_keys(conn, batch: int = 10000) -> int:
+    """Delete expired keys (sync; run from the lifespan task)."""
+    cursor = conn.cursor()
+    cursor.execute(IDEMPOTENCY_PRUNE, (batch,))
+    deleted = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return deleted
@@ -0,0 +1,346 @@
+"""Query instrumentation: per-statement timing, slow-query log and N+1 detection.
+
+`instrument(conn)` wraps a mysql.connector connection so every cursor it
+hands out records each statement's latency, rows returned and the
+app.models function that issued it. Statements are added to the current
+request's QueryStats (a context variable set by the middleware in main.py),
+statements slower than DB_SLOW_QUERY_MS go to the "smart_inventory.slow_query"
+logger, and a statement shape repeated DB_N_PLUS_ONE_THRESHOLD times in one
+request is reported as a likely N+1.
+"""
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from .config import settings
+
+slow_query_logger = logging.getLogger("smart_inventory.slow_query")
+n_plus_one_logger = logging.getLogger("smart_inventory.n_plus_one")
+
+if settings.DB_SLOW_QUERY_LOG_FILE:
+    _handler = logging.FileHandler(settings.DB_SLOW_QUERY_LOG_FILE)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.setLevel(logging.INFO)
+
+# ----------------------------------------------------------------------
+# Per-request statistics
+# ----------------------------------------------------------------------
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(sql: str) -> str:
+    """Normalise a statement so repeats with different literals compare equal."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryRecord:
+    __slots__ = ("sql", "caller", "elapsed_ms", "rows")
+
+    def __init__(self, sql: str, caller: str):
+        self.sql = sql
+        self.caller = caller
+        self.elapsed_ms = 0.0
+        self.rows = 0
+
+
+class QueryStats:
+    """Statement count, DB time and repeated statement shapes for one request."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.n_plus_one: Dict[str, str] = {}   # shape -> caller
+        self._lock = threading.Lock()
+
+    def add(self, record: QueryRecord):
+        shape = statement_shape(record.sql)
+        with self._lock:
+            self.count += 1
+            self.total_ms += record.elapsed_ms
+            self.shapes[shape] += 1
+            flagged = (
+                self.shapes[shape] == settings.DB_N_PLUS_ONE_THRESHOLD
+                and shape not in self.n_plus_one
+            )
+            if flagged:
+                self.n_plus_one[shape] = record.caller
+        if flagged:
+            n_plus_one_logger.warning(
+                "Possible N+1 in %s: statement from %s ran %d times: %s",
+                self.label or "<no request>", record.caller,
+                settings.DB_N_PLUS_ONE_THRESHOLD, _truncate(shape),
+            )
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def start_request_stats(label: str = ""):
+    """Begin collecting statistics; returns (stats, token) for reset_request_stats."""
+    stats = QueryStats(label)
+    return stats, _current_stats.set(stats)
+
+def reset_request_stats(token):
+    _current_stats.reset(token)
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+# ----------------------------------------------------------------------
+# Recording
+# ----------------------------------------------------------------------
+# Set by the threaded async cursor: the model coroutine runs on the event
+# loop thread, so its frame is not visible from the worker thread.
+_caller_hint: ContextVar[Optional[str]] = ContextVar("query_caller", default=None)
+
+def find_caller() -> str:
+    """Name of the app.models function (or nearest app frame) issuing the statement."""
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module != __name__ and module.startswith("app."):
+            name = f"{module[len('app.'):]}.{frame.f_code.co_name}"
+            if module.startswith("app.models."):
+                return name
+            if fallback is None and not module.startswith("app.core."):
+                fallback = name
+        frame = frame.f_back
+    return fallback or "<unknown>"
+
+def _truncate(sql: str, limit: int = 500) -> str:
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+# Callbacks invoked as listener(record, stats) for every finished statement;
+# stats is the request's QueryStats or None outside a request.
+_listeners: List[Callable[[QueryRecord, Optional[QueryStats]], None]] = []
+
+def add_query_listener(listener: Callable[[QueryRecord, Optional[QueryStats]], None]):
+    _listeners.append(listener)
+
+def remove_query_listener(listener: Callable[[QueryRecord, Optional[QueryStats]], None]):
+    _listeners.remove(listener)
+
+def record_statement(record: QueryRecord):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(record)
+    for listener in list(_listeners):
+        listener(record, stats)
+    if record.elapsed_ms >= settings.DB_SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "slow query %.1fms rows=%d caller=%s request=%s sql=%s",
+            record.elapsed_ms, record.rows, record.caller,
+            stats.label if stats else "-", _truncate(record.sql),
+        )
+
+# ----------------------------------------------------------------------
+# Cursor / connection proxies
+# ----------------------------------------------------------------------
+class _CursorRecorder:
+    """Shared bookkeeping: a statement stays open until the next execute or close,
+    so rows fetched (and fetch time) are attributed to it."""
+
+    def _begin(self, sql):
+        self._finish()
+        if isinstance(sql, bytes):
+            sql = sql.decode(errors="replace")
+        self._record = QueryRecord(sql, _caller_hint.get() or find_caller())
+
+    def _add_time(self, started: float):
+        if self._record is not None:
+            self._record.elapsed_ms += (time.perf_counter() - started) * 1000
+
+    def _add_rows(self, rows):
+        if self._record is not None and rows:
+            self._record.rows += len(rows) if isinstance(rows, list) else 1
+
+    def _finish(self):
+        record, self._record = getattr(self, "_record", None), None
+        if record is not None:
+            record_statement(record)
+
+
+class InstrumentedCursor(_CursorRecorder):
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._record = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._add_time(started)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._begin(operation)
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._begin(operation)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def callproc(self, procname, args=()):
+        self._begin(f"CALL {procname}")
+        return self._timed(self._cursor.callproc, procname, args)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        self._add_rows(row)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        self._add_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._add_rows(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Delegates to the wrapped connection; only cursor() is intercepted."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+
+class AsyncInstrumentedCursor(_CursorRecorder):
+    """Same as InstrumentedCursor for aiomysql cursors (awaitable methods)."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._record = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def _timed(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            self._add_time(started)
+
+    async def execute(self, query, args=None):
+        self._begin(query)
+        return await self._timed(self._cursor.execute, query, args)
+
+    async def executemany(self, query, args):
+        self._begin(query)
+        return await self._timed(self._cursor.executemany, query, args)
+
+    async def callproc(self, procname, args=()):
+        self._begin(f"CALL {procname}")
+        return await self._timed(self._cursor.callproc, procname, args)
+
+    async def nextset(self):
+        return await self._cursor.nextset()
+
+    async def fetchone(self):
+        row = await self._timed(self._cursor.fetchone)
+        self._add_rows(row)
+        return row
+
+    async def fetchmany(self, size=None):
+        rows = await self._timed(self._cursor.fetchmany, size)
+        self._add_rows(list(rows))
+        return rows
+
+    async def fetchall(self):
+        rows = await self._timed(self._cursor.fetchall)
+        self._add_rows(list(rows))
+        return rows
+
+    async def close(self):
+        self._finish()
+        await self._cursor.close()
+
+
+def instrument(conn):
+    """Wrap a connection for query instrumentation (no-op if already wrapped)."""
+    if isinstance(conn, InstrumentedConnection):
+        return conn
+    return InstrumentedConnection(conn)
+
+@contextmanager
+def attributed_to(caller: str):
+    """Attribute statements run inside the block (even on a worker thread the
+    context is copied to) to `caller` instead of walking the stack."""
+    token = _caller_hint.set(caller)
+    try:
+        yield
+    finally:
+        _caller_hint.reset(token)
+
+
+class CapturedRequest:
+    def __init__(self, stats: Optional[QueryStats]):
+        self.stats = stats   # kept referenced so its id() is not reused mid-capture
+        self.label = stats.label if stats else "<no request>"
+        self.statements: List[QueryRecord] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(r.elapsed_ms for r in self.statements)
+
+
+@contextmanager
+def capture_queries():
+    """Collect the statements run inside the block, grouped by request.
+
+    Yields a list of CapturedRequest in request order; statements issued
+    outside a request are grouped under the label "<no request>".
+    """
+    captured: List[CapturedRequest] = []
+    by_stats: Dict[int, CapturedRequest] = {}
+    lock = threading.Lock()
+
+    def listener(record: QueryRecord, stats: Optional[QueryStats]):
+        with lock:
+            key = id(stats)
+            if key not in by_stats:
+                by_stats[key] = CapturedRequest(stats)
+                captured.append(by_stats[key])
+            by_stats[key].statements.append(record)
+
+    add_query_listener(listener)
+    try:
+        yield captured
+    finally:
+        remove_query_listener(listener)
@@ -0,0 +1,100 @@
+"""Opaque keyset (cursor) pagination helpers.
+
+A cursor is the urlsafe-base64 JSON of the listing name and the sort-key
+values of the last row returned (always ending in a unique id), so the next
+page is fetched with a WHERE on the sort key instead of a growing OFFSET.
+Routes return the cursor for the next page in the X-Next-Cursor header and
+accept it back through the `cursor` query parameter.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+        if "$dec" in value:
+            return Decimal(value["$dec"])
+    return value
+
+def encode_cursor(kind: str, values: Sequence) -> str:
+    payload = json.dumps({"k": kind, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(kind: str, cursor: str, size: int) -> List:
+    """Decode a cursor issued for `kind`; invalid or foreign cursors are a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload["v"]]
+        if payload["k"] != kind or len(values) != size:
+            raise ValueError
+        return values
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset_condition(order_by: Sequence[Tuple[str, str]], after: Sequence) -> Tuple[str, list]:
+    """SQL condition selecting rows strictly after `after` in `order_by` order.
+
+    `order_by` is [(column_expr, "ASC"|"DESC"), ...] ending with a unique
+    column. Expanded to (a > x) OR (a = x AND b > y) ... so mixed sort
+    directions work and MySQL can range-scan the leading index column.
+    """
+    clauses, params = [], []
+    for i, (column, direction) in enumerate(order_by):
+        parts = [f"{col} = %s" for col, _ in order_by[:i]]
+        parts.append(f"{column} {'<' if direction.upper() == 'DESC' else '>'} %s")
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(after[:i + 1])
+    return "(" + " OR ".join(clauses) + ")", params
+
+def order_by_sql(order_by: Sequence[Tuple[str, str]]) -> str:
+    return " ORDER BY " + ", ".join(f"{column} {direction}" for column, direction in order_by)
+
+def next_cursor(kind: str, rows: List[Dict], limit: int, keys: Sequence[str]) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(kind, [last[key] for key in keys])
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+
+class Keyset(NamedTuple):
+    """Sort order of one listing: cursor name, ORDER BY columns and the row keys they map to."""
+    kind: str
+    order_by: Tuple[Tuple[str, str], ...]
+    keys: Tuple[str, ...]
+
+    def decode(self, cursor: Optional[str]) -> Optional[List]:
+        return decode_cursor(self.kind, cursor, len(self.keys)) if cursor else None
+
+    def condition(self, after: Sequence) -> Tuple[str, list]:
+        return keyset_condition(self.order_by, after)
+
+    def order_sql(self) -> str:
+        return order_by_sql(self.order_by)
+
+    def next_cursor(self, rows: List[Dict], limit: int) -> Optional[str]:
+        return next_cursor(self.kind, rows, limit, self.keys)
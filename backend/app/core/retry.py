@@ -0,0 +1,132 @@
+"""Retry of write transactions that lose a lock conflict.
+
+MySQL picks a victim to break a deadlock (1213) and rolls its transaction
+back; a lock wait that times out (1205) fails the statement. Both mean
+"try again", so model functions that run a whole transaction are wrapped
+in @retry_transaction: the transaction is rolled back and re-run after a
+jittered exponential backoff, while the total time stays within
+DB_RETRY_BUDGET_MS. Once the budget or DB_RETRY_MAX_ATTEMPTS is used up,
+LockConflictError is raised (a 503 with Retry-After, see main.py).
+
+Only wrap functions that start and commit their own transaction: a retry
+re-runs the function from the start. Inside a request's unit of work
+(app.core.unit_of_work) that holds earlier writes, the conflict has cost
+those writes too, so the function is not re-run on its own: LockConflictError
+is raised at once and the client retries the whole request.
+"""
+import asyncio
+import functools
+import inspect
+import random
+import threading
+import time
+from typing import Dict, Optional
+from .config import settings
+
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+
+LOCK_CONFLICTS = {ER_LOCK_DEADLOCK: "deadlocks", ER_LOCK_WAIT_TIMEOUT: "lock_wait_timeouts"}
+
+
+class LockConflictError(Exception):
+    """A transaction still lost its lock conflict after the retries allowed."""
+    def __init__(self, label: str, attempts: int, error: Exception):
+        super().__init__(f"{label}: gave up after {attempts} attempt(s): {error}")
+        self.label = label
+        self.attempts = attempts
+        self.error = error
+
+
+def mysql_error_code(error: Exception) -> Optional[int]:
+    """Server error number from a mysql.connector or PyMySQL (aiomysql) exception."""
+    code = getattr(error, "errno", None)
+    if code is None and error.args and isinstance(error.args[0], int):
+        code = error.args[0]
+    return code
+
+def is_lock_conflict(error: Exception) -> bool:
+    return mysql_error_code(error) in LOCK_CONFLICTS
+
+
+class RetryMetrics:
+    """Per-operation counters of lock conflicts and how the retries went."""
+
+    FIELDS = ("deadlocks", "lock_wait_timeouts", "retries", "recovered", "gave_up")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def incr(self, label: str, *names: str):
+        with self._lock:
+            counters = self._counters.setdefault(label, dict.fromkeys(self.FIELDS, 0))
+            for name in names:
+                counters[name] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {label: dict(counters) for label, counters in self._counters.items()}
+
+retry_metrics = RetryMetrics()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry `attempt` (1-based): full jitter over an exponential cap."""
+    cap = min(settings.DB_RETRY_MAX_BACKOFF_MS, settings.DB_RETRY_BASE_BACKOFF_MS * 2 ** (attempt - 1))
+    return random.uniform(0, cap) / 1000
+
+def next_delay(label: str, attempt: int, started: float, error: Exception, joined: bool = False) -> float:
+    """Count the conflict; the delay before the next attempt, or raise LockConflictError."""
+    retry_metrics.incr(label, LOCK_CONFLICTS[mysql_error_code(error)])
+    delay = backoff_delay(attempt)
+    elapsed_ms = (time.monotonic() - started + delay) * 1000
+    if (joined or attempt >= settings.DB_RETRY_MAX_ATTEMPTS
+            or elapsed_ms > settings.DB_RETRY_BUDGET_MS):
+        retry_metrics.incr(label, "gave_up")
+        raise LockConflictError(label, attempt, error) from error
+    retry_metrics.incr(label, "retries")
+    return delay
+
+def retry_transaction(label: str):
+    """Decorator for model functions taking `conn` first (sync or async)."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(conn, *args, **kwargs):
+                started, attempt = time.monotonic(), 1
+                joined = getattr(conn, "pending", False)
+                while True:
+                    try:
+                        result = await fn(conn, *args, **kwargs)
+                    except Exception as e:
+                        if not is_lock_conflict(e):
+                            raise
+                        await conn.rollback()
+                        await asyncio.sleep(next_delay(label, attempt, started, e, joined))
+                        attempt += 1
+                        continue
+                    if attempt > 1:
+                        retry_metrics.incr(label, "recovered")
+                    return result
+            return run_async
+
+        @functools.wraps(fn)
+        def run(conn, *args, **kwargs):
+            started, attempt = time.monotonic(), 1
+            joined = getattr(conn, "pending", False)
+            while True:
+                try:
+                    result = fn(conn, *args, **kwargs)
+                except Exception as e:
+                    if not is_lock_conflict(e):
+                        raise
+                    conn.rollback()
+                    time.sleep(next_delay(label, attempt, started, e, joined))
+                    attempt += 1
+                    continue
+                if attempt > 1:
+                    retry_metrics.incr(label, "recovered")
+                return result
+        return run
+    return decorate
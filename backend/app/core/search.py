@@ -0,0 +1,151 @@
+"""In-memory prefix / token index for product search."""
+import re
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Dict, Iterable, List, Set
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+class ProductSearchIndex:
+    """Sorted term list + postings over product name tokens, SKU and barcode.
+
+    A query token matches every term it prefixes; the token with the
+    narrowest term range (two bisects) drives candidate selection and the
+    remaining tokens are checked per candidate, so lookups stay cheap
+    even for catalogs in the hundreds of thousands.
+
+    Writers call mark_dirty(); the owner reloads dirty SKUs before the
+    next search (see app.models.product.refresh_search_index).
+    """
+
+    MAX_CANDIDATES = 2000      # when other tokens still have to filter the candidates
+    MIN_CANDIDATES = 200       # single-token queries: every candidate matches
+
+    def __init__(self):
+        self._terms: List[str] = []                # sorted, unique
+        self._postings: Dict[str, Set[str]] = {}   # term -> SKUs
+        self._docs: Dict[str, Dict] = {}           # sku -> row (+ "terms")
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---------- maintenance ----------
+    def mark_dirty(self, *skus: str):
+        with self._lock:
+            self._dirty.update(skus)
+
+    def take_dirty(self) -> List[str]:
+        with self._lock:
+            dirty, self._dirty = list(self._dirty), set()
+            return dirty
+
+    def load(self, rows: Iterable[Dict]):
+        """Replace the whole index (rows are active products)."""
+        postings: Dict[str, Set[str]] = {}
+        docs = {}
+        for row in rows:
+            doc = self._doc(row)
+            docs[doc["sku"]] = doc
+            for term in doc["terms"]:
+                postings.setdefault(term, set()).add(doc["sku"])
+        with self._lock:
+            self._postings = postings
+            self._terms = sorted(postings)
+            self._docs = docs
+            self.ready = True
+
+    def upsert(self, skus: Iterable[str], rows: Iterable[Dict]):
+        """Re-index `skus`: those in `rows` are (re)added, the rest removed."""
+        with self._lock:
+            for sku in skus:
+                self._remove(sku)
+            for row in rows:
+                doc = self._doc(row)
+                self._remove(doc["sku"])
+                self._docs[doc["sku"]] = doc
+                for term in doc["terms"]:
+                    posting = self._postings.get(term)
+                    if posting is None:
+                        posting = self._postings[term] = set()
+                        insort(self._terms, term)
+                    posting.add(doc["sku"])
+
+    def _remove(self, sku: str):
+        doc = self._docs.pop(sku, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.discard(sku)
+            if not posting:
+                del self._postings[term]
+                i = bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    del self._terms[i]
+
+    @staticmethod
+    def _doc(row: Dict) -> Dict:
+        doc = dict(row)
+        terms = set(tokenize(doc.get("name")))
+        for key in ("sku", "barcode"):
+            if doc.get(key):
+                terms.add(doc[key].lower())
+                terms.update(tokenize(doc[key]))
+        doc["terms"] = tuple(terms)
+        return doc
+
+    # ---------- search ----------
+    def _range(self, prefix: str):
+        return bisect_left(self._terms, prefix), bisect_left(self._terms, prefix + "\U0010ffff")
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        whole = query.strip().lower()
+        with self._lock:
+            ranges = [(self._range(t), t) for t in tokens]
+            (lo, hi), driver = min(ranges, key=lambda r: r[0][1] - r[0][0])
+            # The full query also prefixes whole SKU / barcode terms (e.g. "abc-12").
+            if whole != driver:
+                whole_lo, whole_hi = self._range(whole)
+                if whole_hi > whole_lo and whole_hi - whole_lo <= hi - lo:
+                    (lo, hi), driver, tokens = (whole_lo, whole_hi), whole, [whole]
+            others = [t for t in tokens if t != driver]
+            cap = self.MAX_CANDIDATES if others else max(self.MIN_CANDIDATES, limit * 5)
+            candidates: Set[str] = set()
+            for i in range(lo, hi):
+                candidates.update(islice(self._postings[self._terms[i]], cap - len(candidates)))
+                if len(candidates) >= cap:
+                    break
+            results = []
+            for sku in candidates:
+                doc = self._docs[sku]
+                if all(any(term.startswith(t) for term in doc["terms"]) for t in others):
+                    results.append((self._score(doc, whole, tokens), doc))
+        results.sort(key=lambda r: (-r[0], len(r[1]["name"]), r[1]["name"]))
+        return [
+            {**{k: v for k, v in doc.items() if k != "terms"}, "score": score}
+            for score, doc in results[:limit]
+        ]
+
+    @staticmethod
+    def _score(doc: Dict, whole: str, tokens: List[str]) -> float:
+        sku = doc["sku"].lower()
+        if whole == sku or whole == (doc.get("barcode") or "").lower():
+            return 100.0
+        if sku.startswith(whole):
+            return 80.0
+        if doc["name"].lower().startswith(whole):
+            return 60.0
+        exact = sum(t in doc["terms"] for t in tokens)
+        return round(40.0 + 10.0 * exact / len(tokens), 2)
@@ -0,0 +1,89 @@
+"""Incremental parsing of CSV / NDJSON request bodies.
+
+Uploads are read chunk by chunk from the ASGI stream, so a large catalog
+file is never held in memory as a whole. Records are yielded as
+(row_number, record, error); exactly one of record / error is set.
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+Record = Tuple[int, Optional[Dict], Optional[str]]
+
+def detect_format(content_type: Optional[str], explicit: Optional[str] = None) -> Optional[str]:
+    """`explicit` (a ?format= value) wins; otherwise sniff the Content-Type."""
+    if explicit:
+        return explicit
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return CSV
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-seq"):
+        return NDJSON
+    return None
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8 (BOM tolerated) and yield lines without terminators."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Rows of a CSV with a header line; empty cells are omitted so schema defaults apply."""
+    header = None
+    row_number = 0
+    pending = ""
+    async for line in iter_lines(chunks):
+        # A quoted field may contain newlines: keep joining until quotes balance.
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            row_number += 1
+            yield row_number, None, f"Malformed CSV: {e}"
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, {k: v.strip() for k, v in zip(header, values) if v.strip() != ""}, None
+    if pending:
+        yield row_number + 1, None, "Malformed CSV: unterminated quoted field"
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """One JSON object per line; blank lines are skipped."""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, record, None
+
+def iter_records(fmt: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    return iter_csv_records(chunks) if fmt == CSV else iter_ndjson_records(chunks)
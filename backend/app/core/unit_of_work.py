@@ -0,0 +1,101 @@
+"""Request-scoped unit of work: one commit per request.
+
+get_db hands routes a UnitOfWork instead of the bare connection. Model
+functions keep calling conn.commit(), but inside a unit of work that only
+marks the request as having work to commit; UnitOfWorkRoute commits it
+once, after the route returns and before the response is sent, so a
+request's writes land together or not at all. An exception anywhere in
+the request rolls everything back (get_db). Outside a request (scripts,
+background tasks) models get a plain connection and commit as before.
+
+Work that must reach the database before the request ends (an idempotency
+claim, a committed batch chunk) uses commit_now(). Side effects that are
+only valid once the data is committed, such as cache invalidation, are
+registered with on_commit(), after conn.commit(), and run right after the
+real commit (dropped on rollback).
+
+Stored procedures that run their own START TRANSACTION/COMMIT implicitly
+commit the request's earlier work: call them first, or on their own.
+"""
+from typing import Callable, List, Tuple
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+
+class UnitOfWork:
+    """A request's connection; delegates to it except for the transaction calls."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.pending = False
+        self._after_commit: List[Tuple[Callable, tuple]] = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        # Joined: the request commits once it is done.
+        self.pending = True
+
+    def commit_now(self):
+        self._conn.commit()
+        self.pending = False
+        callbacks, self._after_commit = self._after_commit, []
+        for fn, args in callbacks:
+            fn(*args)
+
+    def rollback(self):
+        self._conn.rollback()
+        self.pending = False
+        self._after_commit = []
+
+    def after_commit(self, fn: Callable, *args):
+        if self.pending:
+            self._after_commit.append((fn, args))
+        else:
+            fn(*args)   # nothing waiting: the caller's work is already committed
+
+    async def finish(self):
+        """Commit the request's work, if any (called by UnitOfWorkRoute)."""
+        if self.pending:
+            await run_in_threadpool(self.commit_now)
+
+
+def on_commit(conn, fn: Callable, *args):
+    """Run fn(*args) once conn's work is committed: now, on a plain connection."""
+    after_commit = getattr(conn, "after_commit", None)
+    if after_commit is None:
+        fn(*args)
+    else:
+        after_commit(fn, *args)
+
+def commit_now(conn):
+    """Commit immediately, even inside a unit of work."""
+    getattr(conn, "commit_now", conn.commit)()
+
+def register(request: Request, unit_of_work):
+    """Have UnitOfWorkRoute commit `unit_of_work` when the route returns."""
+    if not hasattr(request.state, "units_of_work"):
+        request.state.units_of_work = []
+    request.state.units_of_work.append(unit_of_work)
+
+
+class UnitOfWorkRoute(APIRoute):
+    """Commits the request's units of work before the response is sent.
+
+    Yield dependencies such as get_db only exit after the response has gone
+    out; committing there could report success for a write that then fails.
+    A failed commit raises here instead, so the client gets the error and
+    the dependencies roll back.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def handle(request: Request):
+            response = await handler(request)
+            for unit_of_work in getattr(request.state, "units_of_work", ()):
+                await unit_of_work.finish()
+            return response
+        return handle
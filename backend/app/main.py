@@ -1,21 +1,110 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from mysql.connector.errors import PoolError
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from .api.routes import dashboard
 from .api.routes import auth, products, inventory, sales
 from .core.config import settings
+from .core.database import get_pool, close_pool, close_replica_pool, record_write
+from .models import product as product_model
+from .models import integration as integration_model
+from .models import stock_movement as movement_model
+from .core.instrumentation import start_request_stats, reset_request_stats
+from .core.pagination import NEXT_CURSOR_HEADER
+from .core.idempotency import REPLAYED_HEADER, IdempotentReplay, prune_idempotency_keys
+from .core.retry import LockConflictError
+from .core.async_database import init_async_pool, init_async_replica_pool, close_async_pool
 from .api.routes import replenishment
 from .api.routes import reports
 from .api.routes import integration
 from .api.routes import admin
 
 
+# ----------------------------------------------------------------------
+# Startup / shutdown
+# ----------------------------------------------------------------------
+def run_with_connection(label: str, fn):
+    """Run fn(conn) on a pooled connection outside a request; errors are logged, not raised."""
+    pool = get_pool()
+    try:
+        conn = pool.get_connection()
+    except Exception as e:
+        print(f"⚠️ {label} skipped: {e}")
+        return None
+    try:
+        return fn(conn)
+    except Exception as e:
+        print(f"⚠️ {label} failed: {e}")
+        return None
+    finally:
+        pool.release(conn)
+
+def preload_caches():
+    count = run_with_connection("Product cache preload", product_model.preload_product_cache)
+    if count is not None:
+        print(f"✅ Product cache preloaded with {count} products")
+
+def rebuild_search_index():
+    count = run_with_connection("Product search index build", product_model.rebuild_search_index)
+    if count is not None:
+        print(f"✅ Product search index built with {count} products")
+
+def prune_catalog_versions():
+    run_with_connection("Catalog version prune", product_model.prune_catalog_versions)
+
+def prune_expired_idempotency_keys():
+    run_with_connection("Idempotency key prune", prune_idempotency_keys)
+
+def consolidate_stock_escrow():
+    run_with_connection("Stock escrow consolidation", movement_model.consolidate_stock_escrow)
+
+def flush_api_key_usage():
+    if integration_model.api_key_usage.pending():
+        run_with_connection("API key usage flush", integration_model.flush_api_key_usage)
+
+async def run_periodically(interval: float, fn):
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(fn)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_ASYNC:
+        await init_async_pool()
+        await init_async_replica_pool()
+    if settings.PRODUCT_CACHE_PRELOAD:
+        await run_in_threadpool(preload_caches)
+    if settings.PRODUCT_SEARCH_BACKEND == "memory":
+        await run_in_threadpool(rebuild_search_index)
+    background_tasks = [
+        asyncio.create_task(run_periodically(settings.API_KEY_USAGE_FLUSH_SECONDS, flush_api_key_usage)),
+        asyncio.create_task(run_periodically(settings.CATALOG_VERSION_PRUNE_SECONDS, prune_catalog_versions)),
+        asyncio.create_task(run_periodically(settings.IDEMPOTENCY_PRUNE_SECONDS, prune_expired_idempotency_keys)),
+        asyncio.create_task(run_periodically(settings.STOCK_ESCROW_CONSOLIDATE_SECONDS, consolidate_stock_escrow)),
+    ]
+    if settings.PRODUCT_SEARCH_BACKEND == "memory" and settings.PRODUCT_SEARCH_REBUILD_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            run_periodically(settings.PRODUCT_SEARCH_REBUILD_SECONDS, rebuild_search_index)
+        ))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await run_in_threadpool(flush_api_key_usage)
+    await close_async_pool()
+    close_pool()
+    close_replica_pool()
 
 app = FastAPI(
     title="Smart Inventory System API",
     version="1.0.0",
-    description="Automated stock tracking and predictive replenishment"
+    description="Automated stock tracking and predictive replenishment",
+    lifespan=lifespan
 )
 
 # ----------------------------------------------------------------------
@@ -28,12 +117,41 @@ async def options_middleware(request: Request, call_next):
         response = Response()
         origin = request.headers.get("origin", "*")
         response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, PATCH, DELETE, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-API-Key, X-Read-Consistency, If-None-Match, Idempotency-Key"
         response.headers["Access-Control-Allow-Credentials"] = "true"
         return response
     return await call_next(request)
 
+# ----------------------------------------------------------------------
+# ✅ Query instrumentation: per-request statement count / DB time
+#    (returned as X-DB-* headers in DEBUG mode)
+# ----------------------------------------------------------------------
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    stats, token = start_request_stats(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        reset_request_stats(token)
+    if settings.DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+        if stats.n_plus_one:
+            response.headers["X-DB-N-Plus-One"] = str(len(stats.n_plus_one))
+    return response
+
+# ----------------------------------------------------------------------
+# ✅ Read-your-writes: after a successful write, the same caller's reads
+#    skip the replica for DB_READ_YOUR_WRITES_SECONDS
+# ----------------------------------------------------------------------
+@app.middleware("http")
+async def read_your_writes_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        record_write(request)
+    return response
+
 # ----------------------------------------------------------------------
 # ✅ CORS middleware (backup – still useful for normal responses)
 # ----------------------------------------------------------------------
@@ -43,8 +161,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-N-Plus-One", NEXT_CURSOR_HEADER, "ETag", REPLAYED_HEADER, "Content-Disposition"],
 )
 
+# ----------------------------------------------------------------------
+# ✅ Pool exhaustion → 503 so clients back off instead of seeing a 500
+# ----------------------------------------------------------------------
+@app.exception_handler(PoolError)
+async def pool_error_handler(request: Request, exc: PoolError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+# ----------------------------------------------------------------------
+# ✅ Sale / stock transaction still deadlocked after its retries → 503
+# ----------------------------------------------------------------------
+@app.exception_handler(LockConflictError)
+async def lock_conflict_handler(request: Request, exc: LockConflictError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The stock is busy with other sales, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+# ----------------------------------------------------------------------
+# ✅ Retried write with a completed Idempotency-Key → the stored response
+# ----------------------------------------------------------------------
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay):
+    return Response(
+        content=exc.body,
+        status_code=exc.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
 # ----------------------------------------------------------------------
 # ✅ Include all API routers
 # ----------------------------------------------------------------------
@@ -1,7 +1,11 @@
 from mysql.connector import MySQLConnection
 from typing import List, Dict, Optional
 from datetime import datetime
+from ..core.etag import bump_table_version, table_versions
+from ..core.pagination import Keyset
 from ..core.security import hash_password
+from ..core.unit_of_work import on_commit
+from .user import invalidate_user
 
 # ---------- User Management ----------
 def get_all_users(conn: MySQLConnection) -> List[Dict]:
@@ -94,11 +98,12 @@ def update_user_admin(conn: MySQLConnection, user_id: int, update_data: Dict) ->
         fields.append("is_active = %s")
         values.append(update_data["is_active"])
     
+    affected = 0
     if fields:
         values.append(user_id)
         query = f"UPDATE users SET {', '.join(fields)} WHERE id = %s"
         cursor.execute(query, tuple(values))
-        conn.commit()
+        affected = cursor.rowcount
     
     # Update role if provided
     if "role" in update_data and update_data["role"]:
@@ -110,10 +115,11 @@ def update_user_admin(conn: MySQLConnection, user_id: int, update_data: Dict) ->
         role_row = cursor.fetchone()
         if role_row:
             cursor.execute("INSERT INTO user_roles (user_id, role_id) VALUES (%s, %s)", (user_id, role_row[0]))
-        conn.commit()
     
-    affected = cursor.rowcount
+    # User and role changes are one transaction.
+    conn.commit()
     cursor.close()
+    on_commit(conn, invalidate_user, user_id)
     return affected > 0 or "role" in update_data
 
 def delete_user_admin(conn: MySQLConnection, user_id: int) -> bool:
@@ -123,6 +129,7 @@ def delete_user_admin(conn: MySQLConnection, user_id: int) -> bool:
     conn.commit()
     affected = cursor.rowcount
     cursor.close()
+    on_commit(conn, invalidate_user, user_id)
     return affected > 0
 
 # ---------- System Settings ----------
@@ -152,8 +159,10 @@ def create_setting(conn: MySQLConnection, key: str, value: str, description: str
         VALUES (%s, %s, %s, %s)
     """
     cursor.execute(query, (key, value, description, updated_by))
-    conn.commit()
     setting_id = cursor.lastrowid
+    bump_table_version(conn, "system_settings")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "system_settings")
     cursor.close()
     return setting_id
 
@@ -175,20 +184,27 @@ def update_setting(conn: MySQLConnection, key: str, value: str = None, descripti
     values.append(key)
     query = f"UPDATE system_settings SET {', '.join(fields)} WHERE setting_key = %s"
     cursor.execute(query, tuple(values))
-    conn.commit()
     affected = cursor.rowcount
+    bump_table_version(conn, "system_settings")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "system_settings")
     cursor.close()
     return affected > 0
 
 def delete_setting(conn: MySQLConnection, key: str) -> bool:
     cursor = conn.cursor()
     cursor.execute("DELETE FROM system_settings WHERE setting_key = %s", (key,))
-    conn.commit()
     affected = cursor.rowcount
+    bump_table_version(conn, "system_settings")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "system_settings")
     cursor.close()
     return affected > 0
 
 # ---------- Audit Log ----------
+# Newest first; the id tiebreaker makes the cursor position unique.
+AUDIT_KEYSET = Keyset("audit", (("al.changed_at", "DESC"), ("al.id", "DESC")), ("changed_at", "id"))
+
 def get_audit_logs(
     conn: MySQLConnection,
     table_name: Optional[str] = None,
@@ -197,7 +213,8 @@ def get_audit_logs(
     to_date: Optional[datetime] = None,
     operation: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    after: Optional[List] = None
 ) -> List[Dict]:
     cursor = conn.cursor(dictionary=True)
     query = """
@@ -222,7 +239,12 @@ def get_audit_logs(
     if operation:
         query += " AND al.operation = %s"
         params.append(operation)
-    query += " ORDER BY al.changed_at DESC LIMIT %s OFFSET %s"
+    if after:
+        condition, after_params = AUDIT_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        offset = 0
+    query += AUDIT_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
     params.extend([limit, offset])
     cursor.execute(query, tuple(params))
     results = cursor.fetchall()
@@ -0,0 +1,62 @@
+"""Async variants of app.models.dashboard for the `async def` dashboard routes."""
+from typing import List, Dict, Optional
+from datetime import date
+from ...core.async_database import AsyncConnection
+from ..dashboard import DAILY_SALES_SUMMARY_SELECT
+
+async def get_low_stock_alerts(conn: AsyncConnection) -> List[Dict]:
+    """Fetch all low stock alerts from the low_stock_alerts view."""
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT * FROM low_stock_alerts ORDER BY quantity_in_stock ASC"
+    await cursor.execute(query)
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
+
+async def get_daily_sales_summary(conn: AsyncConnection, target_date: date) -> Optional[Dict]:
+    """Get sales summary for a specific date from the sales rollup tables."""
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(DAILY_SALES_SUMMARY_SELECT, (target_date, target_date))
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result
+
+async def get_current_inventory(conn: AsyncConnection, active_only: bool = True) -> List[Dict]:
+    """Fetch current inventory snapshot from the current_inventory view."""
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT * FROM current_inventory"
+    params = []
+    if active_only:
+        query += " WHERE is_active = %s"
+        params.append(True)
+    query += " ORDER BY name"
+    await cursor.execute(query, tuple(params))
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
+
+async def get_product_performance(conn: AsyncConnection, days: int = 30) -> List[Dict]:
+    """Fetch product performance (last 30 days sales) from the product_performance view."""
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT * FROM product_performance ORDER BY total_sold_30d DESC"
+    await cursor.execute(query)
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
+
+async def get_summary_counts(conn: AsyncConnection) -> Dict:
+    """Active product count, stock value, low-stock and out-of-stock counts in one scan."""
+    cursor = await conn.cursor(dictionary=True)
+    query = """
+        SELECT
+            COUNT(*) AS total_products,
+            COALESCE(SUM(cost_price * quantity_in_stock), 0) AS total_stock_value,
+            COALESCE(SUM(quantity_in_stock <= reorder_threshold), 0) AS low_stock_count,
+            COALESCE(SUM(quantity_in_stock = 0), 0) AS out_of_stock_count
+        FROM products
+        WHERE is_active = TRUE
+    """
+    await cursor.execute(query)
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result
@@ -0,0 +1,25 @@
+"""Async variants of app.models.integration used by the public API key check."""
+from typing import Optional, Dict
+from ...core.async_database import AsyncConnection
+from ...core.cache import cacheable
+from ..integration import api_key_cache, api_key_usage
+
+async def validate_api_key(conn: AsyncConnection, api_key: str) -> Optional[Dict]:
+    """Check if API key is valid and not expired. Record use (flushed later)."""
+    key = api_key_cache.get(api_key)
+    if key is None:
+        version = api_key_cache.version
+        cursor = await conn.cursor(dictionary=True)
+        query = """
+            SELECT * FROM api_keys
+            WHERE api_key = %s AND is_active = TRUE
+            AND (expires_at IS NULL OR expires_at > NOW())
+        """
+        await cursor.execute(query, (api_key,))
+        key = await cursor.fetchone()
+        await cursor.close()
+        if key and cacheable(conn):
+            api_key_cache.put_key(key, version)
+    if key:
+        api_key_usage.touch(key["id"])
+    return key
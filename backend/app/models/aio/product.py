@@ -0,0 +1,411 @@
+"""Async variants of app.models.product for the `async def` product routes."""
+from typing import List, Optional, Dict, Tuple, Type
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from ...core.async_database import AsyncConnection
+from ...core.config import settings
+from ...core.etag import bump_table_version_async, table_versions
+from ...core.cache import cacheable
+from ...core.unit_of_work import on_commit
+from ..product import (
+    product_cache, product_values, PRODUCT_SELECT, PRODUCT_INSERT, PRODUCT_KEYSET,
+    product_search, fulltext_search_params, SEARCH_SELECT,
+    catalog_page, catalog_snapshot, CATALOG_SYNC_SELECT,
+    AUDIT_INSERT, BULK_SNAPSHOT_SELECT, bulk_audit_rows, bulk_diffs, bulk_filter_condition,
+    bulk_patch_update, bulk_set_clause, in_list
+)
+
+# -------------------- CATEGORIES --------------------
+async def create_category(conn: AsyncConnection, name: str, description: str = None) -> int:
+    cursor = await conn.cursor()
+    query = "INSERT INTO categories (name, description) VALUES (%s, %s)"
+    await cursor.execute(query, (name, description))
+    category_id = cursor.lastrowid
+    await bump_table_version_async(conn, "categories")
+    await conn.commit()
+    on_commit(conn, table_versions.invalidate, "categories")
+    await cursor.close()
+    return category_id
+
+async def get_all_categories(conn: AsyncConnection) -> List[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT id, name, description, created_at FROM categories ORDER BY name"
+    await cursor.execute(query)
+    result = await cursor.fetchall()
+    await cursor.close()
+    return result
+
+async def get_category_by_id(conn: AsyncConnection, category_id: int) -> Optional[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT id, name, description, created_at FROM categories WHERE id = %s"
+    await cursor.execute(query, (category_id,))
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result
+
+# -------------------- SUPPLIERS --------------------
+async def create_supplier(conn: AsyncConnection, supplier_data: Dict) -> int:
+    cursor = await conn.cursor()
+    query = """
+        INSERT INTO suppliers (name, contact_person, phone, email, address)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    await cursor.execute(query, (
+        supplier_data["name"],
+        supplier_data.get("contact_person"),
+        supplier_data.get("phone"),
+        supplier_data.get("email"),
+        supplier_data.get("address")
+    ))
+    supplier_id = cursor.lastrowid
+    await bump_table_version_async(conn, "suppliers")
+    await conn.commit()
+    on_commit(conn, table_versions.invalidate, "suppliers")
+    await cursor.close()
+    return supplier_id
+
+async def get_all_suppliers(conn: AsyncConnection) -> List[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT id, name, contact_person, phone, email, address, created_at FROM suppliers ORDER BY name"
+    await cursor.execute(query)
+    result = await cursor.fetchall()
+    await cursor.close()
+    return result
+
+async def get_supplier_by_id(conn: AsyncConnection, supplier_id: int) -> Optional[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT * FROM suppliers WHERE id = %s"
+    await cursor.execute(query, (supplier_id,))
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result
+
+# -------------------- PRODUCTS --------------------
+async def create_product(conn: AsyncConnection, product_data: Dict) -> str:
+    cursor = await conn.cursor()
+    await cursor.execute(PRODUCT_INSERT, product_values(product_data))
+    await conn.commit()
+    on_commit(conn, product_search.mark_dirty, product_data["sku"])
+    await cursor.close()
+    return product_data["sku"]
+
+async def insert_products(conn: AsyncConnection, products: List[Dict]) -> int:
+    """Insert a batch of products in one multi-row statement and one commit."""
+    if not products:
+        return 0
+    cursor = await conn.cursor()
+    await cursor.executemany(PRODUCT_INSERT, [product_values(p) for p in products])
+    await conn.commit_now()    # an imported batch stays imported, whatever the request does next
+    on_commit(conn, product_search.mark_dirty, *(p["sku"] for p in products))
+    await cursor.close()
+    return len(products)
+
+async def find_existing_products(conn: AsyncConnection, skus: List[str], barcodes: List[str]) -> Tuple[set, set]:
+    """Which of the given SKUs and barcodes are already taken (one query)."""
+    conditions, params = [], []
+    if skus:
+        conditions.append(f"sku IN ({', '.join(['%s'] * len(skus))})")
+        params.extend(skus)
+    if barcodes:
+        conditions.append(f"barcode IN ({', '.join(['%s'] * len(barcodes))})")
+        params.extend(barcodes)
+    if not conditions:
+        return set(), set()
+    cursor = await conn.cursor()
+    await cursor.execute(f"SELECT sku, barcode FROM products WHERE {' OR '.join(conditions)}", tuple(params))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return {r[0] for r in rows} & set(skus), {r[1] for r in rows} & set(barcodes)
+
+async def get_reference_ids(conn: AsyncConnection) -> Tuple[set, set]:
+    """All category ids and supplier ids, for validating bulk rows up front."""
+    cursor = await conn.cursor()
+    await cursor.execute("SELECT id FROM categories")
+    category_ids = {r[0] for r in await cursor.fetchall()}
+    await cursor.execute("SELECT id FROM suppliers")
+    supplier_ids = {r[0] for r in await cursor.fetchall()}
+    await cursor.close()
+    return category_ids, supplier_ids
+
+class ProductImport:
+    """Validates streamed rows and inserts them in batches, one transaction per batch.
+
+    Rows are validated with `schema` (the route's ProductCreate); call add()
+    per row, then flush() once the upload ends. `result` is the import report.
+    """
+
+    def __init__(self, conn: AsyncConnection, schema: Type[BaseModel], category_ids: set, supplier_ids: set):
+        self.conn = conn
+        self.schema = schema
+        self.category_ids = category_ids
+        self.supplier_ids = supplier_ids
+        self.seen_skus = set()
+        self.seen_barcodes = set()
+        self.pending = []   # (row, product) awaiting the next batch insert
+        self.result = {"received": 0, "imported": 0, "failed": 0, "errors": []}
+
+    def fail(self, row: int, sku: Optional[str], errors: List[str]):
+        self.result["failed"] += 1
+        if len(self.result["errors"]) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+            self.result["errors"].append({"row": row, "sku": sku, "errors": errors})
+
+    async def add(self, row: int, record: Optional[Dict], error: Optional[str]):
+        self.result["received"] += 1
+        if error:
+            self.fail(row, None, [error])
+            return
+        try:
+            product = self.schema.model_validate(record).model_dump()
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+            self.fail(row, record.get("sku"), errors)
+            return
+        sku, barcode = product["sku"], product.get("barcode")
+        errors = []
+        if sku in self.seen_skus:
+            errors.append("Duplicate SKU in upload")
+        if barcode and barcode in self.seen_barcodes:
+            errors.append("Duplicate barcode in upload")
+        if product.get("category_id") is not None and product["category_id"] not in self.category_ids:
+            errors.append("Unknown category_id")
+        if product.get("supplier_id") is not None and product["supplier_id"] not in self.supplier_ids:
+            errors.append("Unknown supplier_id")
+        if errors:
+            self.fail(row, sku, errors)
+            return
+        self.seen_skus.add(sku)
+        if barcode:
+            self.seen_barcodes.add(barcode)
+        self.pending.append((row, product))
+        if len(self.pending) >= settings.PRODUCT_IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        taken_skus, taken_barcodes = await find_existing_products(
+            self.conn,
+            [product["sku"] for _, product in batch],
+            [product["barcode"] for _, product in batch if product.get("barcode")],
+        )
+        rows = []
+        for row, product in batch:
+            errors = []
+            if product["sku"] in taken_skus:
+                errors.append("SKU already exists")
+            if product.get("barcode") in taken_barcodes:
+                errors.append("Barcode already exists")
+            if errors:
+                self.fail(row, product["sku"], errors)
+            else:
+                rows.append((row, product))
+        try:
+            self.result["imported"] += await insert_products(self.conn, [p for _, p in rows])
+        except Exception as e:
+            # e.g. a concurrent insert took a SKU after the existence check
+            await self.conn.rollback()
+            for row, product in rows:
+                self.fail(row, product["sku"], [f"Batch insert failed: {str(e)}"])
+
+async def get_product_by_sku(conn: AsyncConnection, sku: str) -> Optional[Dict]:
+    product = product_cache.get(sku)
+    if product is not None:
+        return product
+    version = product_cache.version
+    cursor = await conn.cursor(dictionary=True)
+    query = PRODUCT_SELECT + " WHERE p.sku = %s"
+    await cursor.execute(query, (sku,))
+    product = await cursor.fetchone()
+    await cursor.close()
+    if product and cacheable(conn):
+        product_cache.put(product, version)
+    return product
+
+async def get_product_by_barcode(conn: AsyncConnection, barcode: str) -> Optional[Dict]:
+    product = product_cache.get_by_barcode(barcode)
+    if product is not None:
+        return product
+    version = product_cache.version
+    cursor = await conn.cursor(dictionary=True)
+    query = PRODUCT_SELECT + " WHERE p.barcode = %s"
+    await cursor.execute(query, (barcode,))
+    product = await cursor.fetchone()
+    await cursor.close()
+    if product and cacheable(conn):
+        product_cache.put(product, version)
+    return product
+
+async def get_all_products(
+    conn: AsyncConnection,
+    skip: int = 0,
+    limit: int = 100,
+    active_only: bool = True,
+    after: Optional[List] = None
+) -> List[Dict]:
+    """List products by name; `after` (a decoded cursor) replaces `skip`."""
+    cursor = await conn.cursor(dictionary=True)
+    query = """
+        SELECT p.*,
+               c.name as category_name,
+               s.name as supplier_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN suppliers s ON p.supplier_id = s.id
+        WHERE 1=1
+    """
+    params = []
+    if active_only:
+        query += " AND p.is_active = %s"
+        params.append(True)
+    if after:
+        condition, after_params = PRODUCT_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        skip = 0
+    query += PRODUCT_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
+    params.extend([limit, skip])
+    await cursor.execute(query, tuple(params))
+    products = await cursor.fetchall()
+    await cursor.close()
+    return products
+
+async def update_product(conn: AsyncConnection, sku: str, update_data: Dict) -> bool:
+    cursor = await conn.cursor()
+    fields = []
+    values = []
+    for key, value in update_data.items():
+        if value is not None and key in ['name', 'barcode', 'category_id', 'supplier_id',
+                                         'cost_price', 'selling_price', 'reorder_threshold', 'is_active']:
+            fields.append(f"{key} = %s")
+            values.append(value)
+    if not fields:
+        await cursor.close()
+        return False
+    values.append(sku)
+    query = f"UPDATE products SET {', '.join(fields)} WHERE sku = %s"
+    await cursor.execute(query, tuple(values))
+    await conn.commit()
+    on_commit(conn, product_cache.invalidate, sku)
+    on_commit(conn, product_search.mark_dirty, sku)
+    affected = cursor.rowcount
+    await cursor.close()
+    return affected > 0
+
+async def delete_product(conn: AsyncConnection, sku: str) -> bool:
+    # Soft delete: set is_active = FALSE
+    cursor = await conn.cursor()
+    query = "UPDATE products SET is_active = FALSE WHERE sku = %s"
+    await cursor.execute(query, (sku,))
+    await conn.commit()
+    on_commit(conn, product_cache.invalidate, sku)
+    on_commit(conn, product_search.mark_dirty, sku)
+    affected = cursor.rowcount
+    await cursor.close()
+    return affected > 0
+
+# -------------------- BULK UPDATE --------------------
+async def bulk_update_products(
+    conn: AsyncConnection,
+    filters: Optional[Dict],
+    changes: Optional[Dict],
+    patches: List[Dict],
+    user_id: Optional[int],
+    dry_run: bool = False
+) -> Dict:
+    """Apply filter-based changes and/or per-SKU patches in one transaction.
+
+    See app.models.product.bulk_update_products.
+    """
+    cursor = await conn.cursor(dictionary=True)
+    before, not_found, diffs = {}, [], []
+    try:
+        if filters and changes:
+            condition, params = bulk_filter_condition(filters)
+            await cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE {condition} FOR UPDATE", tuple(params))
+            before.update({row["sku"]: row for row in await cursor.fetchall()})
+            set_sql, set_params = bulk_set_clause(changes)
+            if before and set_sql:
+                await cursor.execute(f"UPDATE products SET {set_sql} WHERE {condition}", tuple(set_params + params))
+        if patches:
+            merged = {}
+            for patch in patches:
+                merged.setdefault(patch["sku"], {}).update(patch)
+            skus = list(merged)
+            await cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE sku IN {in_list(skus)} FOR UPDATE", tuple(skus))
+            current = {row["sku"]: row for row in await cursor.fetchall()}
+            not_found = [sku for sku in skus if sku not in current]
+            for sku, row in current.items():
+                before.setdefault(sku, row)
+            query, params = bulk_patch_update(merged, current)
+            if query:
+                await cursor.execute(query, tuple(params))
+        if before:
+            skus = list(before)
+            await cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE sku IN {in_list(skus)}", tuple(skus))
+            diffs = bulk_diffs(before, await cursor.fetchall())
+        if diffs:
+            await cursor.executemany(AUDIT_INSERT, bulk_audit_rows(diffs, user_id))
+        if dry_run:
+            await conn.rollback()
+        else:
+            await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        await cursor.close()
+    if diffs and not dry_run:
+        on_commit(conn, product_cache.invalidate, *(d["sku"] for d in diffs))
+        on_commit(conn, product_search.mark_dirty, *(d["sku"] for d in diffs))
+    return {"affected": len(diffs), "not_found": not_found, "dry_run": dry_run, "diffs": diffs}
+
+# -------------------- SEARCH --------------------
+async def get_search_rows(conn: AsyncConnection, skus: Optional[List[str]] = None) -> List[Dict]:
+    """Indexed columns of active products (all, or just `skus`)."""
+    cursor = await conn.cursor(dictionary=True)
+    if skus is None:
+        await cursor.execute(SEARCH_SELECT)
+    else:
+        await cursor.execute(f"{SEARCH_SELECT} AND sku IN {in_list(skus)}", tuple(skus))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return rows
+
+async def refresh_search_index(conn: AsyncConnection):
+    """Build the index on first use, then re-read only SKUs marked dirty since."""
+    if not product_search.ready:
+        product_search.take_dirty()
+        rows = await get_search_rows(conn)
+        await run_in_threadpool(product_search.load, rows)   # CPU-bound for large catalogs
+        return
+    dirty = product_search.take_dirty()
+    if dirty:
+        product_search.upsert(dirty, await get_search_rows(conn, dirty))
+
+async def search_products_fulltext(conn: AsyncConnection, query: str, limit: int = 20) -> List[Dict]:
+    statement = fulltext_search_params(query, limit)
+    if statement is None:
+        return []
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(*statement)
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return rows
+
+# -------------------- CATALOG SYNC --------------------
+async def get_catalog_changes(conn: AsyncConnection, since: int, limit: int) -> Dict:
+    """Products created, updated (incl. price / stock) or deactivated after `since`."""
+    cursor = await conn.cursor(dictionary=True)
+    query = CATALOG_SYNC_SELECT + " WHERE catalog_version > %s ORDER BY catalog_version LIMIT %s"
+    await cursor.execute(query, (settings.CATALOG_SYNC_SETTLE_SECONDS, since, limit))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return catalog_page(rows, since, limit)
+
+async def get_catalog_snapshot(conn: AsyncConnection) -> Dict:
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(CATALOG_SYNC_SELECT + " WHERE is_active = TRUE", (settings.CATALOG_SYNC_SETTLE_SECONDS,))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return catalog_snapshot(rows)
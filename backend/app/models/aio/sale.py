@@ -0,0 +1,142 @@
+"""Async variants of app.models.sale for the `async def` sales routes."""
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+import json
+from ...core.async_database import AsyncConnection
+from ...core.retry import is_lock_conflict, retry_transaction
+from ...core.unit_of_work import on_commit
+from ..product import in_list, product_cache
+from ..sale import (
+    DAILY_SUMMARY_SELECT, EXISTING_SALES_SELECT, ITEMS_FULL, RECORD_SALE_CALL, SALE_CREATED, SALE_FAILED,
+    SALE_STOCK_SELECT, TRANSACTION_BY_ID_SELECT, TRANSACTION_ITEMS_SELECT, TRANSACTION_KEYSET,
+    attach_transaction_items, batch_precheck, batch_summary, chunk_skus, failed_sale_outcome,
+    fill_transaction_ids, sale_item_problem, sale_outcome, transaction_items_query, transactions_query
+)
+
+async def check_sale_items(conn: AsyncConnection, items: List[Dict]) -> Optional[Tuple[int, str]]:
+    skus = list({item["sku"] for item in items})
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(SALE_STOCK_SELECT + in_list(skus), tuple(skus))
+    stock = {row["sku"]: row for row in await cursor.fetchall()}
+    await cursor.close()
+    return sale_item_problem(stock, items)
+
+@retry_transaction("create_sale")
+async def create_sale(
+    conn: AsyncConnection,
+    transaction_number: str,
+    user_id: int,
+    transaction_date: datetime,
+    items: List[Dict]
+) -> Optional[Dict]:
+    """Call the ProcessSale stored procedure; returns the transaction with its items."""
+    cursor = await conn.cursor(dictionary=True)
+
+    # Convert items list to JSON string as expected by the procedure
+    items_json = json.dumps(items)
+
+    await cursor.callproc("ProcessSale", (transaction_number, user_id, transaction_date, items_json))
+
+    # Result sets: the transaction header, then its line items
+    transaction = await cursor.fetchone()
+    if transaction is not None:
+        transaction["items"] = list(await cursor.fetchall()) if await cursor.nextset() else []
+
+    await conn.commit()
+    await cursor.close()
+    on_commit(conn, product_cache.invalidate, *(item["sku"] for item in items))
+    return transaction
+
+async def get_transaction_by_id(conn: AsyncConnection, transaction_id: int) -> Optional[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(TRANSACTION_BY_ID_SELECT, (transaction_id,))
+    transaction = await cursor.fetchone()
+    await cursor.close()
+    return transaction
+
+async def get_transaction_items(conn: AsyncConnection, transaction_id: int) -> List[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(TRANSACTION_ITEMS_SELECT.format("(%s)"), (transaction_id,))
+    items = await cursor.fetchall()
+    await cursor.close()
+    return items
+
+async def load_transaction_items(conn: AsyncConnection, transactions: List[Dict], mode: str = ITEMS_FULL) -> List[Dict]:
+    query, params = transaction_items_query(transactions, mode)
+    rows = []
+    if query:
+        cursor = await conn.cursor(dictionary=True)
+        await cursor.execute(query, params)
+        rows = await cursor.fetchall()
+        await cursor.close()
+    return attach_transaction_items(transactions, rows, mode)
+
+async def get_transactions(
+    conn: AsyncConnection,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: Optional[List] = None
+) -> List[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(*transactions_query(from_date, to_date, limit, offset, after))
+    transactions = await cursor.fetchall()
+    await cursor.close()
+    return transactions
+
+async def get_daily_summary(conn: AsyncConnection, date: datetime) -> Optional[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(DAILY_SUMMARY_SELECT, (date,))
+    summary = await cursor.fetchone()
+    await cursor.close()
+    return summary
+
+# -------------------- BATCH INGESTION --------------------
+@retry_transaction("record_sale_chunk")
+async def record_sale_chunk(conn: AsyncConnection, sales: List[Dict], user_id: int) -> List[Dict]:
+    numbers = [sale["transaction_number"] for sale in sales]
+    skus = chunk_skus(sales)
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(EXISTING_SALES_SELECT + in_list(numbers), tuple(numbers))
+    existing = {row["transaction_number"]: row["id"] for row in await cursor.fetchall()}
+    await cursor.execute(SALE_STOCK_SELECT + in_list(skus), tuple(skus))
+    stock = {row["sku"]: row for row in await cursor.fetchall()}
+
+    outcomes = []
+    for sale in sales:
+        outcome = batch_precheck(sale, existing, stock)
+        if outcome is None:
+            await cursor.execute("SAVEPOINT batch_sale")
+            try:
+                await cursor.execute(RECORD_SALE_CALL, (sale["transaction_number"], user_id,
+                                                        sale["transaction_date"], json.dumps(sale["items"])))
+                outcome = sale_outcome(sale, SALE_CREATED)
+                existing[sale["transaction_number"]] = None
+            except Exception as e:
+                if is_lock_conflict(e):
+                    raise
+                await cursor.execute("ROLLBACK TO SAVEPOINT batch_sale")
+                outcome = failed_sale_outcome(sale, e)
+        outcomes.append(outcome)
+
+    created = [o["transaction_number"] for o in outcomes if o["status"] == SALE_CREATED]
+    if created:
+        await cursor.execute(EXISTING_SALES_SELECT + in_list(created), tuple(created))
+        fill_transaction_ids(outcomes, await cursor.fetchall())
+    await conn.commit_now()    # a recorded chunk stays recorded, whatever the request does next
+    await cursor.close()
+    on_commit(conn, product_cache.invalidate, *skus)
+    return outcomes
+
+async def process_sale_batch(conn: AsyncConnection, sales: List[Dict], user_id: int, chunk_size: int) -> Dict:
+    outcomes: List[Dict] = []
+    for start in range(0, len(sales), chunk_size):
+        chunk = sales[start:start + chunk_size]
+        try:
+            outcomes.extend(await record_sale_chunk(conn, chunk, user_id))
+        except Exception as e:
+            await conn.rollback()
+            outcomes.extend(sale_outcome(sale, SALE_FAILED, detail=str(e)) for sale in sales[start:])
+            break
+    return batch_summary(outcomes)
@@ -0,0 +1,125 @@
+"""Async variants of app.models.stock_movement for the `async def` inventory routes."""
+from typing import List, Dict, Optional
+from ...core.async_database import AsyncConnection
+from ..product import product_cache
+from ...core.config import settings
+from ...core.retry import retry_transaction
+from ...core.unit_of_work import on_commit
+from ..stock_movement import (
+    APPLY_STOCK_MOVEMENT, MOVEMENT_KEYSET, MOVEMENT_TYPES_SELECT, STOCK_ESCROW_SELECT,
+    rejected_movement, stock_movements_query
+)
+
+async def get_movement_types(conn: AsyncConnection) -> List[Dict]:
+    """List all movement types (id, name, description, sign)."""
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(MOVEMENT_TYPES_SELECT + " ORDER BY name")
+    types = await cursor.fetchall()
+    await cursor.close()
+    return types
+
+async def get_movement_type(conn: AsyncConnection, movement_name: str) -> Optional[Dict]:
+    """Get a movement type (id and sign) by name in a single lookup."""
+    cursor = await conn.cursor(dictionary=True)
+    query = "SELECT id, sign FROM movement_types WHERE name = %s"
+    await cursor.execute(query, (movement_name,))
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result
+
+async def get_movement_type_id(conn: AsyncConnection, movement_name: str) -> Optional[int]:
+    """Get movement_type_id by name (sale, receipt, adjustment, return, damage)."""
+    movement_type = await get_movement_type(conn, movement_name)
+    return movement_type["id"] if movement_type else None
+
+async def apply_stock_movement(
+    conn: AsyncConnection,
+    sku: str,
+    movement_type: str,
+    quantity: int,
+    reference_id: Optional[str],
+    reason: Optional[str],
+    user_id: int
+) -> Dict:
+    """Returns {"movement_id", "new_quantity"}; raises StockMovementRejected."""
+    cursor = await conn.cursor(dictionary=True)
+    try:
+        await cursor.callproc(APPLY_STOCK_MOVEMENT, (sku, movement_type, quantity, reference_id, reason, user_id))
+        row = await cursor.fetchone()
+    except Exception as e:
+        rejected = rejected_movement(e)
+        if rejected is None:
+            raise
+        raise rejected from e
+    finally:
+        await cursor.close()
+    if row is None:
+        raise RuntimeError(f"{APPLY_STOCK_MOVEMENT} returned no result for {sku}")
+    await conn.commit()
+    on_commit(conn, product_cache.invalidate, sku)
+    return {"movement_id": row["movement_id"], "new_quantity": row["new_quantity"]}
+
+@retry_transaction("create_stock_receipt")
+async def create_stock_receipt(
+    conn: AsyncConnection,
+    sku: str,
+    quantity: int,
+    reference_id: Optional[str],
+    user_id: int
+) -> Dict:
+    return await apply_stock_movement(conn, sku, "receipt", quantity, reference_id, None, user_id)
+
+@retry_transaction("create_stock_adjustment")
+async def create_stock_adjustment(
+    conn: AsyncConnection,
+    sku: str,
+    quantity: int,
+    movement_type: str,  # 'adjustment', 'damage', 'return'
+    reason: Optional[str],
+    user_id: int
+) -> Dict:
+    return await apply_stock_movement(conn, sku, movement_type, quantity, None, reason, user_id)
+
+async def get_stock_movements(
+    conn: AsyncConnection,
+    product_sku: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: Optional[List] = None
+) -> List[Dict]:
+    """Get stock movement history, optionally filtered by product.
+
+    `after` (a decoded cursor) replaces `offset`.
+    """
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(*stock_movements_query(product_sku, limit, offset, after))
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
+
+async def get_product_stock_level(conn: AsyncConnection, sku: str) -> Optional[int]:
+    """Get current quantity in stock for a product."""
+    cursor = await conn.cursor()
+    query = "SELECT quantity_in_stock FROM products WHERE sku = %s"
+    await cursor.execute(query, (sku,))
+    result = await cursor.fetchone()
+    await cursor.close()
+    return result[0] if result else None
+
+# -------------------- HOT-SKU ESCROW --------------------
+@retry_transaction("set_stock_escrow")
+async def set_stock_escrow(conn: AsyncConnection, sku: str, slots: int):
+    """Consolidate `sku` and split its stock over `slots` slots (0 turns escrow off)."""
+    cursor = await conn.cursor()
+    await cursor.callproc("ConsolidateStockEscrow", (sku, slots, settings.STOCK_ESCROW_MIN_PER_SLOT))
+    await conn.commit()
+    await cursor.close()
+    on_commit(conn, product_cache.invalidate, sku)
+
+async def get_stock_escrow(conn: AsyncConnection) -> List[Dict]:
+    """Hot SKUs with their slot count and unconsolidated sales."""
+    cursor = await conn.cursor(dictionary=True)
+    await cursor.execute(STOCK_ESCROW_SELECT)
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
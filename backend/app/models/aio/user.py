@@ -0,0 +1,32 @@
+"""Async variants of app.models.user used by the auth dependencies."""
+from typing import Optional, Dict
+from ...core.async_database import AsyncConnection
+from ...core.cache import cacheable
+from ..user import user_cache
+
+async def get_user_by_id(conn: AsyncConnection, user_id: int) -> Optional[Dict]:
+    cursor = await conn.cursor(dictionary=True)
+    query = """
+        SELECT u.id, u.username, u.email, u.is_active,
+               GROUP_CONCAT(r.name) as roles
+        FROM users u
+        LEFT JOIN user_roles ur ON u.id = ur.user_id
+        LEFT JOIN roles r ON ur.role_id = r.id
+        WHERE u.id = %s
+        GROUP BY u.id
+    """
+    await cursor.execute(query, (user_id,))
+    user = await cursor.fetchone()
+    await cursor.close()
+    return user
+
+async def get_user_principal(conn: AsyncConnection, user_id: int) -> Optional[Dict]:
+    """get_user_by_id through the principal cache (used by authentication)."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    version = user_cache.version
+    user = await get_user_by_id(conn, user_id)
+    if user and cacheable(conn):
+        user_cache.put(user_id, user, version)
+    return user
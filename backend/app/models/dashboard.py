@@ -11,11 +11,24 @@ def get_low_stock_alerts(conn: MySQLConnection) -> List[Dict]:
     cursor.close()
     return results
 
+# Same columns as the daily_sales_summary view, read straight from the
+# rollup shards for one day (no row when nothing was sold).
+DAILY_SALES_SUMMARY_SELECT = """
+    SELECT
+        sale_date AS transaction_date,
+        SUM(transaction_count) AS transaction_count,
+        (SELECT COUNT(*) FROM sales_daily_sku_rollup WHERE sale_date = %s) AS unique_products_sold,
+        SUM(items_sold) AS total_items_sold,
+        SUM(revenue) AS total_revenue
+    FROM sales_daily_rollup
+    WHERE sale_date = %s
+    GROUP BY sale_date
+"""
+
 def get_daily_sales_summary(conn: MySQLConnection, target_date: date) -> Optional[Dict]:
-    """Get sales summary for a specific date from the daily_sales_summary view."""
+    """Get sales summary for a specific date from the sales rollup tables."""
     cursor = conn.cursor(dictionary=True)
-    query = "SELECT * FROM daily_sales_summary WHERE transaction_date = %s"
-    cursor.execute(query, (target_date,))
+    cursor.execute(DAILY_SALES_SUMMARY_SELECT, (target_date, target_date))
     result = cursor.fetchone()
     cursor.close()
     return result
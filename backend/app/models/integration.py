@@ -1,9 +1,97 @@
 # app/models/integration.py
 import json
 import secrets
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from mysql.connector import MySQLConnection
+from ..core.cache import TTLCache, cacheable
+from ..core.config import settings
+from ..core.unit_of_work import on_commit
+
+# ----------------------------------------------------------------------
+# API key cache and write-behind usage tracking
+# ----------------------------------------------------------------------
+class ApiKeyCache(TTLCache):
+    """Validated api_keys rows keyed by key string, with an id -> key index
+    so revoke/regenerate (which only know the id) can invalidate them."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._by_id: Dict[int, str] = {}
+
+    def put_key(self, key: Dict, version: int = None):
+        ttl = None
+        if key.get("expires_at"):
+            # Never serve a key from cache past its own expiry.
+            ttl = (key["expires_at"] - datetime.now()).total_seconds()
+        self.put(key["api_key"], key, version, ttl)
+
+    def invalidate_id(self, key_id: int):
+        with self._lock:
+            api_key = self._by_id.get(key_id)
+        # invalidate() always bumps the version, so an in-flight lookup of
+        # this key is not cached even when it is not cached yet.
+        keys = [api_key] if api_key else []
+        self.invalidate(*keys)
+
+    def _on_store(self, api_key: str, key: Dict):
+        self._by_id[key["id"]] = api_key
+
+    def _on_drop(self, api_key: str, key: Dict):
+        if self._by_id.get(key["id"]) == api_key:
+            del self._by_id[key["id"]]
+
+api_key_cache = ApiKeyCache(settings.API_KEY_CACHE_SIZE, settings.API_KEY_CACHE_TTL)
+
+
+class ApiKeyUsage:
+    """Coalesces last_used_at updates in memory; flush() writes them in one batch."""
+
+    def __init__(self):
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self.flushed = 0
+
+    def touch(self, key_id: int):
+        with self._lock:
+            self._pending[key_id] = datetime.now()
+
+    def discard(self, key_id: int):
+        with self._lock:
+            self._pending.pop(key_id, None)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, conn: MySQLConnection) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                "UPDATE api_keys SET last_used_at = %s WHERE id = %s",
+                [(used_at, key_id) for key_id, used_at in batch.items()]
+            )
+            conn.commit()
+        except Exception:
+            # Put the batch back (newer touches win) so the next flush retries it.
+            with self._lock:
+                for key_id, used_at in batch.items():
+                    self._pending.setdefault(key_id, used_at)
+            raise
+        finally:
+            cursor.close()
+        self.flushed += len(batch)
+        return len(batch)
+
+api_key_usage = ApiKeyUsage()
+
+def flush_api_key_usage(conn: MySQLConnection) -> int:
+    """Write coalesced last_used_at values; called periodically and at shutdown."""
+    return api_key_usage.flush(conn)
 
 # ----------------------------------------------------------------------
 # API Keys
@@ -31,11 +119,12 @@ def create_api_key(
         VALUES (%s, %s, %s, %s)
     """
     cursor.execute(query, (name, api_key, expires_at, created_by))
-    conn.commit()
     key_id = cursor.lastrowid
     
+    # Read back in the same transaction (defaults, created_at), then commit.
     cursor.execute("SELECT * FROM api_keys WHERE id = %s", (key_id,))
     result = cursor.fetchone()
+    conn.commit()
     cursor.close()
     return result
 
@@ -60,6 +149,7 @@ def revoke_api_key(conn: MySQLConnection, key_id: int) -> bool:
     cursor = conn.cursor()
     cursor.execute("UPDATE api_keys SET is_active = FALSE WHERE id = %s", (key_id,))
     conn.commit()
+    on_commit(conn, api_key_cache.invalidate_id, key_id)
     affected = cursor.rowcount
     cursor.close()
     return affected > 0
@@ -73,26 +163,31 @@ def regenerate_api_key(conn: MySQLConnection, key_id: int) -> Optional[Dict]:
         (new_key, key_id)
     )
     conn.commit()
+    on_commit(conn, api_key_cache.invalidate_id, key_id)
+    on_commit(conn, api_key_usage.discard, key_id)
     cursor.execute("SELECT * FROM api_keys WHERE id = %s", (key_id,))
     result = cursor.fetchone()
     cursor.close()
     return result
 
 def validate_api_key(conn: MySQLConnection, api_key: str) -> Optional[Dict]:
-    """Check if API key is valid and not expired. Update last_used_at."""
-    cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT * FROM api_keys
-        WHERE api_key = %s AND is_active = TRUE
-        AND (expires_at IS NULL OR expires_at > NOW())
-    """
-    cursor.execute(query, (api_key,))
-    key = cursor.fetchone()
+    """Check if API key is valid and not expired. Record use (flushed later)."""
+    key = api_key_cache.get(api_key)
+    if key is None:
+        version = api_key_cache.version
+        cursor = conn.cursor(dictionary=True)
+        query = """
+            SELECT * FROM api_keys
+            WHERE api_key = %s AND is_active = TRUE
+            AND (expires_at IS NULL OR expires_at > NOW())
+        """
+        cursor.execute(query, (api_key,))
+        key = cursor.fetchone()
+        cursor.close()
+        if key and cacheable(conn):
+            api_key_cache.put_key(key, version)
     if key:
-        # Update last used
-        cursor.execute("UPDATE api_keys SET last_used_at = NOW() WHERE id = %s", (key['id'],))
-        conn.commit()
-    cursor.close()
+        api_key_usage.touch(key["id"])
     return key
 
 # ----------------------------------------------------------------------
@@ -1,13 +1,86 @@
 from mysql.connector import MySQLConnection
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from decimal import Decimal
+import json
+from ..core.cache import TTLCache, cacheable
+from ..core.config import settings
+from ..core.etag import bump_table_version, table_versions
+from ..core.pagination import Keyset
+from ..core.search import ProductSearchIndex, tokenize
+from ..core.unit_of_work import commit_now, on_commit
+
+# -------------------- PRODUCT CACHE --------------------
+class ProductCache(TTLCache):
+    """Product rows keyed by SKU, with a barcode -> SKU index.
+
+    Product, sale and stock-movement writes in this process invalidate the
+    affected SKUs; the TTL bounds staleness from writes made elsewhere
+    (other workers, direct SQL).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._barcodes: Dict[str, str] = {}
+
+    def put(self, product: Dict, version: int = None):
+        super().put(product["sku"], product, version)
+
+    def get_by_barcode(self, barcode: str) -> Optional[Dict]:
+        with self._lock:
+            sku = self._barcodes.get(barcode)
+            if sku is None:
+                self.misses += 1
+                return None
+        return self.get(sku)
+
+    def _on_store(self, sku: str, product: Dict):
+        if product.get("barcode"):
+            self._barcodes[product["barcode"]] = sku
+
+    def _on_drop(self, sku: str, product: Dict):
+        barcode = product.get("barcode")
+        if barcode and self._barcodes.get(barcode) == sku:
+            del self._barcodes[barcode]
+
+product_cache = ProductCache(settings.PRODUCT_CACHE_SIZE, settings.PRODUCT_CACHE_TTL)
+
+# Active-catalog search index; product writes mark SKUs dirty (see refresh_search_index)
+product_search = ProductSearchIndex()
+
+PRODUCT_SELECT = """
+    SELECT p.*,
+           c.name as category_name,
+           s.name as supplier_name
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    LEFT JOIN suppliers s ON p.supplier_id = s.id
+"""
+
+# Listing order; the SKU tiebreaker makes the cursor position unique.
+PRODUCT_KEYSET = Keyset("products", (("p.name", "ASC"), ("p.sku", "ASC")), ("name", "sku"))
+
+def preload_product_cache(conn: MySQLConnection) -> int:
+    """Warm the cache with the active catalog (up to PRODUCT_CACHE_SIZE rows)."""
+    if not product_cache.enabled:
+        return 0
+    version = product_cache.version
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(PRODUCT_SELECT + " WHERE p.is_active = TRUE LIMIT %s", (product_cache.maxsize,))
+    products = cursor.fetchall()
+    cursor.close()
+    for product in products:
+        product_cache.put(product, version)
+    return len(products)
 
 # -------------------- CATEGORIES --------------------
 def create_category(conn: MySQLConnection, name: str, description: str = None) -> int:
     cursor = conn.cursor()
     query = "INSERT INTO categories (name, description) VALUES (%s, %s)"
     cursor.execute(query, (name, description))
-    conn.commit()
     category_id = cursor.lastrowid
+    bump_table_version(conn, "categories")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "categories")
     cursor.close()
     return category_id
 
@@ -41,8 +114,10 @@ def create_supplier(conn: MySQLConnection, supplier_data: Dict) -> int:
         supplier_data.get("email"),
         supplier_data.get("address")
     ))
-    conn.commit()
     supplier_id = cursor.lastrowid
+    bump_table_version(conn, "suppliers")
+    conn.commit()
+    on_commit(conn, table_versions.invalidate, "suppliers")
     cursor.close()
     return supplier_id
 
@@ -63,14 +138,15 @@ def get_supplier_by_id(conn: MySQLConnection, supplier_id: int) -> Optional[Dict
     return result
 
 # -------------------- PRODUCTS --------------------
-def create_product(conn: MySQLConnection, product_data: Dict) -> str:
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO products (sku, barcode, name, category_id, supplier_id,
-                              cost_price, selling_price, quantity_in_stock, reorder_threshold, is_active)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    cursor.execute(query, (
+PRODUCT_INSERT = """
+    INSERT INTO products (sku, barcode, name, category_id, supplier_id,
+                          cost_price, selling_price, quantity_in_stock, reorder_threshold, is_active)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def product_values(product_data: Dict) -> tuple:
+    """Parameters for PRODUCT_INSERT, applying the column defaults."""
+    return (
         product_data["sku"],
         product_data["barcode"],
         product_data["name"],
@@ -81,41 +157,90 @@ def create_product(conn: MySQLConnection, product_data: Dict) -> str:
         product_data.get("quantity_in_stock", 0),
         product_data.get("reorder_threshold", 5),
         product_data.get("is_active", True)
-    ))
+    )
+
+def create_product(conn: MySQLConnection, product_data: Dict) -> str:
+    cursor = conn.cursor()
+    cursor.execute(PRODUCT_INSERT, product_values(product_data))
     conn.commit()
+    on_commit(conn, product_search.mark_dirty, product_data["sku"])
     cursor.close()
     return product_data["sku"]
 
+def insert_products(conn: MySQLConnection, products: List[Dict]) -> int:
+    """Insert a batch of products in one multi-row statement and one commit."""
+    if not products:
+        return 0
+    cursor = conn.cursor()
+    cursor.executemany(PRODUCT_INSERT, [product_values(p) for p in products])
+    commit_now(conn)    # an imported batch stays imported, whatever the request does next
+    on_commit(conn, product_search.mark_dirty, *(p["sku"] for p in products))
+    cursor.close()
+    return len(products)
+
+def find_existing_products(conn: MySQLConnection, skus: List[str], barcodes: List[str]) -> Tuple[set, set]:
+    """Which of the given SKUs and barcodes are already taken (one query)."""
+    conditions, params = [], []
+    if skus:
+        conditions.append(f"sku IN ({', '.join(['%s'] * len(skus))})")
+        params.extend(skus)
+    if barcodes:
+        conditions.append(f"barcode IN ({', '.join(['%s'] * len(barcodes))})")
+        params.extend(barcodes)
+    if not conditions:
+        return set(), set()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT sku, barcode FROM products WHERE {' OR '.join(conditions)}", tuple(params))
+    rows = cursor.fetchall()
+    cursor.close()
+    return {r[0] for r in rows} & set(skus), {r[1] for r in rows} & set(barcodes)
+
+def get_reference_ids(conn: MySQLConnection) -> Tuple[set, set]:
+    """All category ids and supplier ids, for validating bulk rows up front."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM categories")
+    category_ids = {r[0] for r in cursor.fetchall()}
+    cursor.execute("SELECT id FROM suppliers")
+    supplier_ids = {r[0] for r in cursor.fetchall()}
+    cursor.close()
+    return category_ids, supplier_ids
+
 def get_product_by_sku(conn: MySQLConnection, sku: str) -> Optional[Dict]:
+    product = product_cache.get(sku)
+    if product is not None:
+        return product
+    version = product_cache.version
     cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT p.*, 
-               c.name as category_name, 
-               s.name as supplier_name
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN suppliers s ON p.supplier_id = s.id
-        WHERE p.sku = %s
-    """
+    query = PRODUCT_SELECT + " WHERE p.sku = %s"
     cursor.execute(query, (sku,))
     product = cursor.fetchone()
     cursor.close()
+    if product and cacheable(conn):
+        product_cache.put(product, version)
     return product
 
 def get_product_by_barcode(conn: MySQLConnection, barcode: str) -> Optional[Dict]:
+    product = product_cache.get_by_barcode(barcode)
+    if product is not None:
+        return product
+    version = product_cache.version
     cursor = conn.cursor(dictionary=True)
-    query = "SELECT * FROM products WHERE barcode = %s"
+    query = PRODUCT_SELECT + " WHERE p.barcode = %s"
     cursor.execute(query, (barcode,))
     product = cursor.fetchone()
     cursor.close()
+    if product and cacheable(conn):
+        product_cache.put(product, version)
     return product
 
 def get_all_products(
     conn: MySQLConnection, 
     skip: int = 0, 
     limit: int = 100,
-    active_only: bool = True
+    active_only: bool = True,
+    after: Optional[List] = None
 ) -> List[Dict]:
+    """List products by name; `after` (a decoded cursor) replaces `skip`."""
     cursor = conn.cursor(dictionary=True)
     query = """
         SELECT p.*, 
@@ -130,7 +255,12 @@ def get_all_products(
     if active_only:
         query += " AND p.is_active = %s"
         params.append(True)
-    query += " ORDER BY p.name LIMIT %s OFFSET %s"
+    if after:
+        condition, after_params = PRODUCT_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        skip = 0
+    query += PRODUCT_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
     params.extend([limit, skip])
     cursor.execute(query, tuple(params))
     products = cursor.fetchall()
@@ -152,6 +282,8 @@ def update_product(conn: MySQLConnection, sku: str, update_data: Dict) -> bool:
     query = f"UPDATE products SET {', '.join(fields)} WHERE sku = %s"
     cursor.execute(query, tuple(values))
     conn.commit()
+    on_commit(conn, product_cache.invalidate, sku)
+    on_commit(conn, product_search.mark_dirty, sku)
     affected = cursor.rowcount
     cursor.close()
     return affected > 0
@@ -162,6 +294,285 @@ def delete_product(conn: MySQLConnection, sku: str) -> bool:
     query = "UPDATE products SET is_active = FALSE WHERE sku = %s"
     cursor.execute(query, (sku,))
     conn.commit()
+    on_commit(conn, product_cache.invalidate, sku)
+    on_commit(conn, product_search.mark_dirty, sku)
     affected = cursor.rowcount
     cursor.close()
-    return affected > 0
\ No newline at end of file
+    return affected > 0
+
+# -------------------- BULK UPDATE --------------------
+BULK_UPDATE_FIELDS = ['name', 'category_id', 'supplier_id', 'cost_price', 'selling_price',
+                      'reorder_threshold', 'is_active']
+
+BULK_SNAPSHOT_SELECT = """
+    SELECT sku, name, category_id, supplier_id, cost_price, selling_price, reorder_threshold, is_active
+    FROM products
+"""
+
+AUDIT_INSERT = """
+    INSERT INTO audit_log (table_name, operation, record_id, old_data, new_data, changed_by)
+    VALUES ('products', 'UPDATE', %s, %s, %s, %s)
+"""
+
+def in_list(values: List) -> str:
+    return f"({', '.join(['%s'] * len(values))})"
+
+def bulk_filter_condition(filters: Dict) -> Tuple[str, list]:
+    """WHERE clause for a bulk-update filter (category / supplier / SKU list)."""
+    clauses, params = [], []
+    if filters.get("category_id") is not None:
+        clauses.append("category_id = %s")
+        params.append(filters["category_id"])
+    if filters.get("supplier_id") is not None:
+        clauses.append("supplier_id = %s")
+        params.append(filters["supplier_id"])
+    if filters.get("skus"):
+        clauses.append(f"sku IN {in_list(filters['skus'])}")
+        params.extend(filters["skus"])
+    if filters.get("active_only"):
+        clauses.append("is_active = TRUE")
+    return " AND ".join(clauses), params
+
+def bulk_set_clause(changes: Dict) -> Tuple[str, list]:
+    """SET clause for filter-based changes; price_change_percent scales selling_price in SQL."""
+    fields, values = [], []
+    for key in BULK_UPDATE_FIELDS:
+        if changes.get(key) is not None:
+            fields.append(f"{key} = %s")
+            values.append(changes[key])
+    if changes.get("price_change_percent") is not None:
+        fields.append("selling_price = ROUND(selling_price * %s, 2)")
+        values.append(1 + Decimal(str(changes["price_change_percent"])) / 100)
+    return ", ".join(fields), values
+
+def bulk_patch_update(patches: Dict[str, Dict], current: Dict[str, Dict]) -> Tuple[Optional[str], list]:
+    """One UPDATE ... JOIN over a derived table holding every patched row.
+
+    Each row carries the union of patched columns; columns a patch leaves
+    out keep their current (locked) value.
+    """
+    fields = [f for f in BULK_UPDATE_FIELDS if any(patch.get(f) is not None for patch in patches.values())]
+    skus = [sku for sku in patches if sku in current]
+    if not fields or not skus:
+        return None, []
+    selects, params = [], []
+    for i, sku in enumerate(skus):
+        row = {**current[sku], **{k: v for k, v in patches[sku].items() if v is not None}}
+        columns = ["%s AS sku"] + [f"%s AS {f}" for f in fields] if i == 0 else ["%s"] * (len(fields) + 1)
+        selects.append("SELECT " + ", ".join(columns))
+        params.append(sku)
+        params.extend(row[f] for f in fields)
+    query = (
+        f"UPDATE products p JOIN ({' UNION ALL '.join(selects)}) v ON p.sku = v.sku "
+        f"SET {', '.join(f'p.{f} = v.{f}' for f in fields)}"
+    )
+    return query, params
+
+def bulk_diffs(before: Dict[str, Dict], after: List[Dict]) -> List[Dict]:
+    """Changed columns per product, in SKU order."""
+    diffs = []
+    for row in sorted(after, key=lambda r: r["sku"]):
+        old = before[row["sku"]]
+        changed = [f for f in BULK_UPDATE_FIELDS if old[f] != row[f]]
+        if changed:
+            diffs.append({
+                "sku": row["sku"],
+                "before": {f: old[f] for f in changed},
+                "after": {f: row[f] for f in changed},
+            })
+    return diffs
+
+def bulk_audit_rows(diffs: List[Dict], user_id: Optional[int]) -> List[tuple]:
+    return [
+        (d["sku"], json.dumps(d["before"], default=str), json.dumps(d["after"], default=str), user_id)
+        for d in diffs
+    ]
+
+def bulk_update_products(
+    conn: MySQLConnection,
+    filters: Optional[Dict],
+    changes: Optional[Dict],
+    patches: List[Dict],
+    user_id: Optional[int],
+    dry_run: bool = False
+) -> Dict:
+    """Apply filter-based changes and/or per-SKU patches in one transaction.
+
+    Target rows are locked (SELECT ... FOR UPDATE) to snapshot their
+    before-values, each kind of change is one UPDATE statement, and the
+    audit_log rows for all changed products go in one multi-row INSERT.
+    A dry run returns the same diffs and rolls back.
+    """
+    cursor = conn.cursor(dictionary=True)
+    before, not_found, diffs = {}, [], []
+    try:
+        if filters and changes:
+            condition, params = bulk_filter_condition(filters)
+            cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE {condition} FOR UPDATE", tuple(params))
+            before.update({row["sku"]: row for row in cursor.fetchall()})
+            set_sql, set_params = bulk_set_clause(changes)
+            if before and set_sql:
+                cursor.execute(f"UPDATE products SET {set_sql} WHERE {condition}", tuple(set_params + params))
+        if patches:
+            merged = {}
+            for patch in patches:
+                merged.setdefault(patch["sku"], {}).update(patch)
+            skus = list(merged)
+            cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE sku IN {in_list(skus)} FOR UPDATE", tuple(skus))
+            current = {row["sku"]: row for row in cursor.fetchall()}
+            not_found = [sku for sku in skus if sku not in current]
+            for sku, row in current.items():
+                before.setdefault(sku, row)
+            query, params = bulk_patch_update(merged, current)
+            if query:
+                cursor.execute(query, tuple(params))
+        if before:
+            skus = list(before)
+            cursor.execute(f"{BULK_SNAPSHOT_SELECT} WHERE sku IN {in_list(skus)}", tuple(skus))
+            diffs = bulk_diffs(before, cursor.fetchall())
+        if diffs:
+            cursor.executemany(AUDIT_INSERT, bulk_audit_rows(diffs, user_id))
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    if diffs and not dry_run:
+        on_commit(conn, product_cache.invalidate, *(d["sku"] for d in diffs))
+        on_commit(conn, product_search.mark_dirty, *(d["sku"] for d in diffs))
+    return {"affected": len(diffs), "not_found": not_found, "dry_run": dry_run, "diffs": diffs}
+
+# -------------------- SEARCH --------------------
+SEARCH_SELECT = "SELECT sku, barcode, name, selling_price FROM products WHERE is_active = TRUE"
+
+def get_search_rows(conn: MySQLConnection, skus: Optional[List[str]] = None) -> List[Dict]:
+    """Indexed columns of active products (all, or just `skus`)."""
+    cursor = conn.cursor(dictionary=True)
+    if skus is None:
+        cursor.execute(SEARCH_SELECT)
+    else:
+        cursor.execute(f"{SEARCH_SELECT} AND sku IN {in_list(skus)}", tuple(skus))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def rebuild_search_index(conn: MySQLConnection) -> int:
+    """Reload the whole index; also picks up writes made by other workers."""
+    product_search.take_dirty()
+    product_search.load(get_search_rows(conn))
+    return len(product_search)
+
+def refresh_search_index(conn: MySQLConnection):
+    """Build the index on first use, then re-read only SKUs marked dirty since."""
+    if not product_search.ready:
+        rebuild_search_index(conn)
+        return
+    dirty = product_search.take_dirty()
+    if dirty:
+        product_search.upsert(dirty, get_search_rows(conn, dirty))
+
+def fulltext_search_params(query: str, limit: int) -> Optional[Tuple[str, tuple]]:
+    """Query and params for the FULLTEXT backend (PRODUCT_SEARCH_BACKEND=fulltext)."""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    whole = query.strip()
+    boolean = " ".join(f"+{t}*" for t in tokens)
+    like = whole.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    sql = """
+        SELECT sku, barcode, name, selling_price,
+               CASE WHEN sku = %s OR barcode = %s THEN 100
+                    WHEN sku LIKE %s THEN 80
+                    ELSE MATCH(name, sku, barcode) AGAINST (%s IN BOOLEAN MODE) END AS score
+        FROM products
+        WHERE is_active = TRUE
+          AND (MATCH(name, sku, barcode) AGAINST (%s IN BOOLEAN MODE) OR sku LIKE %s OR barcode = %s)
+        ORDER BY score DESC, CHAR_LENGTH(name), name
+        LIMIT %s
+    """
+    return sql, (whole, whole, like, boolean, boolean, like, whole, limit)
+
+def search_products_fulltext(conn: MySQLConnection, query: str, limit: int = 20) -> List[Dict]:
+    statement = fulltext_search_params(query, limit)
+    if statement is None:
+        return []
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(*statement)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+# -------------------- CATALOG SYNC --------------------
+# Every product insert/update gets the next catalog_version (triggers 4.5/4.6).
+# Versions are allocated before commit, so a terminal's cursor only advances
+# past rows that have settled (unchanged for CATALOG_SYNC_SETTLE_SECONDS);
+# newer rows are still returned and simply sent again on the next sync.
+CATALOG_SYNC_COLUMNS = ["sku", "barcode", "name", "category_id", "selling_price",
+                        "quantity_in_stock", "is_active", "catalog_version"]
+
+CATALOG_SYNC_SELECT = f"""
+    SELECT {", ".join(CATALOG_SYNC_COLUMNS)},
+           updated_at <= NOW() - INTERVAL %s SECOND AS settled
+    FROM products
+"""
+
+def catalog_page(rows: List[Dict], since: int, limit: int) -> Dict:
+    """Compact change page; rows are ordered by catalog_version."""
+    version = since
+    for row in rows:
+        if not row["settled"]:
+            break
+        version = row["catalog_version"]
+    return {
+        "version": version,
+        "has_more": len(rows) == limit,     # a full page: more changes may follow
+        "columns": CATALOG_SYNC_COLUMNS,
+        "rows": [[row[c] for c in CATALOG_SYNC_COLUMNS] for row in rows],
+    }
+
+def catalog_snapshot(rows: List[Dict]) -> Dict:
+    """Compact snapshot; `version` is where the terminal's delta sync resumes."""
+    fresh = [row["catalog_version"] for row in rows if not row["settled"]]
+    if fresh:
+        version = min(fresh) - 1
+    else:
+        version = max((row["catalog_version"] for row in rows), default=0)
+    return {
+        "version": version,
+        "has_more": False,
+        "columns": CATALOG_SYNC_COLUMNS,
+        "rows": [[row[c] for c in CATALOG_SYNC_COLUMNS] for row in rows],
+    }
+
+def get_catalog_changes(conn: MySQLConnection, since: int, limit: int) -> Dict:
+    """Products created, updated (incl. price / stock) or deactivated after `since`."""
+    cursor = conn.cursor(dictionary=True)
+    query = CATALOG_SYNC_SELECT + " WHERE catalog_version > %s ORDER BY catalog_version LIMIT %s"
+    cursor.execute(query, (settings.CATALOG_SYNC_SETTLE_SECONDS, since, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return catalog_page(rows, since, limit)
+
+def get_catalog_snapshot(conn: MySQLConnection) -> Dict:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(CATALOG_SYNC_SELECT + " WHERE is_active = TRUE", (settings.CATALOG_SYNC_SETTLE_SECONDS,))
+    rows = cursor.fetchall()
+    cursor.close()
+    return catalog_snapshot(rows)
+
+def prune_catalog_versions(conn: MySQLConnection) -> int:
+    """Drop allocated sequence rows, keeping the newest so AUTO_INCREMENT never rewinds."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM catalog_version_seq")
+    (latest,) = cursor.fetchone()
+    deleted = 0
+    if latest:
+        cursor.execute("DELETE FROM catalog_version_seq WHERE id < %s", (latest,))
+        deleted = cursor.rowcount
+        conn.commit()
+    cursor.close()
+    return deleted
@@ -1,6 +1,7 @@
 from mysql.connector import MySQLConnection
 from typing import List, Dict, Optional
 from datetime import datetime
+from ..core.pagination import Keyset
 
 def generate_suggestions(
     conn: MySQLConnection,
@@ -17,13 +18,24 @@ def generate_suggestions(
     conn.commit()
     cursor.close()
 
+# Newest run first, biggest orders first; the id tiebreaker makes the cursor position unique.
+SUGGESTION_KEYSET = Keyset(
+    "suggestions",
+    (("rs.date_generated", "DESC"), ("rs.suggested_quantity", "DESC"), ("rs.id", "DESC")),
+    ("date_generated", "suggested_quantity", "id"),
+)
+
 def get_suggestions(
     conn: MySQLConnection,
     active_only: bool = True,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    after: Optional[List] = None
 ) -> List[Dict]:
-    """Fetch replenishment suggestions with product details."""
+    """Fetch replenishment suggestions with product details.
+
+    `after` (a decoded cursor) replaces `offset`.
+    """
     cursor = conn.cursor(dictionary=True)
     query = """
         SELECT 
@@ -37,7 +49,12 @@ def get_suggestions(
     params = []
     if active_only:
         query += " AND rs.is_acted_upon = FALSE"
-    query += " ORDER BY rs.date_generated DESC, rs.suggested_quantity DESC LIMIT %s OFFSET %s"
+    if after:
+        condition, after_params = SUGGESTION_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        offset = 0
+    query += SUGGESTION_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
     params.extend([limit, offset])
     cursor.execute(query, tuple(params))
     results = cursor.fetchall()
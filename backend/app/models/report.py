@@ -1,5 +1,5 @@
 from mysql.connector import MySQLConnection
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import date, timedelta
 
 def get_sales_report(
@@ -13,25 +13,23 @@ def get_sales_report(
     
     # Determine SQL grouping
     if group_by == "day":
-        group_expr = "transaction_date"
-        order = "transaction_date"
+        group_expr = "sale_date"
     elif group_by == "week":
-        group_expr = "DATE_SUB(transaction_date, INTERVAL WEEKDAY(transaction_date) DAY)"
-        order = "week_start"
+        group_expr = "DATE_SUB(sale_date, INTERVAL WEEKDAY(sale_date) DAY)"
     else:  # month
-        group_expr = "DATE_FORMAT(transaction_date, '%Y-%m-01')"
-        order = "month_start"
+        group_expr = "DATE_FORMAT(sale_date, '%Y-%m-01')"
     
+    # Pre-aggregated per day (and shard) by the sales rollup triggers
     query = f"""
         SELECT
             {group_expr} AS period,
-            COUNT(DISTINCT id) AS transaction_count,
-            COALESCE(SUM(total_items_sold), 0) AS items_sold,
-            COALESCE(SUM(total_revenue), 0) AS revenue
-        FROM daily_sales_summary
-        WHERE transaction_date BETWEEN %s AND %s
+            COALESCE(SUM(transaction_count), 0) AS transaction_count,
+            COALESCE(SUM(items_sold), 0) AS items_sold,
+            COALESCE(SUM(revenue), 0) AS revenue
+        FROM sales_daily_rollup
+        WHERE sale_date BETWEEN %s AND %s
         GROUP BY period
-        ORDER BY {order}
+        ORDER BY period
     """
     cursor.execute(query, (from_date, to_date))
     results = cursor.fetchall()
@@ -86,6 +84,50 @@ def get_stock_movement_report(
     cursor.close()
     return results
 
+# Streamed by app.core.export: oldest first along idx_created_at, no limit.
+STOCK_MOVEMENT_EXPORT_SELECT = """
+    SELECT
+        sm.id,
+        sm.created_at AS datetime,
+        p.sku AS product_sku,
+        p.name AS product_name,
+        mt.name AS movement_type,
+        sm.quantity,
+        sm.previous_quantity,
+        sm.new_quantity,
+        sm.reason,
+        u.username AS performed_by
+    FROM stock_movements sm
+    JOIN products p ON sm.product_sku = p.sku
+    JOIN movement_types mt ON sm.movement_type_id = mt.id
+    LEFT JOIN users u ON sm.created_by = u.id
+    WHERE 1=1
+"""
+
+def stock_movement_export_query(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    product_sku: Optional[str] = None,
+    movement_type: Optional[str] = None
+) -> Tuple[str, tuple]:
+    """The stock movement report's filters, as a range scan on created_at."""
+    query = STOCK_MOVEMENT_EXPORT_SELECT
+    params = []
+    if from_date:
+        query += " AND sm.created_at >= %s"
+        params.append(from_date)
+    if to_date:
+        query += " AND sm.created_at < %s + INTERVAL 1 DAY"
+        params.append(to_date)
+    if product_sku:
+        query += " AND sm.product_sku = %s"
+        params.append(product_sku)
+    if movement_type:
+        query += " AND mt.name = %s"
+        params.append(movement_type)
+    query += " ORDER BY sm.created_at, sm.id"
+    return query, tuple(params)
+
 def get_product_performance_report(
     conn: MySQLConnection,
     sort_by: str = "total_sold_30d",
@@ -1,16 +1,56 @@
 from mysql.connector import MySQLConnection
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime
 import json
+from ..core.pagination import Keyset
+from ..core.retry import is_lock_conflict, mysql_error_code, retry_transaction
+from ..core.unit_of_work import commit_now, on_commit
+from .product import in_list, product_cache
 
+SALE_STOCK_SELECT = "SELECT sku, is_active, quantity_in_stock FROM products WHERE sku IN "
+
+def sale_item_problem(stock: Dict[str, Dict], items: List[Dict], check_stock: bool = True) -> Optional[Tuple[int, str]]:
+    """(status, detail) for the first line that cannot be sold, or None.
+
+    `stock` maps SKU -> row of SALE_STOCK_SELECT. Quantities of repeated
+    SKUs are summed, since ProcessSale deducts every line from the same row.
+    """
+    requested: Dict[str, int] = {}
+    for item in items:
+        requested[item["sku"]] = requested.get(item["sku"], 0) + item["quantity"]
+    for sku, quantity in requested.items():
+        product = stock.get(sku)
+        if not product:
+            return 404, f"Product with SKU '{sku}' not found"
+        if not product["is_active"]:
+            return 400, f"Product '{sku}' is inactive and cannot be sold"
+        if check_stock and product["quantity_in_stock"] < quantity:
+            return 400, (f"Insufficient stock for product '{sku}': "
+                         f"{product['quantity_in_stock']} available, {quantity} requested")
+    return None
+
+def check_sale_items(conn: MySQLConnection, items: List[Dict]) -> Optional[Tuple[int, str]]:
+    """Validate every line of a basket with one query (see sale_item_problem).
+
+    Stock is read without locking; the sale_line_items trigger still
+    enforces it under lock, this only rejects hopeless baskets early.
+    """
+    skus = list({item["sku"] for item in items})
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(SALE_STOCK_SELECT + in_list(skus), tuple(skus))
+    stock = {row["sku"]: row for row in cursor.fetchall()}
+    cursor.close()
+    return sale_item_problem(stock, items)
+
+@retry_transaction("create_sale")
 def create_sale(
     conn: MySQLConnection,
     transaction_number: str,
     user_id: int,
     transaction_date: datetime,
     items: List[Dict]
-) -> int:
-    """Call the ProcessSale stored procedure."""
+) -> Optional[Dict]:
+    """Call the ProcessSale stored procedure; returns the transaction with its items."""
     cursor = conn.cursor()
     
     # Convert items list to JSON string as expected by the procedure
@@ -18,69 +58,124 @@ def create_sale(
     
     cursor.callproc("ProcessSale", (transaction_number, user_id, transaction_date, items_json))
     
-    # Fetch the result (transaction_id)
-    result = cursor.stored_results()
-    transaction_id = None
-    for res in result:
-        row = res.fetchone()
-        if row:
-            transaction_id = row[0]
+    # Result sets: the transaction header, then its line items
+    result_sets = [
+        [dict(zip(res.column_names, row)) for row in res.fetchall()]
+        for res in cursor.stored_results()
+    ]
+    transaction = result_sets[0][0] if result_sets and result_sets[0] else None
+    if transaction is not None:
+        transaction["items"] = result_sets[1] if len(result_sets) > 1 else []
     
     conn.commit()
     cursor.close()
-    return transaction_id
+    on_commit(conn, product_cache.invalidate, *(item["sku"] for item in items))
+    return transaction
+
+TRANSACTION_BY_ID_SELECT = """
+    SELECT
+        st.*,
+        u.username
+    FROM sale_transactions st
+    JOIN users u ON st.user_id = u.id
+    WHERE st.id = %s
+"""
 
 def get_transaction_by_id(conn: MySQLConnection, transaction_id: int) -> Optional[Dict]:
     cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT 
-            st.*,
-            u.username
-        FROM sale_transactions st
-        JOIN users u ON st.user_id = u.id
-        WHERE st.id = %s
-    """
-    cursor.execute(query, (transaction_id,))
+    cursor.execute(TRANSACTION_BY_ID_SELECT, (transaction_id,))
     transaction = cursor.fetchone()
     cursor.close()
     return transaction
 
 def get_transaction_items(conn: MySQLConnection, transaction_id: int) -> List[Dict]:
     cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT 
-            sli.*,
-            p.name as product_name
-        FROM sale_line_items sli
-        JOIN products p ON sli.product_sku = p.sku
-        WHERE sli.transaction_id = %s
-    """
-    cursor.execute(query, (transaction_id,))
+    cursor.execute(TRANSACTION_ITEMS_SELECT.format("(%s)"), (transaction_id,))
     items = cursor.fetchall()
     cursor.close()
     return items
 
-def get_transactions(
-    conn: MySQLConnection,
+# How much line-item detail a transaction listing carries.
+ITEMS_FULL, ITEMS_COUNT, ITEMS_NONE = "full", "count", "none"
+
+TRANSACTION_ITEMS_SELECT = """
+    SELECT
+        sli.*,
+        p.name as product_name
+    FROM sale_line_items sli
+    JOIN products p ON sli.product_sku = p.sku
+    WHERE sli.transaction_id IN {}
+    ORDER BY sli.transaction_id, sli.id
+"""
+
+TRANSACTION_ITEM_COUNTS_SELECT = """
+    SELECT transaction_id, COUNT(*) AS item_count, SUM(quantity) AS total_quantity
+    FROM sale_line_items
+    WHERE transaction_id IN {}
+    GROUP BY transaction_id
+"""
+
+def transaction_items_query(transactions: List[Dict], mode: str) -> Tuple[Optional[str], tuple]:
+    """One statement covering a page of transactions (None when nothing to load)."""
+    ids = [t["id"] for t in transactions]
+    if not ids or mode == ITEMS_NONE:
+        return None, ()
+    template = TRANSACTION_ITEMS_SELECT if mode == ITEMS_FULL else TRANSACTION_ITEM_COUNTS_SELECT
+    return template.format(in_list(ids)), tuple(ids)
+
+def attach_transaction_items(transactions: List[Dict], rows: List[Dict], mode: str) -> List[Dict]:
+    """Group the rows of transaction_items_query onto their transactions."""
+    if mode == ITEMS_FULL:
+        grouped: Dict[int, List[Dict]] = {t["id"]: [] for t in transactions}
+        for row in rows:
+            grouped[row["transaction_id"]].append(row)
+        for t in transactions:
+            t["items"] = grouped[t["id"]]
+    elif mode == ITEMS_COUNT:
+        counts = {row["transaction_id"]: row for row in rows}
+        for t in transactions:
+            row = counts.get(t["id"])
+            t["item_count"] = row["item_count"] if row else 0
+            t["total_quantity"] = int(row["total_quantity"]) if row else 0
+    return transactions
+
+def load_transaction_items(conn: MySQLConnection, transactions: List[Dict], mode: str = ITEMS_FULL) -> List[Dict]:
+    """Attach line items (or counts) to a page of transactions with a single query."""
+    query, params = transaction_items_query(transactions, mode)
+    rows = []
+    if query:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return attach_transaction_items(transactions, rows, mode)
+
+# Newest first; the id tiebreaker makes the cursor position unique.
+TRANSACTION_KEYSET = Keyset("transactions", (("st.transaction_date", "DESC"), ("st.id", "DESC")), ("transaction_date", "id"))
+
+TRANSACTION_LIST_SELECT = """
+    SELECT
+        st.id,
+        st.transaction_number,
+        st.user_id,
+        u.username,
+        st.total_amount,
+        st.transaction_date,
+        st.created_at
+    FROM sale_transactions st
+    JOIN users u ON st.user_id = u.id
+    WHERE 1=1
+"""
+
+def transactions_query(
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     limit: int = 100,
-    offset: int = 0
-) -> List[Dict]:
-    cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT 
-            st.id,
-            st.transaction_number,
-            st.user_id,
-            u.username,
-            st.total_amount,
-            st.transaction_date,
-            st.created_at
-        FROM sale_transactions st
-        JOIN users u ON st.user_id = u.id
-        WHERE 1=1
-    """
+    offset: int = 0,
+    after: Optional[List] = None
+) -> Tuple[str, tuple]:
+    """A page of transactions, newest first; `after` (a decoded cursor) replaces `offset`."""
+    query = TRANSACTION_LIST_SELECT
     params = []
     if from_date:
         query += " AND st.transaction_date >= %s"
@@ -88,28 +183,267 @@ def get_transactions(
     if to_date:
         query += " AND st.transaction_date <= %s"
         params.append(to_date)
-    query += " ORDER BY st.transaction_date DESC LIMIT %s OFFSET %s"
+    if after:
+        condition, after_params = TRANSACTION_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        offset = 0
+    query += TRANSACTION_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
     params.extend([limit, offset])
-    cursor.execute(query, tuple(params))
+    return query, tuple(params)
+
+def get_transactions(
+    conn: MySQLConnection,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: Optional[List] = None
+) -> List[Dict]:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(*transactions_query(from_date, to_date, limit, offset, after))
     transactions = cursor.fetchall()
     cursor.close()
     return transactions
 
+DAILY_SUMMARY_SELECT = """
+    SELECT
+        COALESCE(SUM(transaction_count), 0) as total_transactions,
+        COALESCE(SUM(revenue), 0) as total_revenue,
+        COALESCE(SUM(items_sold), 0) as total_items_sold
+    FROM sales_daily_rollup
+    WHERE sale_date = DATE(%s)
+"""
+
 def get_daily_summary(conn: MySQLConnection, date: datetime) -> Optional[Dict]:
+    """Totals for one day from the sales_daily_rollup shards."""
     cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT 
-            COUNT(DISTINCT id) as total_transactions,
-            COALESCE(SUM(total_amount), 0) as total_revenue,
-            COALESCE(SUM((
-                SELECT SUM(quantity) 
-                FROM sale_line_items 
-                WHERE transaction_id = st.id
-            )), 0) as total_items_sold
-        FROM sale_transactions st
-        WHERE DATE(st.transaction_date) = DATE(%s)
-    """
-    cursor.execute(query, (date,))
+    cursor.execute(DAILY_SUMMARY_SELECT, (date,))
     summary = cursor.fetchone()
     cursor.close()
-    return summary
\ No newline at end of file
+    return summary
+
+# -------------------- BATCH INGESTION --------------------
+# Offline POS replays: chunks of sales per transaction, one savepoint per
+# sale, so a rejected sale is rolled back without losing its neighbours.
+SALE_CREATED, SALE_DUPLICATE, SALE_REJECTED, SALE_FAILED = "created", "duplicate", "rejected", "failed"
+
+RECORD_SALE_CALL = "CALL RecordSale(%s, %s, %s, %s, @batch_sale_id)"
+EXISTING_SALES_SELECT = "SELECT transaction_number, id FROM sale_transactions WHERE transaction_number IN "
+
+# MySQL errors that reject one sale; anything else aborts the chunk.
+ER_DUP_ENTRY = 1062
+ER_NO_REFERENCED_ROW = 1452
+ER_SIGNAL_EXCEPTION = 1644        # SIGNAL in the stock trigger
+ER_CHECK_CONSTRAINT_VIOLATED = 3819
+
+def sale_outcome(sale: Dict, status: str, transaction_id: Optional[int] = None, detail: Optional[str] = None) -> Dict:
+    return {"transaction_number": sale["transaction_number"], "status": status,
+            "transaction_id": transaction_id, "detail": detail}
+
+def batch_precheck(sale: Dict, existing: Dict[str, Optional[int]], stock: Dict[str, Dict]) -> Optional[Dict]:
+    """Outcome for a sale that must not be recorded (replay or unknown / inactive SKU).
+
+    Stock levels are left to the trigger: they change as the chunk is applied.
+    """
+    if sale["transaction_number"] in existing:
+        return sale_outcome(sale, SALE_DUPLICATE, existing[sale["transaction_number"]])
+    problem = sale_item_problem(stock, sale["items"], check_stock=False)
+    return sale_outcome(sale, SALE_REJECTED, detail=problem[1]) if problem else None
+
+def failed_sale_outcome(sale: Dict, error: Exception) -> Dict:
+    """Outcome for a RecordSale error, or re-raise if it is not about this sale."""
+    code = mysql_error_code(error)
+    if code == ER_DUP_ENTRY:
+        return sale_outcome(sale, SALE_DUPLICATE)    # recorded concurrently by another replay
+    if code in (ER_SIGNAL_EXCEPTION, ER_NO_REFERENCED_ROW, ER_CHECK_CONSTRAINT_VIOLATED):
+        message = getattr(error, "msg", None) or (error.args[-1] if error.args else str(error))
+        return sale_outcome(sale, SALE_REJECTED, detail=str(message))
+    raise error
+
+def fill_transaction_ids(outcomes: List[Dict], rows: List[Dict]) -> List[Dict]:
+    ids = {row["transaction_number"]: row["id"] for row in rows}
+    for outcome in outcomes:
+        if outcome["transaction_id"] is None and outcome["status"] in (SALE_CREATED, SALE_DUPLICATE):
+            outcome["transaction_id"] = ids.get(outcome["transaction_number"])
+    return outcomes
+
+def batch_summary(outcomes: List[Dict]) -> Dict:
+    counts = {status: 0 for status in (SALE_CREATED, SALE_DUPLICATE, SALE_REJECTED, SALE_FAILED)}
+    for outcome in outcomes:
+        counts[outcome["status"]] += 1
+    return {"created": counts[SALE_CREATED], "duplicates": counts[SALE_DUPLICATE],
+            "rejected": counts[SALE_REJECTED], "failed": counts[SALE_FAILED], "results": outcomes}
+
+def chunk_skus(sales: List[Dict]) -> List[str]:
+    return list({item["sku"] for sale in sales for item in sale["items"]})
+
+@retry_transaction("record_sale_chunk")
+def record_sale_chunk(conn: MySQLConnection, sales: List[Dict], user_id: int) -> List[Dict]:
+    """Record `sales` in one transaction; returns one outcome per sale, in order."""
+    numbers = [sale["transaction_number"] for sale in sales]
+    skus = chunk_skus(sales)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(EXISTING_SALES_SELECT + in_list(numbers), tuple(numbers))
+    existing = {row["transaction_number"]: row["id"] for row in cursor.fetchall()}
+    cursor.execute(SALE_STOCK_SELECT + in_list(skus), tuple(skus))
+    stock = {row["sku"]: row for row in cursor.fetchall()}
+
+    outcomes = []
+    for sale in sales:
+        outcome = batch_precheck(sale, existing, stock)
+        if outcome is None:
+            cursor.execute("SAVEPOINT batch_sale")
+            try:
+                cursor.execute(RECORD_SALE_CALL, (sale["transaction_number"], user_id,
+                                                  sale["transaction_date"], json.dumps(sale["items"])))
+                outcome = sale_outcome(sale, SALE_CREATED)
+                existing[sale["transaction_number"]] = None    # later copies in this batch are replays
+            except Exception as e:
+                if is_lock_conflict(e):
+                    raise    # the chunk's transaction is lost: retry it whole
+                cursor.execute("ROLLBACK TO SAVEPOINT batch_sale")
+                outcome = failed_sale_outcome(sale, e)
+        outcomes.append(outcome)
+
+    created = [o["transaction_number"] for o in outcomes if o["status"] == SALE_CREATED]
+    if created:
+        cursor.execute(EXISTING_SALES_SELECT + in_list(created), tuple(created))
+        fill_transaction_ids(outcomes, cursor.fetchall())
+    commit_now(conn)    # a recorded chunk stays recorded, whatever the request does next
+    cursor.close()
+    on_commit(conn, product_cache.invalidate, *skus)
+    return outcomes
+
+def process_sale_batch(conn: MySQLConnection, sales: List[Dict], user_id: int, chunk_size: int) -> Dict:
+    """Record sales chunk by chunk; chunks already committed stay committed.
+
+    Chunks that lose a lock conflict are retried. Any other unexpected error
+    (e.g. a lost connection) rolls back the current chunk and reports it and
+    every later sale as failed, so the terminal can simply replay those.
+    """
+    outcomes: List[Dict] = []
+    for start in range(0, len(sales), chunk_size):
+        chunk = sales[start:start + chunk_size]
+        try:
+            outcomes.extend(record_sale_chunk(conn, chunk, user_id))
+        except Exception as e:
+            conn.rollback()
+            outcomes.extend(sale_outcome(sale, SALE_FAILED, detail=str(e)) for sale in sales[start:])
+            break
+    return batch_summary(outcomes)
+
+
+# -------------------- ROLLUPS --------------------
+# sales_daily_rollup / sales_daily_sku_rollup are kept current by triggers;
+# rebuild_sales_rollups recomputes a date range from the raw sales (backfill,
+# or repair after sales were edited by hand). Rebuilt days land in shard 0.
+ROLLUP_DATE_RANGE_SELECT = "SELECT MIN(transaction_date), MAX(transaction_date) FROM sale_transactions"
+
+DAILY_ROLLUP_DELETE = "DELETE FROM sales_daily_rollup WHERE sale_date BETWEEN %s AND %s"
+
+DAILY_ROLLUP_INSERT = """
+    INSERT INTO sales_daily_rollup (sale_date, shard, transaction_count, items_sold, revenue)
+    SELECT st.transaction_date, 0, COUNT(*), COALESCE(SUM(li.items), 0), SUM(st.total_amount)
+    FROM sale_transactions st
+    LEFT JOIN (
+        SELECT sli.transaction_id, SUM(sli.quantity) AS items
+        FROM sale_line_items sli
+        JOIN sale_transactions t ON t.id = sli.transaction_id
+        WHERE t.transaction_date BETWEEN %s AND %s
+        GROUP BY sli.transaction_id
+    ) li ON li.transaction_id = st.id
+    WHERE st.transaction_date BETWEEN %s AND %s
+    GROUP BY st.transaction_date
+"""
+
+SKU_ROLLUP_DELETE = "DELETE FROM sales_daily_sku_rollup WHERE sale_date BETWEEN %s AND %s"
+
+# Escrowed lines not consolidated yet are added by ConsolidateStockEscrow.
+SKU_ROLLUP_INSERT = """
+    INSERT INTO sales_daily_sku_rollup (sale_date, product_sku, quantity_sold, revenue)
+    SELECT st.transaction_date, sli.product_sku, SUM(sli.quantity), SUM(sli.line_total)
+    FROM sale_line_items sli
+    JOIN sale_transactions st ON st.id = sli.transaction_id
+    WHERE st.transaction_date BETWEEN %s AND %s
+      AND NOT EXISTS (SELECT 1 FROM stock_escrow_sales ses WHERE ses.line_item_id = sli.id)
+    GROUP BY st.transaction_date, sli.product_sku
+"""
+
+def get_sales_date_range(conn: MySQLConnection) -> Optional[Tuple[date, date]]:
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_DATE_RANGE_SELECT)
+    first, last = cursor.fetchone()
+    cursor.close()
+    return (first, last) if first else None
+
+def rebuild_sales_rollups(conn: MySQLConnection, from_date: date, to_date: date) -> int:
+    """Recompute both rollups for [from_date, to_date] in one transaction; returns rows written.
+
+    Sales committing for these days while this runs wait on its locks, so
+    keep ranges short (see scripts/rebuild_sales_rollups.py).
+    """
+    span = (from_date, to_date)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(DAILY_ROLLUP_DELETE, span)
+        cursor.execute(DAILY_ROLLUP_INSERT, span * 2)
+        written = cursor.rowcount
+        cursor.execute(SKU_ROLLUP_DELETE, span)
+        cursor.execute(SKU_ROLLUP_INSERT, span)
+        written += cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+# -------------------- EXPORT --------------------
+# Streamed by app.core.export; oldest first along idx_transaction_date, so the
+# server never has to sort (or hold) the whole range.
+TRANSACTION_EXPORT_SELECT = """
+    SELECT
+        st.id,
+        st.transaction_number,
+        st.transaction_date,
+        u.username,
+        st.total_amount
+    FROM sale_transactions st
+    JOIN users u ON st.user_id = u.id
+"""
+
+TRANSACTION_LINE_EXPORT_SELECT = """
+    SELECT
+        st.id AS transaction_id,
+        st.transaction_number,
+        st.transaction_date,
+        u.username,
+        sli.product_sku,
+        p.name AS product_name,
+        sli.quantity,
+        sli.unit_price,
+        sli.line_total
+    FROM sale_transactions st
+    JOIN users u ON st.user_id = u.id
+    JOIN sale_line_items sli ON sli.transaction_id = st.id
+    JOIN products p ON sli.product_sku = p.sku
+"""
+
+def transaction_export_query(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    lines: bool = False
+) -> Tuple[str, tuple]:
+    """One row per transaction, or per line item with `lines`; dates inclusive."""
+    query = (TRANSACTION_LINE_EXPORT_SELECT if lines else TRANSACTION_EXPORT_SELECT) + " WHERE 1=1"
+    params = []
+    if from_date:
+        query += " AND st.transaction_date >= %s"
+        params.append(from_date)
+    if to_date:
+        query += " AND st.transaction_date < %s + INTERVAL 1 DAY"
+        params.append(to_date)
+    query += " ORDER BY st.transaction_date, st.id" + (", sli.id" if lines else "")
+    return query, tuple(params)
@@ -1,5 +1,13 @@
 from mysql.connector import MySQLConnection
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from ..core.config import settings
+from ..core.pagination import Keyset
+from ..core.retry import mysql_error_code, retry_transaction
+from ..core.unit_of_work import on_commit
+from .product import product_cache
+from .sale import ER_SIGNAL_EXCEPTION
+
+MOVEMENT_TYPES_SELECT = "SELECT id, name, description, sign FROM movement_types"
 
 def get_movement_type_id(conn: MySQLConnection, movement_name: str) -> Optional[int]:
     """Get movement_type_id by name (sale, receipt, adjustment, return, damage)."""
@@ -10,23 +18,64 @@ def get_movement_type_id(conn: MySQLConnection, movement_name: str) -> Optional[
     cursor.close()
     return result[0] if result else None
 
-def create_stock_receipt(
+# -------------------- RECEIPTS & ADJUSTMENTS --------------------
+# ApplyStockMovement validates, applies and logs a movement in one call and
+# returns the movement id and the new stock level; see the schema (5.6).
+APPLY_STOCK_MOVEMENT = "ApplyStockMovement"
+PRODUCT_NOT_FOUND = "Product not found"
+
+class StockMovementRejected(ValueError):
+    """ApplyStockMovement refused the movement; nothing was changed."""
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.status_code = 404 if message == PRODUCT_NOT_FOUND else 400
+
+def rejected_movement(error: Exception) -> Optional[StockMovementRejected]:
+    """The rejection behind a procedure SIGNAL, or None for any other error."""
+    if mysql_error_code(error) != ER_SIGNAL_EXCEPTION:
+        return None
+    message = getattr(error, "msg", None) or (error.args[-1] if error.args else str(error))
+    return StockMovementRejected(str(message))
+
+def apply_stock_movement(
     conn: MySQLConnection,
     sku: str,
+    movement_type: str,
     quantity: int,
     reference_id: Optional[str],
+    reason: Optional[str],
     user_id: int
-) -> int:
-    """Call the stored procedure AddStockReceipt()."""
+) -> Dict:
+    """Returns {"movement_id", "new_quantity"}; raises StockMovementRejected."""
     cursor = conn.cursor()
-    cursor.callproc("AddStockReceipt", (sku, quantity, reference_id, user_id))
+    try:
+        cursor.callproc(APPLY_STOCK_MOVEMENT, (sku, movement_type, quantity, reference_id, reason, user_id))
+        rows = [row for res in cursor.stored_results() for row in res.fetchall()]
+    except Exception as e:
+        rejected = rejected_movement(e)
+        if rejected is None:
+            raise
+        raise rejected from e
+    finally:
+        cursor.close()
+    if not rows:
+        raise RuntimeError(f"{APPLY_STOCK_MOVEMENT} returned no result for {sku}")
     conn.commit()
-    # Fetch the last inserted movement ID
-    cursor.execute("SELECT LAST_INSERT_ID()")
-    movement_id = cursor.fetchone()[0]
-    cursor.close()
-    return movement_id
+    on_commit(conn, product_cache.invalidate, sku)
+    movement_id, new_quantity = rows[0]
+    return {"movement_id": movement_id, "new_quantity": new_quantity}
 
+@retry_transaction("create_stock_receipt")
+def create_stock_receipt(
+    conn: MySQLConnection,
+    sku: str,
+    quantity: int,
+    reference_id: Optional[str],
+    user_id: int
+) -> Dict:
+    return apply_stock_movement(conn, sku, "receipt", quantity, reference_id, None, user_id)
+
+@retry_transaction("create_stock_adjustment")
 def create_stock_adjustment(
     conn: MySQLConnection,
     sku: str,
@@ -34,60 +83,66 @@ def create_stock_adjustment(
     movement_type: str,  # 'adjustment', 'damage', 'return'
     reason: Optional[str],
     user_id: int
-) -> int:
-    """Manual stock adjustment – insert directly into stock_movements.
-       The trigger `before_stock_movement_insert` will handle stock update.
-    """
-    movement_type_id = get_movement_type_id(conn, movement_type)
-    if not movement_type_id:
-        raise ValueError(f"Invalid movement type: {movement_type}")
+) -> Dict:
+    return apply_stock_movement(conn, sku, movement_type, quantity, None, reason, user_id)
 
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO stock_movements
-            (product_sku, movement_type_id, quantity, reason, created_by)
-        VALUES (%s, %s, %s, %s, %s)
-    """
-    cursor.execute(query, (sku, movement_type_id, quantity, reason, user_id))
-    conn.commit()
-    movement_id = cursor.lastrowid
-    cursor.close()
-    return movement_id
+# Newest first; the id tiebreaker makes the cursor position unique.
+MOVEMENT_KEYSET = Keyset("movements", (("sm.created_at", "DESC"), ("sm.id", "DESC")), ("created_at", "id"))
 
-def get_stock_movements(
-    conn: MySQLConnection,
+STOCK_MOVEMENTS_SELECT = """
+    SELECT
+        sm.id,
+        p.name as product_name,
+        p.sku as product_sku,
+        mt.name as movement_type,
+        sm.quantity,
+        sm.previous_quantity,
+        sm.new_quantity,
+        sm.reference_id,
+        sm.reason,
+        u.username as performed_by,
+        sm.created_at
+    FROM stock_movements sm
+    JOIN products p ON sm.product_sku = p.sku
+    JOIN movement_types mt ON sm.movement_type_id = mt.id
+    LEFT JOIN users u ON sm.created_by = u.id
+    WHERE 1=1
+"""
+
+def stock_movements_query(
     product_sku: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
-) -> List[Dict]:
-    """Get stock movement history, optionally filtered by product."""
-    cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT 
-            sm.id,
-            p.name as product_name,
-            p.sku as product_sku,
-            mt.name as movement_type,
-            sm.quantity,
-            sm.previous_quantity,
-            sm.new_quantity,
-            sm.reference_id,
-            sm.reason,
-            u.username as performed_by,
-            sm.created_at
-        FROM stock_movements sm
-        JOIN products p ON sm.product_sku = p.sku
-        JOIN movement_types mt ON sm.movement_type_id = mt.id
-        LEFT JOIN users u ON sm.created_by = u.id
-        WHERE 1=1
-    """
+    offset: int = 0,
+    after: Optional[List] = None
+) -> Tuple[str, tuple]:
+    """A page of movement history, newest first; `after` (a decoded cursor) replaces `offset`."""
+    query = STOCK_MOVEMENTS_SELECT
     params = []
     if product_sku:
         query += " AND sm.product_sku = %s"
         params.append(product_sku)
-    query += " ORDER BY sm.created_at DESC LIMIT %s OFFSET %s"
+    if after:
+        condition, after_params = MOVEMENT_KEYSET.condition(after)
+        query += f" AND {condition}"
+        params.extend(after_params)
+        offset = 0
+    query += MOVEMENT_KEYSET.order_sql() + " LIMIT %s OFFSET %s"
     params.extend([limit, offset])
-    cursor.execute(query, tuple(params))
+    return query, tuple(params)
+
+def get_stock_movements(
+    conn: MySQLConnection,
+    product_sku: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: Optional[List] = None
+) -> List[Dict]:
+    """Get stock movement history, optionally filtered by product.
+
+    `after` (a decoded cursor) replaces `offset`.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(*stock_movements_query(product_sku, limit, offset, after))
     results = cursor.fetchall()
     cursor.close()
     return results
@@ -99,4 +154,52 @@ def get_product_stock_level(conn: MySQLConnection, sku: str) -> Optional[int]:
     cursor.execute(query, (sku,))
     result = cursor.fetchone()
     cursor.close()
-    return result[0] if result else None
\ No newline at end of file
+    return result[0] if result else None
+
+# -------------------- HOT-SKU ESCROW --------------------
+# While a SKU has escrow slots, sales take its stock from the slots instead of
+# locking the product row (see stock_escrow in the schema); ConsolidateStockEscrow
+# applies those sales to quantity_in_stock and re-splits the stock.
+STOCK_ESCROW_SELECT = """
+    SELECT
+        e.product_sku,
+        p.name AS product_name,
+        p.quantity_in_stock,
+        COUNT(*) AS slots,
+        SUM(e.allotted - e.sold) AS escrow_available,
+        SUM(e.sold) AS pending_sold
+    FROM stock_escrow e
+    JOIN products p ON e.product_sku = p.sku
+    GROUP BY e.product_sku, p.name, p.quantity_in_stock
+    ORDER BY e.product_sku
+"""
+
+STOCK_ESCROW_SLOTS_SELECT = "SELECT product_sku, COUNT(*) FROM stock_escrow GROUP BY product_sku"
+
+@retry_transaction("set_stock_escrow")
+def set_stock_escrow(conn: MySQLConnection, sku: str, slots: int):
+    """Consolidate `sku` and split its stock over `slots` slots (0 turns escrow off)."""
+    cursor = conn.cursor()
+    cursor.callproc("ConsolidateStockEscrow", (sku, slots, settings.STOCK_ESCROW_MIN_PER_SLOT))
+    conn.commit()
+    cursor.close()
+    on_commit(conn, product_cache.invalidate, sku)
+
+def consolidate_stock_escrow(conn: MySQLConnection) -> int:
+    """Apply pending escrowed sales and refill the slots of every hot SKU."""
+    cursor = conn.cursor()
+    cursor.execute(STOCK_ESCROW_SLOTS_SELECT)
+    hot = cursor.fetchall()
+    cursor.close()
+    conn.commit()   # end the read snapshot before the procedure's own transactions
+    for sku, slots in hot:
+        set_stock_escrow(conn, sku, slots)
+    return len(hot)
+
+def get_stock_escrow(conn: MySQLConnection) -> List[Dict]:
+    """Hot SKUs with their slot count and unconsolidated sales."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(STOCK_ESCROW_SELECT)
+    results = cursor.fetchall()
+    cursor.close()
+    return results
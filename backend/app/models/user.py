@@ -1,7 +1,50 @@
+import threading
+import time
 from mysql.connector import MySQLConnection
 from typing import Optional, Dict, Any
+from ..core.cache import TTLCache, cacheable
+from ..core.config import settings
 from ..core.security import hash_password
 
+# -------------------- PRINCIPAL CACHE --------------------
+# Authenticated user rows (id, username, email, is_active, roles) keyed by
+# user id. Admin changes invalidate an entry immediately in this process;
+# the short TTL bounds how long other workers can serve the old row.
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+# user id -> wall-clock time of the last admin change, so tokens with
+# embedded roles issued before it are re-checked against the database.
+_principal_changed_at: Dict[int, float] = {}
+_principal_changed_lock = threading.Lock()
+
+def invalidate_user(user_id: int):
+    """Drop a user's cached principal and distrust roles signed into older tokens."""
+    user_cache.invalidate(user_id)
+    now = time.time()
+    with _principal_changed_lock:
+        if len(_principal_changed_at) > 10000:
+            cutoff = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for uid in [u for u, ts in _principal_changed_at.items() if ts < cutoff]:
+                del _principal_changed_at[uid]
+        _principal_changed_at[user_id] = now
+
+def principal_changed_since(user_id: int, issued_at: float) -> bool:
+    changed_at = _principal_changed_at.get(user_id)
+    return changed_at is not None and changed_at >= issued_at
+
+def get_user_principal(conn: MySQLConnection, user_id: int) -> Optional[Dict]:
+    """get_user_by_id through the principal cache (used by authentication)."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    version = user_cache.version
+    user = get_user_by_id(conn, user_id)
+    if user and cacheable(conn):
+        user_cache.put(user_id, user, version)
+    return user
+
+# -------------------- USERS --------------------
+
 def create_user(conn: MySQLConnection, user_data: Dict[str, Any]) -> int:
     cursor = conn.cursor()
     try:
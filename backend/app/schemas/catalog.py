@@ -0,0 +1,96 @@
+from decimal import Decimal
+from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, Field, model_validator
+
+# ---------- Search ----------
+class ProductSearchResult(BaseModel):
+    sku: str
+    barcode: Optional[str] = None
+    name: str
+    selling_price: Decimal
+    score: float
+
+# ---------- Catalog Sync ----------
+class CatalogSync(BaseModel):
+    """Compact product rows for POS terminals; pass `version` back as ?since=."""
+    version: int
+    has_more: bool = False
+    columns: List[str]
+    rows: List[List[Any]]
+
+# ---------- Bulk Import ----------
+class ImportRowError(BaseModel):
+    row: int                      # 1-based data row (CSV header excluded)
+    sku: Optional[str] = None
+    errors: List[str]
+
+class ProductImportResult(BaseModel):
+    received: int
+    imported: int
+    failed: int
+    errors: List[ImportRowError]  # capped at PRODUCT_IMPORT_MAX_ERRORS; `failed` is the full count
+
+# ---------- Bulk Update ----------
+class ProductFilter(BaseModel):
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    skus: Optional[List[str]] = Field(None, min_length=1, max_length=10000)
+    active_only: bool = False
+
+    @model_validator(mode="after")
+    def require_selector(self):
+        if self.category_id is None and self.supplier_id is None and not self.skus:
+            raise ValueError("filter needs category_id, supplier_id or skus")
+        return self
+
+class ProductChanges(BaseModel):
+    """Applied to every product matching the filter; None leaves a column unchanged."""
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    cost_price: Optional[Decimal] = Field(None, ge=0)
+    selling_price: Optional[Decimal] = Field(None, ge=0)
+    price_change_percent: Optional[Decimal] = Field(None, gt=-100)   # e.g. 5 = +5% on selling_price
+    reorder_threshold: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def check_changes(self):
+        if self.selling_price is not None and self.price_change_percent is not None:
+            raise ValueError("set selling_price or price_change_percent, not both")
+        if not self.model_dump(exclude_none=True):
+            raise ValueError("no changes given")
+        return self
+
+class ProductPatch(BaseModel):
+    sku: str
+    name: Optional[str] = None
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    cost_price: Optional[Decimal] = Field(None, ge=0)
+    selling_price: Optional[Decimal] = Field(None, ge=0)
+    reorder_threshold: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+class BulkProductUpdate(BaseModel):
+    filter: Optional[ProductFilter] = None
+    changes: Optional[ProductChanges] = None
+    patches: List[ProductPatch] = Field(default_factory=list, max_length=5000)
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        if (self.filter is None) != (self.changes is None):
+            raise ValueError("filter and changes must be given together")
+        if self.filter is None and not self.patches:
+            raise ValueError("give filter + changes, patches, or both")
+        return self
+
+class ProductDiff(BaseModel):
+    sku: str
+    before: Dict[str, Any]
+    after: Dict[str, Any]
+
+class BulkUpdateResult(BaseModel):
+    affected: int
+    not_found: List[str]   # patched SKUs that do not exist
+    dry_run: bool
+    diffs: List[ProductDiff]
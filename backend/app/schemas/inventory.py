@@ -38,4 +38,15 @@ class StockLevelResponse(BaseModel):
     name: str
     quantity_in_stock: int
     reorder_threshold: int
-    status: str
\ No newline at end of file
+    status: str
+
+class StockEscrowUpdate(BaseModel):
+    slots: int = Field(..., ge=0, le=64)   # 0 turns escrow off
+
+class StockEscrowResponse(BaseModel):
+    product_sku: str
+    product_name: str
+    quantity_in_stock: int
+    slots: int
+    escrow_available: int
+    pending_sold: int
@@ -0,0 +1,22 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from .sale import SaleCreate
+
+# ---------- Batch Ingestion ----------
+class SaleBatch(BaseModel):
+    """Sales queued by an offline terminal; replaying the same batch is safe."""
+    sales: List[SaleCreate] = Field(..., min_length=1, max_length=1000)
+
+class SaleOutcome(BaseModel):
+    transaction_number: str
+    status: str                          # created | duplicate | rejected | failed
+    transaction_id: Optional[int] = None
+    detail: Optional[str] = None         # why a sale was rejected / failed
+
+class SaleBatchResult(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int                        # final: fix the sale before sending it again
+    failed: int                          # not recorded: replay these later
+    results: List[SaleOutcome]           # in request order
@@ -0,0 +1,136 @@
+"""Checkout throughput for one hot SKU, without and with stock escrow.
+
+Run from the backend directory, against a test database (it records real
+sales and a stock receipt for them):
+
+    python -m scripts.bench_hot_sku --sku BENCH-001 --user-id 1
+    python -m scripts.bench_hot_sku --sku BENCH-001 --user-id 1 --terminals 64 --seconds 30 --slots 32
+
+Every terminal is a thread with its own connection calling ProcessSale for
+one unit of the SKU in a loop. The row-lock run sells with escrow off; the
+escrow run splits the stock over --slots slots and consolidates them every
+STOCK_ESCROW_CONSOLIDATE_SECONDS, like the API does. After each run the
+stock is checked against the units sold, so an oversell fails the run.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import date
+
+import mysql.connector
+
+from app.core.config import settings
+from app.models.stock_movement import consolidate_stock_escrow, set_stock_escrow
+
+def connect():
+    return mysql.connector.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+
+def stock_of(conn, sku):
+    cursor = conn.cursor()
+    cursor.execute("SELECT quantity_in_stock, selling_price FROM products WHERE sku = %s", (sku,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    return row
+
+def terminal(sku, price, user_id, deadline, latencies, errors):
+    conn = connect()
+    items = json.dumps([{"sku": sku, "quantity": 1, "unit_price": float(price)}])
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            cursor = conn.cursor()
+            try:
+                cursor.callproc("ProcessSale", (f"BENCH-{uuid.uuid4().hex[:20]}", user_id, date.today(), items))
+                for result in cursor.stored_results():
+                    result.fetchall()
+                conn.commit()
+                latencies.append(time.monotonic() - started)
+            except mysql.connector.Error as e:
+                conn.rollback()
+                errors.append(e.errno)
+            finally:
+                cursor.close()
+    finally:
+        conn.close()
+
+def consolidator(stop):
+    conn = connect()
+    try:
+        while not stop.wait(settings.STOCK_ESCROW_CONSOLIDATE_SECONDS):
+            consolidate_stock_escrow(conn)
+    finally:
+        conn.close()
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+def run(label, args, conn, slots):
+    set_stock_escrow(conn, args.sku, slots)
+    before, price = stock_of(conn, args.sku)
+    latencies, errors = [], []
+    deadline = time.monotonic() + args.seconds
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=terminal, args=(args.sku, price, args.user_id, deadline, latencies, errors))
+        for _ in range(args.terminals)
+    ]
+    if slots:
+        workers.append(threading.Thread(target=consolidator, args=(stop,)))
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers[:args.terminals]:
+        worker.join()
+    elapsed = time.monotonic() - started
+    stop.set()
+    for worker in workers[args.terminals:]:
+        worker.join()
+
+    set_stock_escrow(conn, args.sku, 0)   # apply every escrowed sale
+    after, _ = stock_of(conn, args.sku)
+    latencies.sort()
+    print(f"{label:>9}: {len(latencies) / elapsed:8.1f} sales/s   "
+          f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms   "
+          f"{len(latencies)} sold, {len(errors)} failed")
+    if after != before - len(latencies) or after < 0:
+        raise SystemExit(f"❌ Stock mismatch: {before} - {len(latencies)} sold != {after}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sku", required=True)
+    parser.add_argument("--user-id", type=int, required=True, help="user the sales are recorded for")
+    parser.add_argument("--terminals", type=int, default=32, help="concurrent checkouts")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--slots", type=int, default=16, help="escrow slots for the escrow run")
+    parser.add_argument("--stock", type=int, default=1000000, help="top the SKU up to at least this")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        row = stock_of(conn, args.sku)
+        if row is None:
+            raise SystemExit(f"❌ Product {args.sku} not found")
+        if row[0] < args.stock:
+            cursor = conn.cursor()
+            cursor.callproc("AddStockReceipt", (args.sku, args.stock - row[0], "bench_hot_sku", args.user_id))
+            conn.commit()
+            cursor.close()
+        print(f"{args.terminals} terminals selling {args.sku} for {args.seconds:g}s per run")
+        run("row lock", args, conn, 0)
+        run("escrow", args, conn, args.slots)
+        print("✅ No oversell: stock matches units sold in both runs.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Backfill or rebuild the sales rollup tables from the raw sales.
+
+Run from the backend directory:
+
+    python -m scripts.rebuild_sales_rollups                      # every day with sales
+    python -m scripts.rebuild_sales_rollups --from 2026-01-01 --to 2026-01-31
+
+Days are rebuilt in chunks of --days, one transaction each, so sales being
+recorded meanwhile only wait for the chunk that covers their date.
+"""
+import argparse
+from datetime import date, timedelta
+
+import mysql.connector
+
+from app.core.config import settings
+from app.models.sale import get_sales_date_range, rebuild_sales_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat)
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat)
+    parser.add_argument("--days", type=int, default=7, help="days per transaction")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+    try:
+        first_last = get_sales_date_range(conn)
+        if first_last is None:
+            print("No sales to roll up.")
+            return
+        start = args.from_date or first_last[0]
+        end = args.to_date or first_last[1]
+        rows = 0
+        while start <= end:
+            chunk_end = min(start + timedelta(days=args.days - 1), end)
+            rows += rebuild_sales_rollups(conn, start, chunk_end)
+            print(f"  {start} .. {chunk_end}")
+            start = chunk_end + timedelta(days=1)
+        print(f"✅ Sales rollups rebuilt ({rows} rows).")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
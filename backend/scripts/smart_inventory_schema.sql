@@ -91,13 +91,41 @@ CREATE TABLE products (
     quantity_in_stock INT NOT NULL DEFAULT 0,
     reorder_threshold INT NOT NULL DEFAULT 5,
     is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    catalog_version BIGINT UNSIGNED NOT NULL DEFAULT 0,   -- set by triggers 4.5 / 4.6
+    escrow_quantity INT NOT NULL DEFAULT 0,               -- stock handed to stock_escrow slots (3.8)
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     PRIMARY KEY (sku),
     FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL,
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL,
     INDEX idx_barcode (barcode),
-    INDEX idx_active (is_active)
+    INDEX idx_active (is_active),
+    INDEX idx_catalog_version (catalog_version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 2.5 Catalog version sequence (monotonic counter for POS delta sync; old rows are pruned by the app)
+CREATE TABLE catalog_version_seq (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 2.6 Table change versions (ETags for reference data; bumped by the app on writes)
+CREATE TABLE table_versions (
+    table_name VARCHAR(64) NOT NULL,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 2.7 Idempotency keys (stored responses of retried writes; expired rows are pruned by the app)
+CREATE TABLE idempotency_keys (
+    key_hash BINARY(32) NOT NULL,            -- SHA-256 of user id + Idempotency-Key
+    request_hash BINARY(32) NOT NULL,        -- SHA-256 of method, path and body
+    claim_token CHAR(32) NOT NULL,
+    status_code SMALLINT UNSIGNED NULL,      -- NULL while the request is in flight
+    response_body MEDIUMTEXT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (key_hash),
+    INDEX idx_expires_at (expires_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- -----------------------------------------------------------------------------
@@ -126,6 +154,7 @@ CREATE TABLE sale_line_items (
     quantity INT NOT NULL CHECK (quantity > 0),
     unit_price DECIMAL(10,2) NOT NULL,
     line_total DECIMAL(10,2) NOT NULL,
+    escrow_slot TINYINT UNSIGNED NULL,     -- set by trigger 4.1 when sold from stock_escrow (3.8)
     PRIMARY KEY (id),
     FOREIGN KEY (transaction_id) REFERENCES sale_transactions(id) ON DELETE CASCADE,
     FOREIGN KEY (product_sku) REFERENCES products(sku) ON DELETE RESTRICT,
@@ -184,6 +213,60 @@ CREATE TABLE audit_log (
     INDEX idx_changed_at (changed_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 3.6 Daily sales rollup (maintained by triggers 4.2 / 4.7; rebuilt with
+--     scripts/rebuild_sales_rollups.py). Each day is split over 16 shard rows
+--     (sale id % 16) so concurrent sales do not queue on one row lock;
+--     readers SUM over the shards.
+CREATE TABLE sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    shard TINYINT UNSIGNED NOT NULL,
+    transaction_count INT UNSIGNED NOT NULL DEFAULT 0,
+    items_sold INT UNSIGNED NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (sale_date, shard)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 3.7 Daily sales per product (same maintenance; the product row is already
+--     locked by the sale, so this needs no sharding. Escrowed sales are
+--     added when they are consolidated, see 5.5)
+CREATE TABLE sales_daily_sku_rollup (
+    sale_date DATE NOT NULL,
+    product_sku VARCHAR(50) NOT NULL,
+    quantity_sold INT UNSIGNED NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (sale_date, product_sku),
+    INDEX idx_sku_date (product_sku, sale_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 3.8 Stock escrow for hot SKUs (managed by 5.5 ConsolidateStockEscrow).
+--     While a product has slots, part of its stock (products.escrow_quantity)
+--     is split over them and sales take it from any unlocked slot instead of
+--     locking the product row, so concurrent sales of one SKU do not queue.
+CREATE TABLE stock_escrow (
+    product_sku VARCHAR(50) NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL,
+    allotted INT NOT NULL DEFAULT 0,       -- stock handed to this slot at the last consolidation
+    sold INT NOT NULL DEFAULT 0,           -- sold from it since
+    PRIMARY KEY (product_sku, slot),
+    FOREIGN KEY (product_sku) REFERENCES products(sku) ON DELETE CASCADE,
+    CHECK (sold <= allotted)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 3.9 Sale lines sold from escrow, waiting for 5.5 to apply them to the
+--     product's stock and log their stock movements
+CREATE TABLE stock_escrow_sales (
+    line_item_id INT UNSIGNED NOT NULL,
+    product_sku VARCHAR(50) NOT NULL,
+    transaction_id INT UNSIGNED NOT NULL,
+    quantity INT NOT NULL,
+    line_total DECIMAL(10,2) NOT NULL,
+    sale_date DATE NOT NULL,
+    created_by INT UNSIGNED NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (line_item_id),
+    INDEX idx_product (product_sku, line_item_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- -----------------------------------------------------------------------------
 -- 4. TRIGGERS
 -- -----------------------------------------------------------------------------
@@ -195,18 +278,34 @@ BEFORE INSERT ON sale_line_items
 FOR EACH ROW
 BEGIN
     DECLARE current_stock INT;
-    DECLARE movement_id INT;
-
-    -- Get current stock
-    SELECT quantity_in_stock INTO current_stock
-    FROM products
-    WHERE sku = NEW.product_sku
-    FOR UPDATE;
-
-    -- Prevent negative stock
-    IF current_stock < NEW.quantity THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Insufficient stock for this product';
+    DECLARE v_slot TINYINT UNSIGNED DEFAULT NULL;
+
+    -- Hot SKU: take the stock from an escrow slot that covers the line.
+    -- SKIP LOCKED never waits, so busy or empty slots fall through to the
+    -- product row below (slots are always locked before the product row).
+    SELECT slot INTO v_slot
+    FROM stock_escrow
+    WHERE product_sku = NEW.product_sku AND allotted - sold >= NEW.quantity
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF v_slot IS NOT NULL THEN
+        UPDATE stock_escrow
+        SET sold = sold + NEW.quantity
+        WHERE product_sku = NEW.product_sku AND slot = v_slot;
+        SET NEW.escrow_slot = v_slot;
+    ELSE
+        -- Get current stock (less what the escrow slots hold)
+        SELECT quantity_in_stock - escrow_quantity INTO current_stock
+        FROM products
+        WHERE sku = NEW.product_sku
+        FOR UPDATE;
+
+        -- Prevent negative stock
+        IF current_stock < NEW.quantity THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Insufficient stock for this product';
+        END IF;
     END IF;
 
     -- Calculate line total
@@ -215,6 +314,7 @@ END$$
 DELIMITER ;
 
 -- 4.2 After inserting a sale line item: update stock, log movement, update transaction total
+--     (escrowed lines only queue in stock_escrow_sales; 5.5 does the rest)
 DELIMITER $$
 CREATE TRIGGER after_sale_line_item_insert
 AFTER INSERT ON sale_line_items
@@ -223,102 +323,154 @@ BEGIN
     DECLARE current_qty INT;
     DECLARE new_qty INT;
     DECLARE sale_user_id INT;
+    DECLARE v_sale_date DATE;
     DECLARE sale_movement_type_id INT;
 
     -- Get the user who processed the sale
-    SELECT user_id INTO sale_user_id
+    SELECT user_id, transaction_date INTO sale_user_id, v_sale_date
     FROM sale_transactions
     WHERE id = NEW.transaction_id;
 
-    -- Get movement_type_id for 'sale' (dynamic lookup)
-    SELECT id INTO sale_movement_type_id
-    FROM movement_types
-    WHERE name = 'sale'
-    LIMIT 1;
+    IF NEW.escrow_slot IS NULL THEN
+        -- Get movement_type_id for 'sale' (dynamic lookup)
+        SELECT id INTO sale_movement_type_id
+        FROM movement_types
+        WHERE name = 'sale'
+        LIMIT 1;
 
-    -- Get current quantity (with lock)
-    SELECT quantity_in_stock INTO current_qty
-    FROM products
-    WHERE sku = NEW.product_sku
-    FOR UPDATE;
+        -- Get current quantity (with lock)
+        SELECT quantity_in_stock INTO current_qty
+        FROM products
+        WHERE sku = NEW.product_sku
+        FOR UPDATE;
 
-    SET new_qty = current_qty - NEW.quantity;
+        SET new_qty = current_qty - NEW.quantity;
 
-    -- Update product stock
-    UPDATE products
-    SET quantity_in_stock = new_qty
-    WHERE sku = NEW.product_sku;
+        -- Update product stock
+        UPDATE products
+        SET quantity_in_stock = new_qty
+        WHERE sku = NEW.product_sku;
 
-    -- Log stock movement
-    INSERT INTO stock_movements (
-        product_sku,
-        movement_type_id,
-        quantity,
-        previous_quantity,
-        new_quantity,
-        reference_id,
-        created_by
-    ) VALUES (
-        NEW.product_sku,
-        sale_movement_type_id,
-        NEW.quantity,
-        current_qty,
-        new_qty,
-        NEW.transaction_id,
-        sale_user_id
-    );
+        -- Log stock movement
+        INSERT INTO stock_movements (
+            product_sku,
+            movement_type_id,
+            quantity,
+            previous_quantity,
+            new_quantity,
+            reference_id,
+            created_by
+        ) VALUES (
+            NEW.product_sku,
+            sale_movement_type_id,
+            NEW.quantity,
+            current_qty,
+            new_qty,
+            NEW.transaction_id,
+            sale_user_id
+        );
+    ELSE
+        INSERT INTO stock_escrow_sales (
+            line_item_id, product_sku, transaction_id, quantity, line_total, sale_date, created_by
+        ) VALUES (
+            NEW.id, NEW.product_sku, NEW.transaction_id, NEW.quantity, NEW.line_total, v_sale_date, sale_user_id
+        );
+    END IF;
 
     -- Update sale transaction total
     UPDATE sale_transactions
     SET total_amount = total_amount + NEW.line_total
     WHERE id = NEW.transaction_id;
-END$$
-DELIMITER ;
 
--- 4.3 After inserting a stock movement of type 'receipt' or 'return': increase stock
-DELIMITER $$
-CREATE TRIGGER after_stock_movement_receipt
-AFTER INSERT ON stock_movements
-FOR EACH ROW
-BEGIN
-    DECLARE receipt_movement_type_id INT;
-    DECLARE return_movement_type_id INT;
-
-    -- Get movement type IDs
-    SELECT id INTO receipt_movement_type_id FROM movement_types WHERE name = 'receipt' LIMIT 1;
-    SELECT id INTO return_movement_type_id FROM movement_types WHERE name = 'return' LIMIT 1;
-
-    IF NEW.movement_type_id IN (receipt_movement_type_id, return_movement_type_id) THEN
-        UPDATE products
-        SET quantity_in_stock = quantity_in_stock + NEW.quantity
-        WHERE sku = NEW.product_sku;
+    -- Roll the line into the daily totals (shard row already locked by 4.7)
+    UPDATE sales_daily_rollup
+    SET items_sold = items_sold + NEW.quantity,
+        revenue = revenue + NEW.line_total
+    WHERE sale_date = v_sale_date AND shard = NEW.transaction_id % 16;
+
+    IF NEW.escrow_slot IS NULL THEN
+        INSERT INTO sales_daily_sku_rollup (sale_date, product_sku, quantity_sold, revenue)
+        VALUES (v_sale_date, NEW.product_sku, NEW.quantity, NEW.line_total)
+        ON DUPLICATE KEY UPDATE
+            quantity_sold = quantity_sold + NEW.quantity,
+            revenue = revenue + NEW.line_total;
     END IF;
 END$$
 DELIMITER ;
 
+-- 4.3 (none: receipts and returns change the stock in ApplyStockMovement,
+--     5.6, like every other manual movement)
+
 -- 4.4 Before stock movement: validate and set previous/new quantities
+--     (movements logged with their snapshots by 4.2 and 5.6 have already
+--     changed the stock and are kept as they are)
 DELIMITER $$
 CREATE TRIGGER before_stock_movement_insert
 BEFORE INSERT ON stock_movements
 FOR EACH ROW
 BEGIN
     DECLARE current_qty INT;
+    DECLARE current_escrow INT;
     DECLARE movement_sign INT;
 
-    -- Get current stock
-    SELECT quantity_in_stock INTO current_qty
-    FROM products
-    WHERE sku = NEW.product_sku
-    FOR UPDATE;
+    IF NEW.previous_quantity IS NULL THEN
+        -- Get current stock
+        SELECT quantity_in_stock, escrow_quantity INTO current_qty, current_escrow
+        FROM products
+        WHERE sku = NEW.product_sku
+        FOR UPDATE;
+
+        -- Get sign of this movement type
+        SELECT sign INTO movement_sign
+        FROM movement_types
+        WHERE id = NEW.movement_type_id;
+
+        -- Set snapshots
+        SET NEW.previous_quantity = current_qty;
+        SET NEW.new_quantity = current_qty + (NEW.quantity * movement_sign);
+
+        -- Escrow slots may sell all of escrow_quantity at any time
+        IF movement_sign < 0 AND NEW.new_quantity < current_escrow THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Stock is held in escrow for sales; release it first';
+        END IF;
+    END IF;
+END$$
+DELIMITER ;
 
-    -- Get sign of this movement type
-    SELECT sign INTO movement_sign
-    FROM movement_types
-    WHERE id = NEW.movement_type_id;
+-- 4.5 / 4.6 Stamp every product insert/update (including stock changes made by
+--           the triggers above) with the next catalog version
+DELIMITER $$
+CREATE TRIGGER before_product_insert_version
+BEFORE INSERT ON products
+FOR EACH ROW
+BEGIN
+    INSERT INTO catalog_version_seq () VALUES ();
+    SET NEW.catalog_version = LAST_INSERT_ID();
+END$$
+DELIMITER ;
 
-    -- Set snapshots
-    SET NEW.previous_quantity = current_qty;
-    SET NEW.new_quantity = current_qty + (NEW.quantity * movement_sign);
+DELIMITER $$
+CREATE TRIGGER before_product_update_version
+BEFORE UPDATE ON products
+FOR EACH ROW
+BEGIN
+    INSERT INTO catalog_version_seq () VALUES ();
+    SET NEW.catalog_version = LAST_INSERT_ID();
+END$$
+DELIMITER ;
+
+-- 4.7 After inserting a sale header: count it in its daily rollup shard. This
+--     runs before any line item locks a product, so every sale takes the
+--     shard row first and product rows after (a consistent lock order).
+DELIMITER $$
+CREATE TRIGGER after_sale_transaction_insert
+AFTER INSERT ON sale_transactions
+FOR EACH ROW
+BEGIN
+    INSERT INTO sales_daily_rollup (sale_date, shard, transaction_count, items_sold, revenue)
+    VALUES (NEW.transaction_date, NEW.id % 16, 1, 0, 0)
+    ON DUPLICATE KEY UPDATE transaction_count = transaction_count + 1;
 END$$
 DELIMITER ;
 
@@ -336,11 +488,6 @@ CREATE PROCEDURE ProcessSale(
 )
 BEGIN
     DECLARE v_transaction_id INT UNSIGNED;
-    DECLARE v_i INT DEFAULT 0;
-    DECLARE v_len INT;
-    DECLARE v_sku VARCHAR(50);
-    DECLARE v_qty INT;
-    DECLARE v_price DECIMAL(10,2);
     DECLARE EXIT HANDLER FOR SQLEXCEPTION
     BEGIN
         ROLLBACK;
@@ -349,27 +496,22 @@ BEGIN
 
     START TRANSACTION;
 
-    -- Create sale header (total_amount will be updated by triggers)
-    INSERT INTO sale_transactions (transaction_number, user_id, transaction_date, total_amount)
-    VALUES (p_transaction_number, p_user_id, p_transaction_date, 0);
-
-    SET v_transaction_id = LAST_INSERT_ID();
-    SET v_len = JSON_LENGTH(p_items);
-
-    WHILE v_i < v_len DO
-        SET v_sku = JSON_UNQUOTE(JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].sku')));
-        SET v_qty = JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].quantity'));
-        SET v_price = JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].unit_price'));
-
-        INSERT INTO sale_line_items (transaction_id, product_sku, quantity, unit_price, line_total)
-        VALUES (v_transaction_id, v_sku, v_qty, v_price, 0);  -- line_total will be set by trigger
-
-        SET v_i = v_i + 1;
-    END WHILE;
+    CALL RecordSale(p_transaction_number, p_user_id, p_transaction_date, p_items, v_transaction_id);
 
     COMMIT;
 
-    SELECT v_transaction_id AS transaction_id;
+    -- Return the finished sale (header, then line items) so the caller
+    -- does not need extra round trips to re-read it.
+    SELECT st.*, u.username
+    FROM sale_transactions st
+    JOIN users u ON st.user_id = u.id
+    WHERE st.id = v_transaction_id;
+
+    SELECT sli.*, p.name AS product_name
+    FROM sale_line_items sli
+    JOIN products p ON sli.product_sku = p.sku
+    WHERE sli.transaction_id = v_transaction_id
+    ORDER BY sli.id;
 END$$
 DELIMITER ;
 
@@ -417,7 +559,7 @@ BEGIN
 END$$
 DELIMITER ;
 
--- 5.3 Add a new stock receipt (increases stock, logs movement)
+-- 5.3 Add a new stock receipt (increases stock, logs movement; see 5.6)
 DELIMITER $$
 CREATE PROCEDURE AddStockReceipt(
     IN p_sku VARCHAR(50),
@@ -426,26 +568,207 @@ CREATE PROCEDURE AddStockReceipt(
     IN p_user_id INT UNSIGNED
 )
 BEGIN
-    DECLARE v_receipt_movement_type_id INT;
+    CALL ApplyStockMovement(p_sku, 'receipt', p_quantity, p_reference, NULL, p_user_id);
+END$$
+DELIMITER ;
+
+-- 5.4 Record a sale inside the caller's transaction (no transaction control,
+--     so batch ingestion can wrap each sale in a savepoint; see ProcessSale)
+DELIMITER $$
+CREATE PROCEDURE RecordSale(
+    IN p_transaction_number VARCHAR(50),
+    IN p_user_id INT UNSIGNED,
+    IN p_transaction_date DATE,
+    IN p_items JSON,  -- Format: [{"sku":"...", "quantity":2, "unit_price":15.00}, ...]
+    OUT p_transaction_id INT UNSIGNED
+)
+BEGIN
+    DECLARE v_i INT DEFAULT 0;
+    DECLARE v_len INT;
+    DECLARE v_sku VARCHAR(50);
+    DECLARE v_qty INT;
+    DECLARE v_price DECIMAL(10,2);
+
+    -- Create sale header (total_amount will be updated by triggers)
+    INSERT INTO sale_transactions (transaction_number, user_id, transaction_date, total_amount)
+    VALUES (p_transaction_number, p_user_id, p_transaction_date, 0);
+
+    SET p_transaction_id = LAST_INSERT_ID();
+    SET v_len = JSON_LENGTH(p_items);
+
+    WHILE v_i < v_len DO
+        SET v_sku = JSON_UNQUOTE(JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].sku')));
+        SET v_qty = JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].quantity'));
+        SET v_price = JSON_EXTRACT(p_items, CONCAT('$[', v_i, '].unit_price'));
+
+        INSERT INTO sale_line_items (transaction_id, product_sku, quantity, unit_price, line_total)
+        VALUES (p_transaction_id, v_sku, v_qty, v_price, 0);  -- line_total will be set by trigger
+
+        SET v_i = v_i + 1;
+    END WHILE;
+END$$
+DELIMITER ;
+
+-- 5.5 Consolidate a hot SKU's escrow (3.8) and re-split its stock over p_slots
+--     slots; p_slots = 0 returns the stock to the product row. Escrowed sales
+--     are applied to quantity_in_stock and logged as stock movements in sale
+--     order. Slots get no stock when each would hold less than
+--     p_min_per_slot, so near a stockout every sale locks the product row again.
+DELIMITER $$
+CREATE PROCEDURE ConsolidateStockEscrow(
+    IN p_sku VARCHAR(50),
+    IN p_slots INT,
+    IN p_min_per_slot INT
+)
+BEGIN
+    DECLARE v_done BOOLEAN DEFAULT FALSE;
+    DECLARE v_sale_movement_type_id INT;
+    DECLARE v_stock INT;
+    DECLARE v_per_slot INT DEFAULT 0;
+    DECLARE v_slot INT DEFAULT 0;
+    DECLARE v_qty INT;
+    DECLARE v_transaction_id INT UNSIGNED;
+    DECLARE v_created_by INT UNSIGNED;
+    DECLARE v_created_at TIMESTAMP;
+    DECLARE pending CURSOR FOR
+        SELECT quantity, transaction_id, created_by, created_at
+        FROM stock_escrow_sales
+        WHERE product_sku = p_sku
+        ORDER BY line_item_id
+        FOR UPDATE;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_done = TRUE;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    START TRANSACTION;
+
+    -- Slots before the product row, the order sales take them in
+    SELECT COUNT(*) INTO v_slot FROM stock_escrow WHERE product_sku = p_sku FOR UPDATE;
+    SELECT quantity_in_stock INTO v_stock FROM products WHERE sku = p_sku FOR UPDATE;
+    SELECT id INTO v_sale_movement_type_id FROM movement_types WHERE name = 'sale' LIMIT 1;
+
+    -- Take the escrow back, then apply its sales one by one so trigger 4.4
+    -- records exact before/after quantities
+    UPDATE products SET escrow_quantity = 0 WHERE sku = p_sku;
+
+    SET v_done = FALSE;
+    OPEN pending;
+    apply_sales: LOOP
+        FETCH pending INTO v_qty, v_transaction_id, v_created_by, v_created_at;
+        IF v_done THEN
+            LEAVE apply_sales;
+        END IF;
+        INSERT INTO stock_movements (
+            product_sku, movement_type_id, quantity, reference_id, created_by, created_at
+        ) VALUES (
+            p_sku, v_sale_movement_type_id, v_qty, v_transaction_id, v_created_by, v_created_at
+        );
+        UPDATE products SET quantity_in_stock = quantity_in_stock - v_qty WHERE sku = p_sku;
+    END LOOP;
+    CLOSE pending;
+
+    INSERT INTO sales_daily_sku_rollup (sale_date, product_sku, quantity_sold, revenue)
+    SELECT sale_date, product_sku, SUM(quantity), SUM(line_total)
+    FROM stock_escrow_sales
+    WHERE product_sku = p_sku
+    GROUP BY sale_date, product_sku
+    ON DUPLICATE KEY UPDATE
+        quantity_sold = quantity_sold + VALUES(quantity_sold),
+        revenue = revenue + VALUES(revenue);
+
+    DELETE FROM stock_escrow_sales WHERE product_sku = p_sku;
+
+    -- Re-split what is left
+    SELECT quantity_in_stock INTO v_stock FROM products WHERE sku = p_sku;
+    IF p_slots > 0 AND v_stock >= p_slots * GREATEST(p_min_per_slot, 1) THEN
+        SET v_per_slot = FLOOR(v_stock / p_slots);
+    END IF;
+
+    DELETE FROM stock_escrow WHERE product_sku = p_sku AND slot >= p_slots;
+    SET v_slot = 0;
+    WHILE v_slot < p_slots DO
+        INSERT INTO stock_escrow (product_sku, slot, allotted, sold)
+        VALUES (p_sku, v_slot, v_per_slot, 0)
+        ON DUPLICATE KEY UPDATE allotted = VALUES(allotted), sold = 0;
+        SET v_slot = v_slot + 1;
+    END WHILE;
 
-    SELECT id INTO v_receipt_movement_type_id
+    UPDATE products SET escrow_quantity = v_per_slot * GREATEST(p_slots, 0) WHERE sku = p_sku;
+
+    COMMIT;
+END$$
+DELIMITER ;
+
+-- 5.6 Apply a manual stock movement (receipt, adjustment, return, damage)
+--     inside the caller's transaction, in one call: one conditional UPDATE
+--     changes the stock only if it stays at or above the escrowed quantity
+--     (so never below zero), so there is no window between checking the
+--     stock and changing it. The movement is logged with its snapshots and
+--     one row (movement_id, new_quantity) is returned. A refused movement
+--     changes nothing and SIGNALs why.
+DELIMITER $$
+CREATE PROCEDURE ApplyStockMovement(
+    IN p_sku VARCHAR(50),
+    IN p_movement_type VARCHAR(50),
+    IN p_quantity INT,
+    IN p_reference VARCHAR(100),
+    IN p_reason VARCHAR(255),
+    IN p_user_id INT UNSIGNED
+)
+BEGIN
+    DECLARE v_type_id INT UNSIGNED;
+    DECLARE v_delta INT;
+    DECLARE v_applied INT;
+    DECLARE v_stock INT;
+    DECLARE v_active BOOLEAN;
+    DECLARE v_message VARCHAR(255);
+
+    -- Sales go through RecordSale (5.4)
+    SELECT id, p_quantity * sign INTO v_type_id, v_delta
     FROM movement_types
-    WHERE name = 'receipt'
-    LIMIT 1;
+    WHERE name = p_movement_type AND name <> 'sale';
+    IF v_type_id IS NULL THEN
+        SET v_message = CONCAT('Invalid movement type: ', p_movement_type);
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+    END IF;
+
+    UPDATE products
+    SET quantity_in_stock = quantity_in_stock + v_delta
+    WHERE sku = p_sku
+      AND quantity_in_stock + v_delta >= escrow_quantity
+      AND (is_active = TRUE OR p_movement_type <> 'receipt');
+    SET v_applied = ROW_COUNT();
+
+    -- Our own (locked) row when applied; otherwise only read to explain why not
+    SELECT quantity_in_stock, is_active INTO v_stock, v_active
+    FROM products
+    WHERE sku = p_sku;
+
+    IF v_applied = 0 THEN
+        IF v_stock IS NULL THEN
+            SET v_message = 'Product not found';
+        ELSEIF p_movement_type = 'receipt' AND NOT v_active THEN
+            SET v_message = 'Cannot receive stock for inactive product';
+        ELSEIF v_stock + v_delta < 0 THEN
+            SET v_message = CONCAT('Insufficient stock. Available: ', v_stock, ', tried to remove: ', p_quantity);
+        ELSE
+            SET v_message = 'Stock is held in escrow for sales; release it first';
+        END IF;
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+    END IF;
 
     INSERT INTO stock_movements (
-        product_sku,
-        movement_type_id,
-        quantity,
-        reference_id,
-        created_by
+        product_sku, movement_type_id, quantity, previous_quantity, new_quantity,
+        reference_id, reason, created_by
     ) VALUES (
-        p_sku,
-        v_receipt_movement_type_id,
-        p_quantity,
-        p_reference,
-        p_user_id
+        p_sku, v_type_id, p_quantity, v_stock - v_delta, v_stock,
+        p_reference, p_reason, p_user_id
     );
+
+    SELECT LAST_INSERT_ID() AS movement_id, v_stock AS new_quantity;
 END$$
 DELIMITER ;
 
@@ -465,18 +788,17 @@ FROM products p
 WHERE p.quantity_in_stock <= p.reorder_threshold
   AND p.is_active = TRUE;
 
--- 6.2 Daily sales summary
+-- 6.2 Daily sales summary (from the rollup tables 3.6 / 3.7)
 CREATE VIEW daily_sales_summary AS
 SELECT
-    st.transaction_date,
-    COUNT(DISTINCT st.id) AS transaction_count,
-    COUNT(DISTINCT sli.product_sku) AS unique_products_sold,
-    SUM(sli.quantity) AS total_items_sold,
-    SUM(st.total_amount) AS total_revenue
-FROM sale_transactions st
-JOIN sale_line_items sli ON st.id = sli.transaction_id
-GROUP BY st.transaction_date
-ORDER BY st.transaction_date DESC;
+    r.sale_date AS transaction_date,
+    SUM(r.transaction_count) AS transaction_count,
+    (SELECT COUNT(*) FROM sales_daily_sku_rollup s WHERE s.sale_date = r.sale_date) AS unique_products_sold,
+    SUM(r.items_sold) AS total_items_sold,
+    SUM(r.revenue) AS total_revenue
+FROM sales_daily_rollup r
+GROUP BY r.sale_date
+ORDER BY r.sale_date DESC;
 
 -- 6.3 Product performance (last 30 days turnover)
 CREATE VIEW product_performance AS
@@ -485,19 +807,18 @@ SELECT
     p.name,
     c.name AS category_name,
     p.quantity_in_stock,
-    COALESCE(SUM(sm.quantity), 0) AS total_sold_30d,
-    COALESCE(ROUND(SUM(sm.quantity) / 30, 2), 0) AS avg_daily_sales,
+    COALESCE(SUM(r.quantity_sold), 0) AS total_sold_30d,
+    COALESCE(ROUND(SUM(r.quantity_sold) / 30, 2), 0) AS avg_daily_sales,
     CASE
-        WHEN COALESCE(SUM(sm.quantity), 0) = 0 THEN 'No sales'
+        WHEN COALESCE(SUM(r.quantity_sold), 0) = 0 THEN 'No sales'
         WHEN p.quantity_in_stock = 0 THEN 'Out of stock'
         WHEN p.quantity_in_stock <= p.reorder_threshold THEN 'Reorder needed'
         ELSE 'OK'
     END AS status
 FROM products p
 LEFT JOIN categories c ON p.category_id = c.id
-LEFT JOIN stock_movements sm ON p.sku = sm.product_sku
-    AND sm.movement_type_id = (SELECT id FROM movement_types WHERE name = 'sale' LIMIT 1)
-    AND sm.created_at >= CURDATE() - INTERVAL 30 DAY
+LEFT JOIN sales_daily_sku_rollup r ON p.sku = r.product_sku
+    AND r.sale_date >= CURDATE() - INTERVAL 30 DAY
 WHERE p.is_active = TRUE
 GROUP BY p.sku, p.name, c.name, p.quantity_in_stock, p.reorder_threshold;
 
@@ -543,6 +864,12 @@ CREATE INDEX idx_stock_movements_composite ON stock_movements(product_sku, creat
 CREATE INDEX idx_sale_line_items_product ON sale_line_items(product_sku);
 CREATE INDEX idx_products_category ON products(category_id);
 CREATE INDEX idx_products_supplier ON products(supplier_id);
+-- Keyset pagination: listing sort keys (InnoDB appends the primary key as the tiebreaker)
+CREATE INDEX idx_products_active_name ON products(is_active, name);
+CREATE INDEX idx_products_name ON products(name);
+CREATE INDEX idx_suggestions_listing ON replenishment_suggestions(is_acted_upon, date_generated, suggested_quantity);
+-- Product search with PRODUCT_SEARCH_BACKEND=fulltext
+CREATE FULLTEXT INDEX ft_products_search ON products(name, sku, barcode);
 
 -- =============================================================================
 -- END OF SCHEMA – NO SAMPLE DATA INSERTED
@@ -1,5 +1,7 @@
 import pytest
 import mysql.connector
+from contextlib import contextmanager
+from fastapi import Request
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 import os
@@ -10,8 +12,13 @@ import os
 load_dotenv('.env.test')
 
 from app.main import app
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.instrumentation import instrument, capture_queries
 from app.core.security import hash_password
+from app.core.unit_of_work import UnitOfWork, register
+from app.models.product import product_cache
+from app.models.user import user_cache
+from app.models.integration import api_key_cache
 
 # ----------------------------------------------------------------------
 # Test database connection
@@ -38,7 +45,9 @@ def clean_db(db_connection):
         "audit_log", "replenishment_suggestions", "stock_movements",
         "sale_line_items", "sale_transactions", "user_roles", "users",
         "products", "suppliers", "categories", "api_keys", "webhooks",
-        "webhook_deliveries", "system_settings"
+        "webhook_deliveries", "system_settings", "sales_daily_rollup",
+        "sales_daily_sku_rollup", "idempotency_keys", "stock_escrow",
+        "stock_escrow_sales", "catalog_version_seq"
     ]
     for table in tables:
         try:
@@ -48,6 +57,9 @@ def clean_db(db_connection):
     cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
     db_connection.commit()
     cursor.close()
+    product_cache.clear()
+    user_cache.clear()   # TRUNCATE resets ids, so cached principals would be reused
+    api_key_cache.clear()
     yield
 
 # ----------------------------------------------------------------------
@@ -61,12 +73,56 @@ def db_session(db_connection):
 @pytest.fixture(scope="function")
 def client(db_session):
     """FastAPI TestClient with overridden dependency."""
-    def override_get_db():
-        yield db_session
+    def override_get_db(request: Request):
+        # Same unit of work as production: UnitOfWorkRoute commits it once
+        unit_of_work = UnitOfWork(instrument(db_session))
+        register(request, unit_of_work)
+        try:
+            yield unit_of_work
+            if unit_of_work.pending:
+                unit_of_work.commit_now()
+        finally:
+            db_session.rollback()   # like pool.release(): uncommitted work is dropped
+
+    def override_get_read_db():
+        yield instrument(db_session)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
     yield TestClient(app, base_url="http://test")
     app.dependency_overrides.clear()
 
+# ----------------------------------------------------------------------
+# Query budgets: fail when a request issues more statements than declared
+# ----------------------------------------------------------------------
+@pytest.fixture(scope="function")
+def query_budget(client):
+    """Context manager asserting a per-request statement budget.
+
+        with query_budget(5):
+            client.post("/products", ...)
+
+    Every request made inside the block must run at most `max_queries`
+    statements (and, if given, spend at most `max_db_ms` in the database).
+    """
+    @contextmanager
+    def budget(max_queries: int, max_db_ms: float = None):
+        with capture_queries() as captured:
+            yield captured
+        for request in captured:
+            over_count = request.count > max_queries
+            over_time = max_db_ms is not None and request.total_ms > max_db_ms
+            if over_count or over_time:
+                statements = "\n".join(
+                    f"  {r.elapsed_ms:7.1f}ms  {r.caller}: {' '.join(r.sql.split())[:120]}"
+                    for r in request.statements
+                )
+                pytest.fail(
+                    f"{request.label} ran {request.count} queries in {request.total_ms:.1f}ms "
+                    f"(budget: {max_queries} queries"
+                    f"{f', {max_db_ms}ms' if max_db_ms is not None else ''}):\n{statements}"
+                )
+    return budget
+
 # ----------------------------------------------------------------------
 # Sample data fixtures
 # ----------------------------------------------------------------------
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import pytest
+
+from app.models import integration as integration_model
+from app.models.integration import ApiKeyCache, ApiKeyUsage
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((" ".join(query.split()), params))
+
+    def executemany(self, query, seq_params):
+        self.conn.statements.append((" ".join(query.split()), list(seq_params)))
+
+    def fetchone(self):
+        return dict(self.conn.key) if self.conn.key else None
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, key):
+        self.key = key
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(integration_model, "api_key_cache", ApiKeyCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(integration_model, "api_key_usage", ApiKeyUsage())
+
+def make_key(**overrides):
+    return {"id": 3, "api_key": "k-123", "is_active": True, "expires_at": None, **overrides}
+
+def test_validation_is_cached_and_usage_written_behind():
+    conn = FakeConnection(make_key())
+    for _ in range(5):
+        assert integration_model.validate_api_key(conn, "k-123")["id"] == 3
+    assert len(conn.statements) == 1 and conn.statements[0][0].startswith("SELECT")
+    assert conn.commits == 0
+
+    assert integration_model.flush_api_key_usage(conn) == 1
+    query, rows = conn.statements[-1]
+    assert query.startswith("UPDATE api_keys SET last_used_at")
+    assert [key_id for _, key_id in rows] == [3]
+    assert integration_model.flush_api_key_usage(conn) == 0
+
+def test_revoke_and_regenerate_invalidate_immediately():
+    conn = FakeConnection(make_key())
+    integration_model.validate_api_key(conn, "k-123")
+    integration_model.revoke_api_key(conn, 3)
+    conn.key = None
+    assert integration_model.validate_api_key(conn, "k-123") is None
+
+    conn.key = make_key(id=4, api_key="k-456")
+    integration_model.validate_api_key(conn, "k-456")
+    integration_model.regenerate_api_key(conn, 4)
+    assert integration_model.api_key_usage.pending() == 1   # only the revoked key's last use
+    assert integration_model.api_key_cache.get("k-456") is None
+
+def test_cache_respects_key_expiry():
+    cache = ApiKeyCache(maxsize=10, ttl=60)
+    cache.put_key(make_key(expires_at=datetime.now() - timedelta(seconds=1)))
+    assert cache.get("k-123") is None
+    cache.put_key(make_key(expires_at=datetime.now() + timedelta(hours=1)))
+    assert cache.get("k-123")["id"] == 3
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+from app.api import dependencies
+from app.core import database
+from app.core.async_database import ThreadedConnection
+from app.core.security import create_access_token
+from app.models import admin as admin_model
+from app.models import user as user_model
+
+class FakeCursor:
+    def __init__(self, conn, dictionary):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rowcount = 1
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(" ".join(query.split()))
+
+    def fetchone(self):
+        return dict(self.conn.user) if self.dictionary else (1,)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+        self.user = {"id": 7, "username": "amy", "email": "amy@example.com", "is_active": True, "roles": "manager"}
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self, dictionary)
+
+    def commit(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(user_model.settings, "JWT_SECRET_KEY", "test-secret-key-for-unit-tests-only!")
+    monkeypatch.setattr(user_model.settings, "JWT_ALGORITHM", "HS256")
+    monkeypatch.setattr(user_model.user_cache, "ttl", 60)
+    user_model.user_cache.clear()
+    user_model._principal_changed_at.clear()
+
+def authenticate(token, conn):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(dependencies._authenticate(credentials, ThreadedConnection(conn)))
+
+def lookups(conn):
+    return sum(q.startswith("SELECT u.id") for q in conn.queries)
+
+def test_principal_cached_until_admin_change():
+    conn = FakeConnection()
+    token = create_access_token(data={"sub": "7"})
+    for _ in range(3):
+        assert authenticate(token, conn)["roles"] == "manager"
+    assert lookups(conn) == 1
+
+    # Deactivation through the admin model takes effect on the next request.
+    conn.user["is_active"] = False
+    admin_model.delete_user_admin(conn, 7)
+    with pytest.raises(HTTPException) as exc:
+        authenticate(token, conn)
+    assert exc.value.detail == "Inactive user"
+    assert lookups(conn) == 2
+
+def test_embedded_roles_skip_lookup_until_user_changes(monkeypatch):
+    monkeypatch.setattr(dependencies.settings, "JWT_EMBED_ROLES", True)
+    conn = FakeConnection()
+    token = create_access_token(data={"sub": "7", "username": "amy", "email": "amy@example.com", "roles": "admin"})
+    assert authenticate(token, conn)["roles"] == "admin"
+    assert conn.queries == []
+
+    conn.user["roles"] = "clerk"
+    admin_model.update_user_admin(conn, 7, {"role": "clerk"})
+    conn.queries.clear()
+    assert authenticate(token, conn)["roles"] == "clerk"
+    assert lookups(conn) == 1
+
+def test_sync_reader_authenticates_on_the_route_connection(monkeypatch):
+    class FakePool:
+        def __init__(self):
+            self.connections = []
+
+        def get_connection(self):
+            self.connections.append(FakeConnection())
+            return self.connections[-1]
+
+        def release(self, conn):
+            pass
+
+    pool = FakePool()
+    monkeypatch.setattr(database, "get_pool", lambda: pool)
+    monkeypatch.setattr(database.settings, "DB_REPLICA_HOST", None)
+    app = FastAPI()
+
+    @app.get("/report")
+    def report(conn = Depends(database.get_read_db), current_user = Depends(dependencies.get_current_sync_reader)):
+        return {"user": current_user["id"]}
+
+    token = create_access_token(data={"sub": "7"})
+    response = TestClient(app).get("/report", headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == {"user": 7}
+    assert len(pool.connections) == 1 and lookups(pool.connections[0]) == 1
@@ -0,0 +1,84 @@
+from decimal import Decimal
+import json
+
+from app.models import product as product_model
+from app.models.product import ProductCache, bulk_patch_update, bulk_set_clause
+
+def snapshot(sku, **overrides):
+    row = {"sku": sku, "name": sku, "category_id": 1, "supplier_id": None, "cost_price": Decimal("1.00"),
+           "selling_price": Decimal("2.00"), "reorder_threshold": 5, "is_active": 1}
+    return {**row, **overrides}
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((" ".join(query.split()), params))
+
+    def executemany(self, query, seq_params):
+        self.conn.statements.append((" ".join(query.split()), list(seq_params)))
+
+    def fetchall(self):
+        return self.conn.results.pop(0)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, results):
+        self.results = results
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+def test_percent_change_is_applied_in_sql():
+    sql, params = bulk_set_clause({"price_change_percent": Decimal("5"), "is_active": True})
+    assert sql == "is_active = %s, selling_price = ROUND(selling_price * %s, 2)"
+    assert params == [True, Decimal("1.05")]
+
+def test_patches_become_one_update_join():
+    current = {"A": snapshot("A"), "B": snapshot("B")}
+    query, params = bulk_patch_update({"A": {"sku": "A", "selling_price": Decimal("3.00")},
+                                       "B": {"sku": "B", "name": "Bee"},
+                                       "Z": {"sku": "Z", "name": "missing"}}, current)
+    assert query == ("UPDATE products p JOIN (SELECT %s AS sku, %s AS name, %s AS selling_price "
+                     "UNION ALL SELECT %s, %s, %s) v ON p.sku = v.sku "
+                     "SET p.name = v.name, p.selling_price = v.selling_price")
+    assert params == ["A", "A", Decimal("3.00"), "B", "Bee", Decimal("2.00")]
+
+def test_bulk_update_diffs_audits_and_invalidates(monkeypatch):
+    cache = ProductCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(product_model, "product_cache", cache)
+    cache.put(snapshot("A"))
+    conn = FakeConnection([
+        [snapshot("A"), snapshot("B")],                                       # locked filter rows
+        [snapshot("A", selling_price=Decimal("2.10")), snapshot("B")],       # after (B unchanged)
+    ])
+    result = product_model.bulk_update_products(
+        conn, {"category_id": 1}, {"price_change_percent": 5}, [], user_id=9
+    )
+    assert result["affected"] == 1 and result["diffs"] == [
+        {"sku": "A", "before": {"selling_price": Decimal("2.00")}, "after": {"selling_price": Decimal("2.10")}}
+    ]
+    assert conn.statements[0][0].endswith("WHERE category_id = %s FOR UPDATE")
+    assert conn.statements[1][0].startswith("UPDATE products SET selling_price = ROUND")
+    audit_query, audit_rows = conn.statements[-1]
+    assert audit_query.startswith("INSERT INTO audit_log") and len(audit_rows) == 1
+    assert json.loads(audit_rows[0][2]) == {"selling_price": "2.10"} and audit_rows[0][3] == 9
+    assert conn.committed and cache.get("A") is None
+
+def test_dry_run_rolls_back():
+    conn = FakeConnection([[snapshot("A")], [snapshot("A", name="New")]])
+    result = product_model.bulk_update_products(conn, None, None, [{"sku": "A", "name": "New"}, {"sku": "Q"}], None, True)
+    assert result["dry_run"] and result["affected"] == 1 and result["not_found"] == ["Q"]
+    assert conn.rolled_back and not conn.committed
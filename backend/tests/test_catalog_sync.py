@@ -0,0 +1,28 @@
+from app.models.product import catalog_page, catalog_snapshot
+
+def row(version, settled=True, sku=None, is_active=1):
+    return {"sku": sku or f"S-{version}", "barcode": f"B-{version}", "name": "x", "category_id": None,
+            "selling_price": 1, "quantity_in_stock": 3, "is_active": is_active,
+            "catalog_version": version, "settled": int(settled)}
+
+def test_cursor_stops_before_unsettled_rows():
+    page = catalog_page([row(11), row(12), row(14, settled=False), row(15)], since=10, limit=100)
+    assert page["version"] == 12 and page["has_more"] is False
+    assert [r[-1] for r in page["rows"]] == [11, 12, 14, 15]      # fresh rows are still delivered
+    assert page["columns"][-1] == "catalog_version" and "settled" not in page["columns"]
+
+def test_full_settled_page_has_more():
+    page = catalog_page([row(3), row(4)], since=2, limit=2)
+    assert page["version"] == 4 and page["has_more"] is True
+    empty = catalog_page([], since=9, limit=100)
+    assert empty["version"] == 9 and empty["has_more"] is False and empty["rows"] == []
+
+def test_full_page_with_unsettled_row_has_more():
+    # The cursor holds at 12, but rows past the page may still be waiting
+    page = catalog_page([row(11), row(12), row(14, settled=False), row(15)], since=10, limit=4)
+    assert page["version"] == 12 and page["has_more"] is True
+
+def test_snapshot_resumes_below_the_oldest_fresh_row():
+    assert catalog_snapshot([row(5), row(9, settled=False), row(7, settled=False)])["version"] == 6
+    assert catalog_snapshot([row(5), row(8)])["version"] == 8
+    assert catalog_snapshot([])["version"] == 0
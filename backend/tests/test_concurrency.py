@@ -0,0 +1,58 @@
+import threading
+import time
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.database import get_db
+from app.core.security import create_access_token
+
+SLOW_QUERY_SECONDS = 1.0
+
+class SlowAuthCursor:
+    """Blocking cursor that stalls like a slow users/roles lookup."""
+    def execute(self, query, params=None):
+        time.sleep(SLOW_QUERY_SECONDS)
+
+    def fetchone(self):
+        return {"id": 424242, "username": "slow_user", "email": "slow@example.com",
+                "is_active": True, "roles": "clerk"}
+
+    def close(self):
+        pass
+
+class SlowAuthConnection:
+    def cursor(self, dictionary=False):
+        return SlowAuthCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def test_slow_auth_lookup_does_not_block_other_requests():
+    def override_get_db():
+        yield SlowAuthConnection()
+    app.dependency_overrides[get_db] = override_get_db
+    token = create_access_token(data={"sub": "424242"})
+    try:
+        # A single portal means both requests share one event loop.
+        with TestClient(app, base_url="http://test") as client:
+            results = {}
+            def slow_request():
+                results["me"] = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+            worker = threading.Thread(target=slow_request)
+            worker.start()
+            time.sleep(0.1)  # let the auth lookup start
+
+            started = time.monotonic()
+            health = client.get("/api/health")
+            elapsed = time.monotonic() - started
+            worker.join()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert health.status_code == 200
+    assert elapsed < SLOW_QUERY_SECONDS / 2
+    assert results["me"].status_code == 200
+    assert results["me"].json()["username"] == "slow_user"
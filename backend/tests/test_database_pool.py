@@ -0,0 +1,73 @@
+import threading
+import time
+import pytest
+from mysql.connector.errors import PoolError
+
+from app.core import database
+
+class FakeConnection:
+    in_transaction = False
+    unread_result = False
+
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(database.mysql.connector, "connect", lambda **kwargs: FakeConnection())
+    return database.ConnectionPool("test", {}, size=2, max_overflow=1, timeout=0.2, max_age=60, ping_after=60)
+
+def test_pool_overflow_then_exhaustion(pool):
+    conns = [pool.get_connection() for _ in range(3)]
+    with pytest.raises(PoolError):
+        pool.get_connection()
+    stats = pool.stats()
+    assert stats["in_use"] == 3
+    assert stats["overflow_peak"] == 1
+    assert stats["exhausted"] == 1
+    for conn in conns:
+        pool.release(conn)
+    # The overflow connection is closed, the rest go back to idle.
+    assert pool.stats()["idle"] == 2
+    assert sum(conn.closed for conn in conns) == 1
+
+def test_pool_waits_for_released_connection(pool):
+    conns = [pool.get_connection() for _ in range(3)]
+    threading.Timer(0.05, pool.release, args=(conns[0],)).start()
+    conn = pool.get_connection()
+    assert conn is conns[0]
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert sum(stats["wait_histogram"].values()) == stats["checkouts"]
+
+def test_pool_recycles_and_validates_stale_connections(pool):
+    conn = pool.get_connection()
+    pool.release(conn)
+    pool.max_age = 0
+    time.sleep(0.01)
+    fresh = pool.get_connection()
+    assert fresh is not conn and conn.closed
+    assert pool.stats()["recycled"] == 1
+
+    pool.release(fresh)
+    pool.max_age, pool.ping_after = 60, 0
+    time.sleep(0.01)
+    assert pool.get_connection() is fresh
+    assert fresh.pings == 1
+
+def test_pool_discards_connection_with_unread_result(pool):
+    conn = pool.get_connection()
+    conn.unread_result = True   # an unbuffered read abandoned mid-result
+    pool.release(conn)
+    assert conn.closed
+    assert pool.stats()["idle"] == 0
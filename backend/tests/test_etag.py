@@ -0,0 +1,38 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import etag as etag_module
+from app.core.etag import conditional_get
+
+calls = []
+app = FastAPI()
+
+@app.get("/categories")
+def list_categories(etag = Depends(conditional_get("categories"))):
+    calls.append(1)
+    return [{"id": 1, "name": "Dairy"}]
+
+def test_not_modified_without_running_the_route(monkeypatch):
+    monkeypatch.setattr(etag_module, "table_versions", etag_module.TTLCache(maxsize=8, ttl=60))
+    loads = []
+    def fake_load(tables, replica=False):
+        loads.append(tables)
+        version = 2 + len(loads)                         # each reload sees one more write
+        etag_module.table_versions.put("categories", version)
+        return {"categories": version}
+    monkeypatch.setattr(etag_module, "load_table_versions", fake_load)
+    client = TestClient(app)
+    calls.clear()
+
+    first = client.get("/categories")
+    tag = first.headers["ETag"]
+    assert first.status_code == 200 and tag.startswith('"')
+    assert first.headers["Cache-Control"].startswith("private")
+
+    again = client.get("/categories", headers={"If-None-Match": f'"other", {tag}'})
+    assert again.status_code == 304 and again.content == b"" and again.headers["ETag"] == tag
+    assert len(calls) == 1 and len(loads) == 1          # second request answered from the version cache
+
+    etag_module.table_versions.invalidate("categories")  # a write committed in this process
+    changed = client.get("/categories", headers={"If-None-Match": tag})
+    assert changed.status_code == 200 and len(loads) == 2
@@ -0,0 +1,152 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import database, export
+from app.core.streaming import CSV, NDJSON
+from app.models.report import stock_movement_export_query
+from app.models.sale import transaction_export_query
+
+ROWS = [
+    (1, "TXN-1", datetime(2026, 1, 2, 9, 30), "clerk", Decimal("12.50")),
+    (2, "TXN-2", datetime(2026, 1, 2, 10, 0), "a, \"b\"", Decimal("3.00")),
+    (3, "TXN-3", datetime(2026, 1, 3, 8, 15), "clerk", Decimal("7.25")),
+]
+COLUMNS = ["id", "transaction_number", "transaction_date", "username", "total_amount"]
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.closed = False
+
+    def execute(self, query, params=()):
+        self.conn.statements.append(query)
+        if not query.startswith("SET"):
+            self.description = [(c,) for c in COLUMNS]
+            self.conn.pending = list(ROWS)
+
+    def fetchmany(self, size):
+        self.conn.fetches += 1
+        batch, self.conn.pending = self.conn.pending[:size], self.conn.pending[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.pending = []
+        self.fetches = 0
+        self.released = False
+        self.cursors = []
+
+    def cursor(self):
+        cursor = FakeCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.checkouts = 0
+
+    def get_connection(self):
+        self.checkouts += 1
+        return self.conn
+
+    def release(self, conn):
+        conn.released = True
+        self.streamed_before_release = all(cursor.closed for cursor in conn.cursors)
+
+def body_of(response):
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+def test_csv_writes_header_then_one_chunk_per_batch():
+    chunks = list(export.encode_csv(COLUMNS, [ROWS[:2], ROWS[2:]]))
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == COLUMNS
+    assert rows[2] == ["2", "TXN-2", "2026-01-02 10:00:00", 'a, "b"', "3.00"]
+    assert len(rows) == 4
+
+def test_csv_without_rows_is_just_the_header():
+    assert b"".join(export.encode_csv(COLUMNS, [])) == b"id,transaction_number,transaction_date,username,total_amount\r\n"
+
+def test_ndjson_encodes_dates_and_decimals():
+    lines = b"".join(export.encode_ndjson(COLUMNS, [ROWS[:1]])).decode().splitlines()
+    assert json.loads(lines[0]) == {
+        "id": 1, "transaction_number": "TXN-1", "transaction_date": "2026-01-02T09:30:00",
+        "username": "clerk", "total_amount": "12.50",
+    }
+
+def test_gzip_chunks_round_trip():
+    chunks = [b"a" * 1000, b"b" * 1000, b""]
+    assert gzip.decompress(b"".join(export.gzip_chunks(chunks))) == b"".join(chunks)
+
+def test_export_response_streams_in_batches(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_SIZE", 2)
+    response = export.export_response(conn, "SELECT ...", (), NDJSON, False, "sales")
+    # The query runs before the response starts; nothing is fetched yet.
+    assert conn.statements[-1] == "SELECT ..." and conn.fetches == 0
+    assert response.headers["content-disposition"] == 'attachment; filename="sales.ndjson"'
+    assert response.media_type == "application/x-ndjson"
+    lines = body_of(response).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
+    assert conn.fetches == 3   # two batches and the empty one that ends the stream
+    assert conn.cursors[0].closed
+
+def test_export_response_gzip():
+    conn = FakeConnection()
+    response = export.export_response(conn, "SELECT ...", (), CSV, True, "stock_movements")
+    assert response.media_type == "application/gzip"
+    assert response.headers["content-disposition"] == 'attachment; filename="stock_movements.csv.gz"'
+    rows = list(csv.reader(io.StringIO(gzip.decompress(body_of(response)).decode())))
+    assert rows[0] == COLUMNS and len(rows) == 4
+
+def test_abandoned_export_leaves_cursor_open(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_SIZE", 1)
+    chunks = export._export_chunks(conn, "SELECT ...", (), CSV, False)
+    next(chunks)
+    next(chunks)
+    chunks.close()
+    # The cursor still has unread rows; the pool discards the connection.
+    assert not conn.cursors[0].closed
+
+def test_export_streams_on_the_route_connection_until_sent(monkeypatch):
+    conn = FakeConnection()
+    pool = FakePool(conn)
+    monkeypatch.setattr(database, "get_pool", lambda: pool)
+    monkeypatch.setattr(database.settings, "DB_REPLICA_HOST", None)
+    app = FastAPI()
+
+    @app.get("/export")
+    def export_rows(conn = Depends(database.get_read_db)):
+        return export.export_response(conn, "SELECT ...", (), CSV, False, "sales")
+
+    response = TestClient(app).get("/export")
+    assert len(response.text.splitlines()) == 4
+    # One connection, released only after the last row was sent
+    assert pool.checkouts == 1 and conn.released and pool.streamed_before_release
+
+def test_export_queries_use_sargable_date_ranges():
+    query, params = transaction_export_query(date(2026, 1, 1), date(2026, 1, 31), lines=True)
+    assert "st.transaction_date < %s + INTERVAL 1 DAY" in query
+    assert query.rstrip().endswith("ORDER BY st.transaction_date, st.id, sli.id")
+    assert params == (date(2026, 1, 1), date(2026, 1, 31))
+
+    query, params = stock_movement_export_query(to_date=date(2026, 1, 31), movement_type="SALE")
+    assert "DATE(" not in query and "LIMIT" not in query
+    assert params == (date(2026, 1, 31), "SALE")
@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.api.dependencies import get_current_user, idempotent_write
+from app.core import idempotency
+from app.core.async_database import get_async_db
+from app.core.unit_of_work import UnitOfWorkRoute, register
+
+class FakeCursor:
+    def __init__(self, store):
+        self.store = store
+        self.row = None
+
+    async def execute(self, query, params=None):
+        rows = self.store.rows
+        if query == idempotency.IDEMPOTENCY_CLAIM:
+            key, fingerprint, token, _ = params
+            rows.setdefault(key, {"request_hash": fingerprint, "claim_token": token,
+                                  "status_code": None, "response_body": None})
+        elif query == idempotency.IDEMPOTENCY_SELECT:
+            self.row = dict(rows[params[0]])
+        elif query == idempotency.IDEMPOTENCY_COMPLETE:
+            status_code, body, _, key, token = params
+            if rows[key]["claim_token"] == token:
+                rows[key].update(status_code=status_code, response_body=body)
+        elif query == idempotency.IDEMPOTENCY_RELEASE:
+            if rows.get(params[0], {}).get("claim_token") == params[1]:
+                del rows[params[0]]
+
+    async def fetchone(self):
+        return self.row
+
+    async def close(self):
+        pass
+
+class FakeStore:
+    def __init__(self):
+        self.rows = {}
+
+    async def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    async def commit(self):
+        pass
+
+    async def commit_now(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+class Receipt(BaseModel):
+    sku: str
+    quantity: int
+
+store = FakeStore()
+writes = []
+app = FastAPI()
+
+@app.exception_handler(idempotency.IdempotentReplay)
+async def replay(request: Request, exc: idempotency.IdempotentReplay):
+    return Response(exc.body, exc.status_code, media_type="application/json",
+                    headers={idempotency.REPLAYED_HEADER: "true"})
+
+@app.post("/receipt", status_code=201)
+async def receive(receipt: Receipt, current_user = Depends(get_current_user),
+                  idem = Depends(idempotent_write(201))):
+    if receipt.quantity > 100:
+        raise HTTPException(status_code=400, detail="Too many")
+    writes.append(receipt.sku)
+    return await idem.complete({"movement_id": len(writes), "sku": receipt.sku})
+
+class FailingCommit:
+    """A unit of work whose commit fails once the route has returned."""
+    async def finish(self):
+        raise RuntimeError("Lost connection to MySQL server during query")
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+@router.post("/sale", status_code=201)
+async def sell(request: Request, receipt: Receipt, current_user = Depends(get_current_user),
+               idem = Depends(idempotent_write(201))):
+    writes.append(receipt.sku)    # commits on its own, like ProcessSale
+    result = await idem.complete({"transaction_id": len(writes)}, committed=True)
+    register(request, FailingCommit())
+    return result
+
+app.include_router(router)
+
+async def fake_db():
+    yield store
+
+app.dependency_overrides[get_async_db] = fake_db
+app.dependency_overrides[get_current_user] = lambda: {"id": 7}
+client = TestClient(app)
+
+def test_retry_returns_stored_response_without_writing_again():
+    writes.clear()
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/receipt", json={"sku": "A", "quantity": 1}, headers=headers)
+    again = client.post("/receipt", json={"sku": "A", "quantity": 1}, headers=headers)
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json() == {"movement_id": 1, "sku": "A"}
+    assert again.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert writes == ["A"]
+
+    # Without a key every request writes
+    client.post("/receipt", json={"sku": "A", "quantity": 1})
+    assert writes == ["A", "A"]
+
+def test_key_reused_for_another_request_is_rejected():
+    headers = {"Idempotency-Key": "reuse-1"}
+    assert client.post("/receipt", json={"sku": "A", "quantity": 1}, headers=headers).status_code == 201
+    assert client.post("/receipt", json={"sku": "B", "quantity": 1}, headers=headers).status_code == 422
+
+def test_in_flight_claim_is_a_conflict():
+    key = idempotency.key_hash(7, "busy-1")
+    body = b'{"sku":"A","quantity":1}'
+    store.rows[key] = {"request_hash": idempotency.request_hash("POST", "/receipt", body),
+                       "claim_token": "other-worker", "status_code": None, "response_body": None}
+    response = client.post("/receipt", content=body, headers={"Idempotency-Key": "busy-1",
+                                                              "Content-Type": "application/json"})
+    assert response.status_code == 409 and response.headers["Retry-After"] == "1"
+
+def test_failed_request_releases_the_key():
+    writes.clear()
+    headers = {"Idempotency-Key": "fail-1"}
+    assert client.post("/receipt", json={"sku": "A", "quantity": 500}, headers=headers).status_code == 400
+    assert idempotency.key_hash(7, "fail-1") not in store.rows
+    # The same key with the same request can be retried
+    assert client.post("/receipt", json={"sku": "A", "quantity": 500}, headers=headers).status_code == 400
+
+def test_failed_commit_after_self_committed_write_does_not_write_again():
+    writes.clear()
+    headers = {"Idempotency-Key": "sale-1"}
+    failing = TestClient(app, raise_server_exceptions=False)
+    assert failing.post("/sale", json={"sku": "A", "quantity": 1}, headers=headers).status_code == 500
+    # The sale stayed committed, and so did its response: the retry replays it
+    again = failing.post("/sale", json={"sku": "A", "quantity": 1}, headers=headers)
+    assert again.status_code == 201 and again.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert writes == ["A"]
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+
+from app.core import instrumentation
+from app.core.instrumentation import (
+    instrument, start_request_stats, reset_request_stats, statement_shape, capture_queries
+)
+from app.core.async_database import ThreadedConnection
+from app.models import user as user_model
+from app.models.aio import user as aio_user_model
+
+USER_ROW = {"id": 1, "username": "u", "email": "u@example.com", "is_active": True, "roles": "clerk"}
+
+class FakeCursor:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def execute(self, query, params=None):
+        time.sleep(self.delay)
+
+    def fetchone(self):
+        return USER_ROW
+
+    def fetchall(self):
+        return [USER_ROW, USER_ROW]
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.delay)
+
+def collect(fn):
+    stats, token = start_request_stats("GET /test")
+    try:
+        fn()
+    finally:
+        reset_request_stats(token)
+    return stats
+
+def test_statement_shape_ignores_literals():
+    assert statement_shape("SELECT * FROM t WHERE id = 5 AND name = 'x'") == \
+        statement_shape("SELECT *  FROM t\n WHERE id = 42 AND name = 'other'")
+    assert statement_shape("SELECT 1 FROM t WHERE id IN (%s, %s)") == \
+        statement_shape("SELECT 1 FROM t WHERE id IN (%s,%s,%s)")
+
+def test_records_count_rows_and_model_caller(monkeypatch):
+    records = []
+    monkeypatch.setattr(instrumentation, "record_statement", records.append)
+    conn = instrument(FakeConnection())
+    assert user_model.get_user_by_id(conn, 1) == USER_ROW
+    assert len(records) == 1
+    assert records[0].caller == "models.user.get_user_by_id"
+    assert records[0].rows == 1
+
+def test_threaded_async_cursor_keeps_model_caller(monkeypatch):
+    records = []
+    monkeypatch.setattr(instrumentation, "record_statement", records.append)
+    conn = ThreadedConnection(instrument(FakeConnection()))
+    asyncio.run(aio_user_model.get_user_by_id(conn, 1))
+    assert records[0].caller == "models.aio.user.get_user_by_id"
+
+def test_slow_queries_logged_and_n_plus_one_flagged(monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation.settings, "DB_SLOW_QUERY_MS", 5)
+    monkeypatch.setattr(instrumentation.settings, "DB_N_PLUS_ONE_THRESHOLD", 3)
+    caplog.set_level(logging.WARNING)
+
+    slow = collect(lambda: user_model.get_user_by_id(instrument(FakeConnection(delay=0.01)), 1))
+    assert slow.count == 1 and slow.total_ms >= 10
+    assert any("slow query" in r.getMessage() for r in caplog.records)
+
+    conn = instrument(FakeConnection())
+    stats = collect(lambda: [user_model.get_user_by_id(conn, i) for i in range(4)])
+    assert stats.count == 4
+    assert list(stats.n_plus_one.values()) == ["models.user.get_user_by_id"]
+    assert sum("Possible N+1" in r.getMessage() for r in caplog.records) == 1
+
+def test_capture_queries_groups_by_request():
+    conn = instrument(FakeConnection())
+    with capture_queries() as captured:
+        collect(lambda: user_model.get_user_by_id(conn, 1))
+        collect(lambda: [user_model.get_user_by_id(conn, i) for i in range(2)])
+    assert [(r.label, r.count) for r in captured] == [("GET /test", 1), ("GET /test", 2)]
@@ -35,4 +35,54 @@ def test_get_movements(client, auth_headers_manager, auth_headers_clerk, sample_
     response = client.get("/inventory/movements", headers=auth_headers_clerk)
     assert response.status_code == 200
     data = response.json()
-    assert len(data) >= 1
\ No newline at end of file
+    assert len(data) >= 1
+
+
+def test_hot_sku_escrow_never_oversells(client, auth_headers_manager, auth_headers_clerk, sample_product):
+    response = client.put(f"/inventory/escrow/{sample_product}", headers=auth_headers_manager, json={"slots": 4})
+    assert response.status_code == 200
+
+    def sell(number, quantity):
+        return client.post("/sales", headers=auth_headers_clerk, json={
+            "transaction_number": number,
+            "transaction_date": "2026-02-14T10:00:00",
+            "items": [{"sku": sample_product, "quantity": quantity, "unit_price": 75.00}]
+        })
+
+    # 100 in stock over 4 slots: each sale takes one slot
+    for i in range(4):
+        assert sell(f"HOT-{i}", 25).status_code == 201
+    escrow = client.get("/inventory/escrow", headers=auth_headers_manager).json()
+    assert escrow == [{**escrow[0], "slots": 4, "escrow_available": 0, "pending_sold": 100}]
+
+    # The product row still shows 100 until consolidation, but nothing is left to sell
+    response = sell("HOT-4", 1)
+    assert response.status_code == 400
+    assert "Insufficient stock" in response.json()["detail"]
+
+    # Turning escrow off applies the escrowed sales and logs their movements
+    client.put(f"/inventory/escrow/{sample_product}", headers=auth_headers_manager, json={"slots": 0})
+    stock = client.get(f"/inventory/stock/{sample_product}", headers=auth_headers_clerk).json()
+    assert stock["quantity_in_stock"] == 0
+    movements = client.get(f"/inventory/movements?product_sku={sample_product}", headers=auth_headers_clerk).json()
+    assert sorted(m["new_quantity"] for m in movements if m["movement_type"] == "sale") == [0, 25, 50, 75]
+
+
+def test_adjust_stock_cannot_remove_more_than_in_stock(client, auth_headers_manager, auth_headers_clerk, sample_product):
+    response = client.post("/inventory/adjust", headers=auth_headers_manager, json={
+        "product_sku": sample_product,
+        "movement_type": "damage",
+        "quantity": 101,
+        "reason": "Flood"
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient stock. Available: 100, tried to remove: 101"
+    stock = client.get(f"/inventory/stock/{sample_product}", headers=auth_headers_clerk).json()
+    assert stock["quantity_in_stock"] == 100
+
+
+def test_receive_stock_unknown_product(client, auth_headers_manager):
+    response = client.post("/inventory/receipt", headers=auth_headers_manager, json={
+        "product_sku": "NO-SUCH-SKU", "quantity": 5
+    })
+    assert response.status_code == 404
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from fastapi import HTTPException
+
+from app.core.async_database import ThreadedConnection
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models import replenishment as replenishment_model
+from app.models import sale as sale_model
+from app.models import stock_movement as stock_movement_model
+from app.models.aio import sale as aio_sale_model
+from app.models.aio import stock_movement as aio_stock_movement_model
+from app.models.sale import TRANSACTION_KEYSET
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.query = " ".join(query.split())
+        self.conn.params = params
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+def test_cursor_round_trip_keeps_types():
+    values = [datetime(2026, 3, 1, 12, 30, 5, 120000), Decimal("4.50"), 17]
+    assert decode_cursor("transactions", encode_cursor("transactions", values), 3) == values
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor("products", ["Apple", "SKU-1"]), encode_cursor("transactions", [1])])
+def test_foreign_or_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("transactions", cursor, 2)
+    assert exc.value.status_code == 400
+
+def test_next_cursor_only_on_full_pages():
+    rows = [{"transaction_date": datetime(2026, 3, 1), "id": i} for i in (9, 8)]
+    assert TRANSACTION_KEYSET.next_cursor(rows, limit=3) is None
+    assert TRANSACTION_KEYSET.decode(TRANSACTION_KEYSET.next_cursor(rows, limit=2)) == [datetime(2026, 3, 1), 8]
+
+def test_after_replaces_offset_with_keyset_condition():
+    conn = FakeConnection()
+    generated = datetime(2026, 3, 1)
+    replenishment_model.get_suggestions(conn, True, 50, 200, [generated, 12, 40])
+    assert ("(rs.date_generated < %s) OR (rs.date_generated = %s AND rs.suggested_quantity < %s) OR "
+            "(rs.date_generated = %s AND rs.suggested_quantity = %s AND rs.id < %s)") in conn.query
+    assert conn.query.endswith("ORDER BY rs.date_generated DESC, rs.suggested_quantity DESC, rs.id DESC LIMIT %s OFFSET %s")
+    assert conn.params == (generated, generated, 12, generated, 12, 40, 50, 0)
+
+def test_sync_and_async_listings_run_the_same_query():
+    moved = datetime(2026, 3, 2)
+    for sync_list, async_list, args in [
+        (sale_model.get_transactions, aio_sale_model.get_transactions, (None, None, 10, 30, [moved, 7])),
+        (stock_movement_model.get_stock_movements, aio_stock_movement_model.get_stock_movements, ("SKU-1", 20, 40, [moved, 5])),
+    ]:
+        conn, async_conn = FakeConnection(), FakeConnection()
+        sync_list(conn, *args)
+        asyncio.run(async_list(ThreadedConnection(async_conn), *args))
+        assert (async_conn.query, async_conn.params) == (conn.query, conn.params)
+        assert conn.params[-1] == 0     # the cursor replaced the offset
@@ -0,0 +1,67 @@
+import time
+
+from app.models import product as product_model
+from app.models.product import ProductCache
+
+def make_product(sku, barcode=None):
+    return {"sku": sku, "barcode": barcode or f"BC-{sku}", "name": sku, "quantity_in_stock": 10}
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.queries += 1
+        self.sku = params[0]
+
+    def fetchone(self):
+        return make_product(self.sku)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, from_replica=False):
+        self.queries = 0
+        self.from_replica = from_replica
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+def test_lru_eviction_ttl_and_barcode_index():
+    cache = ProductCache(maxsize=2, ttl=60)
+    for sku in ("A", "B"):
+        cache.put(make_product(sku))
+    assert cache.get("A")["sku"] == "A"      # A is now most recently used
+    cache.put(make_product("C"))
+    assert cache.get("B") is None and cache.get_by_barcode("BC-B") is None
+    assert cache.get_by_barcode("BC-C")["sku"] == "C"
+
+    cache.ttl = 0.01
+    cache.put(make_product("D"))
+    time.sleep(0.02)
+    assert cache.get("D") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 2 and stats["hits"] == 2
+
+def test_invalidation_wins_over_racing_read():
+    cache = ProductCache(maxsize=10, ttl=60)
+    cache.put(make_product("A", barcode="OLD"))
+    version = cache.version                  # a reader starts its query...
+    cache.invalidate("A")                    # ...a writer updates the row...
+    cache.put(make_product("A"), version)    # ...the stale row is not cached
+    assert cache.get("A") is None
+    assert cache.get_by_barcode("OLD") is None
+
+def test_model_lookup_uses_cache(monkeypatch):
+    cache = ProductCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(product_model, "product_cache", cache)
+    conn = FakeConnection()
+    for _ in range(3):
+        assert product_model.get_product_by_sku(conn, "A")["sku"] == "A"
+    assert conn.queries == 1
+
+    replica = FakeConnection(from_replica=True)
+    product_model.get_product_by_sku(replica, "B")
+    product_model.get_product_by_sku(replica, "B")
+    assert replica.queries == 2
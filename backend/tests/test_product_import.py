@@ -0,0 +1,136 @@
+import asyncio
+from decimal import Decimal
+from typing import Optional
+
+import pytest
+from mysql.connector import errors
+from pydantic import BaseModel, Field
+
+from app.core.async_database import ThreadedConnection
+from app.core.unit_of_work import UnitOfWork
+from app.models.aio import product as product_model
+
+class ProductRow(BaseModel):
+    sku: str = Field(..., min_length=1)
+    barcode: Optional[str] = None
+    name: str
+    category_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    cost_price: Decimal = Field(Decimal("0"), ge=0)
+    selling_price: Decimal = Field(..., ge=0)
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.conn.lookups.append(params)
+        products = {**self.conn.products, **self.conn.staged}
+        self.rows = [(sku, barcode) for sku, barcode in products.items() if sku in params or barcode in params]
+
+    def executemany(self, query, seq_params):
+        seq_params = list(seq_params)
+        if any(values[0] in self.conn.fail_skus for values in seq_params):
+            raise errors.IntegrityError(msg="Duplicate entry for key 'sku'", errno=1062)
+        self.conn.batches.append([values[0] for values in seq_params])
+        self.conn.staged.update((values[0], values[1]) for values in seq_params)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, products=None, fail_skus=()):
+        self.products = dict(products or {})    # committed: sku -> barcode
+        self.staged = {}
+        self.fail_skus = set(fail_skus)
+        self.lookups = []
+        self.batches = []
+        self.commits = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.products.update(self.staged)
+        self.staged = {}
+        self.commits += 1
+
+    def rollback(self):
+        self.staged = {}
+
+def product(sku, barcode=None, **fields):
+    return {"sku": sku, "barcode": barcode, "name": f"Product {sku}", "selling_price": "2.50", **fields}
+
+def run_import(conn, records):
+    """Feed records (dicts, or strings for rows the parser rejected) through an import."""
+    async def go():
+        job = product_model.ProductImport(ThreadedConnection(UnitOfWork(conn)), ProductRow, {1}, {7})
+        for row, record in enumerate(records, start=1):
+            if isinstance(record, str):
+                await job.add(row, None, record)
+            else:
+                await job.add(row, record, None)
+        await job.flush()
+        return job.result
+    return asyncio.run(go())
+
+@pytest.fixture(autouse=True)
+def batch_size(monkeypatch):
+    monkeypatch.setattr(product_model.settings, "PRODUCT_IMPORT_BATCH_SIZE", 2)
+
+def test_row_errors_are_reported_per_row():
+    conn = FakeConnection()
+    result = run_import(conn, [
+        product("A", "B-A", category_id=1, supplier_id=7),
+        "Malformed CSV row",
+        {"sku": "C", "selling_price": "-1"},
+        product("A"),
+        product("D", "B-A"),
+        product("E", category_id=2),
+        product("F", supplier_id=8),
+    ])
+    assert (result["received"], result["imported"], result["failed"]) == (7, 1, 6)
+    errors = {e["row"]: (e["sku"], e["errors"]) for e in result["errors"]}
+    assert errors[2] == (None, ["Malformed CSV row"])
+    assert errors[3][0] == "C" and sorted(m.split(":")[0] for m in errors[3][1]) == ["name", "selling_price"]
+    assert errors[4] == ("A", ["Duplicate SKU in upload"])
+    assert errors[5] == ("D", ["Duplicate barcode in upload"])
+    assert errors[6] == ("E", ["Unknown category_id"])
+    assert errors[7] == ("F", ["Unknown supplier_id"])
+    assert conn.products == {"A": "B-A"}
+
+def test_existing_skus_and_barcodes_are_checked_once_per_batch():
+    conn = FakeConnection(products={"OLD": "B-OLD"})
+    result = run_import(conn, [product("OLD"), product("NEW", "B-OLD"), product("OK")])
+    assert result["imported"] == 1 and result["failed"] == 2
+    assert [(e["sku"], e["errors"]) for e in result["errors"]] == [
+        ("OLD", ["SKU already exists"]), ("NEW", ["Barcode already exists"])]
+    assert len(conn.lookups) == 2       # one lookup per batch, not per row
+    assert "OK" in conn.products
+
+def test_rows_are_inserted_and_committed_in_batches():
+    conn = FakeConnection()
+    result = run_import(conn, [product(f"S-{n}") for n in range(5)])
+    assert result["imported"] == 5 and result["failed"] == 0
+    assert conn.batches == [["S-0", "S-1"], ["S-2", "S-3"], ["S-4"]]
+    assert conn.commits == 3
+
+def test_failed_batch_is_reported_and_the_rest_imported():
+    conn = FakeConnection(fail_skus={"S-3"})
+    result = run_import(conn, [product(f"S-{n}") for n in range(5)])
+    assert result["imported"] == 3 and result["failed"] == 2
+    assert [e["sku"] for e in result["errors"]] == ["S-2", "S-3"]
+    assert result["errors"][0]["errors"][0].startswith("Batch insert failed")
+    assert sorted(conn.products) == ["S-0", "S-1", "S-4"]
+
+def test_later_batch_failure_keeps_earlier_batches_committed():
+    # Inside the request's unit of work each batch still commits on its own
+    conn = FakeConnection(fail_skus={"S-5"})
+    result = run_import(conn, [product(f"S-{n}") for n in range(6)])
+    assert result["imported"] == 4 and result["failed"] == 2
+    assert sorted(conn.products) == ["S-0", "S-1", "S-2", "S-3"]
+    assert conn.commits == 2 and conn.staged == {}
@@ -0,0 +1,76 @@
+from app.core.search import ProductSearchIndex
+from app.models import product as product_model
+
+def row(sku, name, barcode=None):
+    return {"sku": sku, "barcode": barcode, "name": name, "selling_price": 1}
+
+def make_index():
+    index = ProductSearchIndex()
+    index.load([
+        row("MLK-001", "Fresh Milk 1L", "5000111"),
+        row("MLK-002", "Milk Chocolate Bar", "5000222"),
+        row("BRD-001", "Whole Wheat Bread", "5000333"),
+        row("CHC-010", "Dark Chocolate", "5000444"),
+    ])
+    return index
+
+def skus(results):
+    return [r["sku"] for r in results]
+
+def test_ranking_prefers_exact_codes_then_sku_prefix_then_name():
+    index = make_index()
+    assert skus(index.search("5000222")) == ["MLK-002"]
+    assert skus(index.search("mlk-00")) == ["MLK-001", "MLK-002"]
+    assert skus(index.search("milk")) == ["MLK-002", "MLK-001"]   # name prefix beats a later word
+    assert skus(index.search("choc bar")) == ["MLK-002"]
+    assert skus(index.search("choco")) == ["CHC-010", "MLK-002"]
+    assert index.search("   ") == [] and "terms" not in index.search("bread")[0]
+
+def test_upsert_reindexes_and_removes():
+    index = make_index()
+    index.upsert(["BRD-001", "CHC-010"], [row("BRD-001", "Sourdough Loaf", "5000333")])
+    assert index.search("wheat") == []
+    assert skus(index.search("sourd")) == ["BRD-001"]
+    assert skus(index.search("dark")) == [] and len(index) == 3
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.queries.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        sql, params = self.conn.queries[-1]
+        return [r for r in self.conn.rows if params is None or r["sku"] in params]
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+def test_writes_mark_dirty_and_refresh_reads_only_those(monkeypatch):
+    index = ProductSearchIndex()
+    monkeypatch.setattr(product_model, "product_search", index)
+    conn = FakeConnection([row("A-1", "Apple Juice"), row("B-1", "Banana")])
+    product_model.refresh_search_index(conn)
+    assert len(index) == 2 and conn.queries[-1][1] is None
+
+    conn.rows = [row("A-1", "Apple Cider")]         # A-1 renamed, B-1 deactivated
+    index.mark_dirty("A-1", "B-1")
+    product_model.refresh_search_index(conn)
+    assert conn.queries[-1][0].endswith("AND sku IN (%s, %s)")
+    assert skus(index.search("cider")) == ["A-1"] and index.search("banana") == []
+    product_model.refresh_search_index(conn)
+    assert len(conn.queries) == 2                   # nothing dirty, no query
+
+def test_fulltext_query_uses_boolean_prefix_terms():
+    sql, params = product_model.fulltext_search_params("choc_bar 5%", 10)
+    assert "MATCH(name, sku, barcode) AGAINST (%s IN BOOLEAN MODE)" in sql
+    assert params[3] == "+choc_bar* +5*" and params[2] == "choc\\_bar 5\\%%" and params[-1] == 10
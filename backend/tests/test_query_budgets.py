@@ -0,0 +1,94 @@
+"""Round-trip budgets per route. Each count includes the auth user lookup."""
+import pytest
+
+def test_get_products_budget(client, auth_headers_clerk, sample_product, query_budget):
+    with query_budget(2):
+        assert client.get("/products", headers=auth_headers_clerk).status_code == 200
+        assert client.get(f"/products/{sample_product}", headers=auth_headers_clerk).status_code == 200
+
+def test_create_product_budget(client, auth_headers_manager, query_budget):
+    # SKU check, barcode check, insert, re-fetch
+    with query_budget(5):
+        response = client.post("/products", headers=auth_headers_manager, json={
+            "sku": "BUDGET001",
+            "barcode": "555000111",
+            "name": "Budget Product",
+            "cost_price": 10.00,
+            "selling_price": 15.00
+        })
+    assert response.status_code == 201
+
+def test_update_product_budget(client, auth_headers_manager, sample_product, query_budget):
+    with query_budget(4):
+        response = client.put(f"/products/{sample_product}", headers=auth_headers_manager, json={
+            "name": "Budget Update"
+        })
+    assert response.status_code == 200
+
+def test_receive_stock_budget(client, auth_headers_manager, sample_product, query_budget):
+    # ApplyStockMovement validates, applies and returns the new quantity
+    with query_budget(2):
+        response = client.post("/inventory/receipt", headers=auth_headers_manager, json={
+            "product_sku": sample_product,
+            "quantity": 5,
+            "reference_id": "PO-BUDGET"
+        })
+    assert response.status_code == 201
+    assert response.json()["new_quantity"] == 105
+
+def test_adjust_stock_budget(client, auth_headers_manager, sample_product, query_budget):
+    with query_budget(2):
+        response = client.post("/inventory/adjust", headers=auth_headers_manager, json={
+            "product_sku": sample_product,
+            "movement_type": "damage",
+            "quantity": 5,
+            "reason": "Budget"
+        })
+    assert response.status_code == 201
+
+def test_create_sale_budget(client, auth_headers_clerk, sample_product, query_budget):
+    # Batched stock check, ProcessSale (returns the finished sale)
+    with query_budget(3):
+        response = client.post("/sales", headers=auth_headers_clerk, json={
+            "transaction_number": "BUDGET-SALE-1",
+            "transaction_date": "2026-02-14T10:00:00",
+            "items": [{"sku": sample_product, "quantity": 1, "unit_price": 75.00}]
+        })
+    assert response.status_code == 201
+
+def test_create_sale_budget_independent_of_basket_size(client, auth_headers_clerk, sample_product, query_budget):
+    with query_budget(3):
+        response = client.post("/sales", headers=auth_headers_clerk, json={
+            "transaction_number": "BUDGET-SALE-2",
+            "transaction_date": "2026-02-14T10:00:00",
+            "items": [{"sku": sample_product, "quantity": 1, "unit_price": 75.00}] * 12
+        })
+    assert response.status_code == 201
+    assert len(response.json()["items"]) == 12
+
+def test_list_transactions_budget(client, auth_headers_clerk, sample_product, query_budget):
+    for n in range(3):
+        client.post("/sales", headers=auth_headers_clerk, json={
+            "transaction_number": f"BUDGET-LIST-{n}",
+            "transaction_date": "2026-02-14T10:00:00",
+            "items": [{"sku": sample_product, "quantity": 1, "unit_price": 75.00}]
+        })
+    # Page of transactions, then all their line items in one query
+    with query_budget(3):
+        response = client.get("/sales/transactions", headers=auth_headers_clerk)
+    assert response.status_code == 200 and len(response.json()) == 3
+    with query_budget(2):
+        response = client.get("/sales/transactions?items=none", headers=auth_headers_clerk)
+    assert "items" not in response.json()[0]
+
+def test_dashboard_summary_budget(client, auth_headers_manager, sample_product, query_budget):
+    # Summary counts in one scan plus today's sales
+    with query_budget(3):
+        assert client.get("/dashboard/summary", headers=auth_headers_manager).status_code == 200
+
+def test_budget_overrun_fails(client, auth_headers_manager, sample_product, query_budget):
+    with pytest.raises(pytest.fail.Exception, match="ran 4 queries"):
+        with query_budget(3):
+            client.put(f"/products/{sample_product}", headers=auth_headers_manager, json={
+                "name": "Over Budget"
+            })
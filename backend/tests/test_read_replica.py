@@ -0,0 +1,81 @@
+import pytest
+from starlette.requests import Request
+
+from app.core import database
+
+class LagCursor:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return {"Seconds_Behind_Source": self.lag}
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    in_transaction = False
+    unread_result = False
+
+    def __init__(self, host, lag):
+        self.host = host
+        self.lag = lag
+
+    def cursor(self, dictionary=False):
+        return LagCursor(self.lag)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+def make_request(headers=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+@pytest.fixture
+def replica(monkeypatch):
+    state = {"lag": 0, "down": False}
+
+    def connect(**config):
+        if config["host"] == "replica" and state["down"]:
+            raise database.mysql.connector.errors.InterfaceError("replica unreachable")
+        return FakeConnection(config["host"], state["lag"])
+
+    monkeypatch.setattr(database.mysql.connector, "connect", connect)
+    monkeypatch.setattr(database.settings, "DB_REPLICA_HOST", "replica")
+    monkeypatch.setattr(database, "connection_pool", database.ConnectionPool("primary", {"host": "primary"}, size=2))
+    monkeypatch.setattr(database, "replica_pool", database.ConnectionPool("replica", {"host": "replica"}, size=2))
+    monkeypatch.setattr(database, "replica_monitor", database.ReplicaMonitor(max_lag=5, interval=0))
+    monkeypatch.setattr(database, "_recent_writes", {})
+    return state
+
+def read_host(request):
+    dependency = database.get_read_db(request)
+    conn = next(dependency)
+    dependency.close()
+    return conn.host
+
+def test_reads_go_to_healthy_replica(replica):
+    assert read_host(make_request()) == "replica"
+
+def test_lagging_or_down_replica_falls_back_to_primary(replica):
+    replica["lag"] = 30
+    assert read_host(make_request()) == "primary"
+    assert database.replica_monitor.lag_seconds == 30
+
+    database.replica_pool.close()
+    replica["lag"], replica["down"] = 0, True
+    assert read_host(make_request()) == "primary"
+    assert database.replica_monitor.stats()["fallbacks_to_primary"] == 2
+
+def test_read_your_writes_pins_caller_to_primary(replica):
+    writer = make_request({"Authorization": "Bearer writer"})
+    database.record_write(writer)
+    assert read_host(make_request({"Authorization": "Bearer writer"})) == "primary"
+    assert read_host(make_request({"Authorization": "Bearer someone-else"})) == "replica"
+    assert read_host(make_request({"X-Read-Consistency": "primary"})) == "primary"
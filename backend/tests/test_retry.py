@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from mysql.connector import errors
+
+from app.core import retry
+from app.core.retry import LockConflictError, retry_metrics, retry_transaction
+
+class FakeConnection:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+class FakeAsyncConnection(FakeConnection):
+    async def rollback(self):
+        self.rollbacks += 1
+
+def deadlock():
+    return errors.InternalError(msg="Deadlock found when trying to get lock", errno=1213)
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(retry.settings, "DB_RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(retry.settings, "DB_RETRY_BUDGET_MS", 1000)
+    monkeypatch.setattr(retry.settings, "DB_RETRY_BASE_BACKOFF_MS", 1)
+    monkeypatch.setattr(retry.settings, "DB_RETRY_MAX_BACKOFF_MS", 2)
+
+def test_lock_conflict_is_rolled_back_and_retried():
+    calls = []
+
+    @retry_transaction("test_recovers")
+    def write(conn, value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise deadlock() if len(calls) == 1 else errors.DatabaseError(msg="Lock wait timeout", errno=1205)
+        return value * 2
+
+    conn = FakeConnection()
+    assert write(conn, 21) == 42
+    assert calls == [21, 21, 21] and conn.rollbacks == 2
+    assert retry_metrics.snapshot()["test_recovers"] == {
+        "deadlocks": 1, "lock_wait_timeouts": 1, "retries": 2, "recovered": 1, "gave_up": 0,
+    }
+
+def test_gives_up_after_max_attempts():
+    @retry_transaction("test_gives_up")
+    def write(conn):
+        raise deadlock()
+
+    with pytest.raises(LockConflictError) as raised:
+        write(FakeConnection())
+    assert raised.value.attempts == 3
+    assert retry_metrics.snapshot()["test_gives_up"]["gave_up"] == 1
+
+def test_gives_up_when_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(retry.settings, "DB_RETRY_BUDGET_MS", 0)
+
+    @retry_transaction("test_budget")
+    def write(conn):
+        raise deadlock()
+
+    with pytest.raises(LockConflictError) as raised:
+        write(FakeConnection())
+    assert raised.value.attempts == 1
+
+def test_other_errors_are_not_retried():
+    @retry_transaction("test_other")
+    def write(conn):
+        raise errors.IntegrityError(msg="Duplicate entry", errno=1062)
+
+    conn = FakeConnection()
+    with pytest.raises(errors.IntegrityError):
+        write(conn)
+    assert conn.rollbacks == 0
+
+def test_async_functions_are_retried():
+    calls = []
+
+    @retry_transaction("test_async")
+    async def write(conn):
+        calls.append(1)
+        if len(calls) == 1:
+            raise Exception(1213, "Deadlock found when trying to get lock")   # PyMySQL style
+        return "done"
+
+    conn = FakeAsyncConnection()
+    assert asyncio.run(write(conn)) == "done"
+    assert conn.rollbacks == 1
+    assert retry_metrics.snapshot()["test_async"]["recovered"] == 1
+
+def test_backoff_is_jittered_under_a_cap(monkeypatch):
+    monkeypatch.setattr(retry.settings, "DB_RETRY_BASE_BACKOFF_MS", 20)
+    monkeypatch.setattr(retry.settings, "DB_RETRY_MAX_BACKOFF_MS", 50)
+    assert all(0 <= retry.backoff_delay(1) <= 0.02 for _ in range(100))
+    assert all(0 <= retry.backoff_delay(5) <= 0.05 for _ in range(100))
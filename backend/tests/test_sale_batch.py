@@ -0,0 +1,90 @@
+import pytest
+from mysql.connector import errors
+
+from app.core import retry
+from app.models import sale as sale_model
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query.split()[0] if query.startswith(("SAVEPOINT", "ROLLBACK", "CALL")) else query)
+        if query.startswith("CALL"):
+            number = params[0]
+            if number in self.conn.fail:
+                raise self.conn.fail[number]
+            self.conn.recorded[number] = len(self.conn.recorded) + 100
+        elif query.startswith(sale_model.EXISTING_SALES_SELECT):
+            self.rows = [{"transaction_number": n, "id": i} for n, i in self.conn.recorded.items() if n in params]
+        elif query.startswith(sale_model.SALE_STOCK_SELECT):
+            self.rows = [{"sku": sku, "is_active": sku != "OLD", "quantity_in_stock": 10}
+                         for sku in params if sku != "GONE"]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, recorded=None, fail=None):
+        self.recorded = dict(recorded or {})
+        self.fail = fail or {}
+        self.statements = []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+def sale(number, sku="A", quantity=1):
+    return {"transaction_number": number, "transaction_date": "2026-02-14",
+            "items": [{"sku": sku, "quantity": quantity, "unit_price": 2.5}]}
+
+def test_outcomes_per_sale_without_aborting_the_chunk():
+    stock_error = errors.DatabaseError(msg="Insufficient stock for this product", errno=1644)
+    conn = FakeConnection(recorded={"S-1": 7}, fail={"S-3": stock_error})
+    sales = [sale("S-1"), sale("S-2"), sale("S-3"), sale("S-4", sku="OLD"), sale("S-5", sku="GONE"), sale("S-2")]
+    result = sale_model.process_sale_batch(conn, sales, user_id=1, chunk_size=50)
+    assert [(r["status"], r["transaction_id"]) for r in result["results"]] == [
+        ("duplicate", 7), ("created", 101), ("rejected", None), ("rejected", None), ("rejected", None), ("duplicate", 101)]
+    assert result["results"][2]["detail"] == "Insufficient stock for this product"
+    assert (result["created"], result["duplicates"], result["rejected"], result["failed"]) == (1, 2, 3, 0)
+    assert conn.statements.count("ROLLBACK") == 1 and conn.commits == 1
+
+def test_unexpected_error_fails_the_chunk_and_the_rest():
+    lost = errors.OperationalError(msg="Lost connection", errno=2013)
+    conn = FakeConnection(fail={"S-3": lost})
+    sales = [sale(f"S-{n}") for n in range(1, 6)]
+    result = sale_model.process_sale_batch(conn, sales, user_id=1, chunk_size=2)
+    assert [r["status"] for r in result["results"]] == ["created", "created", "failed", "failed", "failed"]
+    assert conn.commits == 1 and conn.rollbacks == 1
+
+def test_error_code_from_pymysql_style_exception():
+    assert sale_model.mysql_error_code(Exception(1062, "Duplicate entry")) == 1062
+    with pytest.raises(RuntimeError):
+        sale_model.failed_sale_outcome(sale("S-1"), RuntimeError("boom"))
+
+def test_deadlocked_chunk_is_retried_whole(monkeypatch):
+    monkeypatch.setattr(retry.settings, "DB_RETRY_BASE_BACKOFF_MS", 1)
+
+    class DeadlockOnce(FakeConnection):
+        def rollback(self):
+            super().rollback()
+            self.recorded = {}    # the deadlock rolled the chunk back
+            self.fail = {}
+
+    deadlock = errors.InternalError(msg="Deadlock found when trying to get lock", errno=1213)
+    conn = DeadlockOnce(fail={"S-2": deadlock})
+    result = sale_model.process_sale_batch(conn, [sale("S-1"), sale("S-2")], user_id=1, chunk_size=50)
+    assert [r["status"] for r in result["results"]] == ["created", "created"]
+    assert conn.rollbacks == 1 and conn.commits == 1
+    # No ROLLBACK TO SAVEPOINT for the lost transaction
+    assert conn.statements.count("ROLLBACK") == 0
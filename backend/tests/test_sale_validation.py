@@ -0,0 +1,20 @@
+from app.models.sale import sale_item_problem
+
+STOCK = {
+    "A": {"sku": "A", "is_active": 1, "quantity_in_stock": 5},
+    "B": {"sku": "B", "is_active": 0, "quantity_in_stock": 50},
+}
+
+def test_valid_basket():
+    assert sale_item_problem(STOCK, [{"sku": "A", "quantity": 5}]) is None
+
+def test_missing_and_inactive_products():
+    assert sale_item_problem(STOCK, [{"sku": "A", "quantity": 1}, {"sku": "Z", "quantity": 1}]) == (
+        404, "Product with SKU 'Z' not found")
+    status, detail = sale_item_problem(STOCK, [{"sku": "B", "quantity": 1}])
+    assert status == 400 and "inactive" in detail
+
+def test_repeated_lines_are_checked_against_total_quantity():
+    status, detail = sale_item_problem(STOCK, [{"sku": "A", "quantity": 3}, {"sku": "A", "quantity": 3}])
+    assert status == 400
+    assert detail == "Insufficient stock for product 'A': 5 available, 6 requested"
@@ -22,4 +22,35 @@ def test_create_sale_insufficient_stock(client, auth_headers_clerk, sample_produ
         ]
     })
     assert response.status_code == 400
-    assert "Insufficient stock" in response.json()["detail"]
\ No newline at end of file
+    assert "Insufficient stock" in response.json()["detail"]
+
+
+def test_sales_batch_replay_is_idempotent(client, auth_headers_clerk, sample_product):
+    batch = {"sales": [
+        {"transaction_number": "OFFLINE-1", "transaction_date": "2026-02-14T10:00:00",
+         "items": [{"sku": sample_product, "quantity": 2, "unit_price": 75.00}]},
+        {"transaction_number": "OFFLINE-2", "transaction_date": "2026-02-14T10:05:00",
+         "items": [{"sku": sample_product, "quantity": 500, "unit_price": 75.00}]},
+    ]}
+    first = client.post("/sales/batch", headers=auth_headers_clerk, json=batch).json()
+    assert [r["status"] for r in first["results"]] == ["created", "rejected"]
+    assert "Insufficient stock" in first["results"][1]["detail"]
+
+    replay = client.post("/sales/batch", headers=auth_headers_clerk, json=batch).json()
+    assert replay["results"][0] == {**first["results"][0], "status": "duplicate"}
+    assert replay["created"] == 0
+
+
+def test_daily_summary_from_rollup(client, auth_headers_clerk, sample_product):
+    client.post("/sales", headers=auth_headers_clerk, json={
+        "transaction_number": "ROLLUP-1",
+        "transaction_date": "2026-02-15T10:00:00",
+        "items": [
+            {"sku": sample_product, "quantity": 2, "unit_price": 75.00},
+            {"sku": sample_product, "quantity": 1, "unit_price": 75.00}
+        ]
+    })
+    summary = client.get("/sales/summary/daily?transaction_date=2026-02-15", headers=auth_headers_clerk).json()
+    assert summary["total_transactions"] == 1
+    assert summary["total_items_sold"] == 3
+    assert float(summary["total_revenue"]) == 225.00   # counted once, not once per line
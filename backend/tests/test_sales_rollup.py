@@ -0,0 +1,51 @@
+from datetime import date
+import pytest
+
+from app.models import sale as sale_model
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        if query == self.conn.fail_on:
+            raise RuntimeError("lock wait timeout")
+        self.conn.statements.append((query, params))
+        self.rowcount = 3 if query.lstrip().startswith("INSERT") else 0
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.statements = []
+        self.committed = self.rolled_back = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+def test_rebuild_replaces_both_rollups_for_the_range():
+    conn = FakeConnection()
+    span = (date(2026, 1, 1), date(2026, 1, 7))
+    assert sale_model.rebuild_sales_rollups(conn, *span) == 6
+    assert conn.statements == [
+        (sale_model.DAILY_ROLLUP_DELETE, span),
+        (sale_model.DAILY_ROLLUP_INSERT, span * 2),
+        (sale_model.SKU_ROLLUP_DELETE, span),
+        (sale_model.SKU_ROLLUP_INSERT, span),
+    ]
+    assert conn.committed
+
+def test_failed_rebuild_leaves_the_old_rollup():
+    conn = FakeConnection(fail_on=sale_model.SKU_ROLLUP_INSERT)
+    with pytest.raises(RuntimeError):
+        sale_model.rebuild_sales_rollups(conn, date(2026, 1, 1), date(2026, 1, 7))
+    assert conn.rolled_back and not conn.committed
@@ -0,0 +1,75 @@
+import pytest
+from mysql.connector import errors
+
+from app.models import stock_movement
+from app.models.stock_movement import StockMovementRejected, apply_stock_movement
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def callproc(self, name, args):
+        self.conn.calls.append((name, args))
+        if self.conn.error is not None:
+            raise self.conn.error
+
+    def stored_results(self):
+        return [FakeResult(self.conn.rows)]
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, error=None, rows=((41, 95),)):
+        self.error = error
+        self.rows = list(rows)
+        self.calls = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+def signal(message):
+    return errors.DatabaseError(msg=message, errno=1644, sqlstate="45000")
+
+def test_one_call_returns_movement_and_new_quantity(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(stock_movement.product_cache, "invalidate", invalidated.append)
+    conn = FakeConnection()
+    movement = apply_stock_movement(conn, "SKU-1", "damage", 5, None, "Broken", 3)
+    assert movement == {"movement_id": 41, "new_quantity": 95}
+    assert conn.calls == [("ApplyStockMovement", ("SKU-1", "damage", 5, None, "Broken", 3))]
+    assert conn.commits == 1 and invalidated == ["SKU-1"]
+
+@pytest.mark.parametrize("message, status_code", [
+    ("Product not found", 404),
+    ("Insufficient stock. Available: 4, tried to remove: 5", 400),
+    ("Stock is held in escrow for sales; release it first", 400),
+])
+def test_signals_become_rejections(message, status_code):
+    conn = FakeConnection(signal(message))
+    with pytest.raises(StockMovementRejected) as raised:
+        apply_stock_movement(conn, "SKU-1", "damage", 5, None, None, 3)
+    assert str(raised.value) == message and raised.value.status_code == status_code
+    assert conn.commits == 0
+
+def test_other_errors_pass_through():
+    conn = FakeConnection(errors.InternalError(msg="Deadlock found when trying to get lock", errno=1213))
+    with pytest.raises(errors.InternalError):
+        apply_stock_movement(conn, "SKU-1", "receipt", 5, None, None, 3)
+
+def test_missing_result_is_reported():
+    conn = FakeConnection(rows=())
+    with pytest.raises(RuntimeError, match="ApplyStockMovement returned no result"):
+        apply_stock_movement(conn, "SKU-1", "receipt", 5, None, None, 3)
+    assert conn.commits == 0
@@ -0,0 +1,38 @@
+import asyncio
+
+from app.core.streaming import CSV, NDJSON, detect_format, iter_records
+
+async def chunked(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def parse(fmt, data):
+    async def collect():
+        return [r async for r in iter_records(fmt, chunked(data))]
+    return asyncio.run(collect())
+
+def test_csv_rows_split_across_chunks():
+    data = (
+        '﻿sku,name,barcode,selling_price\r\n'
+        'A-1,"Milk, 1L",111,2.50\r\n'
+        '\r\n'
+        'A-2,"Bread ""sliced""\nwhite",,1.20\r\n'
+        'A-3,Eggs,333,3,extra\n'
+    ).encode()
+    rows = parse(CSV, data)
+    assert rows[0] == (1, {"sku": "A-1", "name": "Milk, 1L", "barcode": "111", "selling_price": "2.50"}, None)
+    assert rows[1] == (2, {"sku": "A-2", "name": 'Bread "sliced"\nwhite', "selling_price": "1.20"}, None)
+    assert rows[2] == (3, None, "Expected 4 columns, got 5")
+
+def test_ndjson_reports_bad_lines_and_continues():
+    data = '{"sku": "A-1"}\nnot json\n\n[1, 2]\n{"sku": "Ä-2"}'.encode()
+    rows = parse(NDJSON, data)
+    assert [r[0] for r in rows] == [1, 2, 3, 4]
+    assert rows[1][2].startswith("Invalid JSON") and rows[2][2] == "Expected a JSON object"
+    assert rows[3][1] == {"sku": "Ä-2"}
+
+def test_format_detection():
+    assert detect_format("text/csv; charset=utf-8") == CSV
+    assert detect_format("application/x-ndjson") == NDJSON
+    assert detect_format("application/json") is None
+    assert detect_format("application/json", "ndjson") == NDJSON
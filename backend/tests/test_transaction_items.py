@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from app.models import sale as sale_model
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.queries.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return self.conn.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+def page():
+    return [{"id": 7}, {"id": 5}, {"id": 3}]
+
+def test_full_items_for_a_page_in_one_query():
+    conn = FakeConnection([
+        {"transaction_id": 5, "id": 1, "product_sku": "A"},
+        {"transaction_id": 7, "id": 2, "product_sku": "B"},
+        {"transaction_id": 5, "id": 3, "product_sku": "C"},
+    ])
+    transactions = sale_model.load_transaction_items(conn, page())
+    assert len(conn.queries) == 1
+    query, params = conn.queries[0]
+    assert "WHERE sli.transaction_id IN (%s, %s, %s)" in query and params == (7, 5, 3)
+    assert [[i["product_sku"] for i in t["items"]] for t in transactions] == [["B"], ["A", "C"], []]
+
+def test_counts_only():
+    conn = FakeConnection([{"transaction_id": 7, "item_count": 2, "total_quantity": Decimal("5")}])
+    transactions = sale_model.load_transaction_items(conn, page(), sale_model.ITEMS_COUNT)
+    assert "GROUP BY transaction_id" in conn.queries[0][0]
+    assert [(t["item_count"], t["total_quantity"]) for t in transactions] == [(2, 5), (0, 0), (0, 0)]
+    assert "items" not in transactions[0]
+
+def test_no_query_without_items_or_transactions():
+    conn = FakeConnection([])
+    assert sale_model.load_transaction_items(conn, page(), sale_model.ITEMS_NONE) == page()
+    assert sale_model.load_transaction_items(conn, []) == []
+    assert conn.queries == []
@@ -0,0 +1,123 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from mysql.connector import errors
+
+from app.core import database, retry
+from app.core.retry import LockConflictError, retry_transaction
+from app.core.unit_of_work import UnitOfWork, UnitOfWorkRoute, commit_now, on_commit
+
+class FakeConnection:
+    def __init__(self, fail_commit=False):
+        self.log = []
+        self.fail_commit = fail_commit
+        self.in_transaction = False
+        self.unread_result = False
+
+    def execute(self, statement):
+        self.log.append(statement)
+        self.in_transaction = True
+
+    def commit(self):
+        if self.fail_commit:
+            raise errors.OperationalError(msg="Lost connection to MySQL server during query")
+        self.log.append("COMMIT")
+        self.in_transaction = False
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+        self.in_transaction = False
+
+class FakePool:
+    def __init__(self):
+        self.connections = []
+        self.fail_commit = False
+
+    def get_connection(self):
+        conn = FakeConnection(self.fail_commit)
+        self.connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.log.append("RELEASE")
+
+def write(conn, statement):
+    """A model function: runs a statement and commits."""
+    conn.execute(statement)
+    conn.commit()
+    on_commit(conn, invalidated.append, statement)
+
+pool = FakePool()
+invalidated = []
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+@router.post("/two-writes")
+def two_writes(conn = Depends(database.get_db)):
+    write(conn, "INSERT a")
+    write(conn, "INSERT b")
+    assert invalidated == []    # not committed yet
+    return {"ok": True}
+
+@router.post("/fails")
+def fails(conn = Depends(database.get_db)):
+    write(conn, "INSERT a")
+    raise HTTPException(status_code=400, detail="Invalid")
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app, raise_server_exceptions=False)
+
+@pytest.fixture(autouse=True)
+def fake_pool(monkeypatch):
+    monkeypatch.setattr(database, "get_pool", lambda: pool)
+    pool.connections.clear()
+    pool.fail_commit = False
+    invalidated.clear()
+
+def test_request_commits_once_then_runs_callbacks():
+    assert client.post("/two-writes").status_code == 200
+    assert pool.connections[0].log == ["INSERT a", "INSERT b", "COMMIT", "RELEASE"]
+    assert invalidated == ["INSERT a", "INSERT b"]
+
+def test_error_rolls_back_and_drops_callbacks():
+    assert client.post("/fails").status_code == 400
+    assert pool.connections[0].log == ["INSERT a", "ROLLBACK", "RELEASE"]
+    assert invalidated == []
+
+def test_failed_commit_fails_the_request():
+    pool.fail_commit = True
+    assert client.post("/two-writes").status_code == 500
+    assert "COMMIT" not in pool.connections[0].log and invalidated == []
+
+def test_commit_now_and_plain_connections():
+    conn = FakeConnection()
+    unit = UnitOfWork(conn)
+    write(unit, "INSERT claim")
+    commit_now(unit)
+    assert conn.log == ["INSERT claim", "COMMIT"] and invalidated == ["INSERT claim"]
+    # Nothing pending: a callback registered now runs straight away
+    on_commit(unit, invalidated.append, "later")
+    assert invalidated[-1] == "later"
+
+    plain = FakeConnection()
+    write(plain, "INSERT c")
+    assert plain.log == ["INSERT c", "COMMIT"] and invalidated[-1] == "INSERT c"
+
+def test_lock_conflict_after_earlier_writes_is_not_retried(monkeypatch):
+    monkeypatch.setattr(retry.settings, "DB_RETRY_MAX_ATTEMPTS", 3)
+    calls = []
+
+    @retry_transaction("test_joined")
+    def conflicting(conn):
+        calls.append(1)
+        raise errors.InternalError(msg="Deadlock found when trying to get lock", errno=1213)
+
+    conn = FakeConnection()
+    unit = UnitOfWork(conn)
+    write(unit, "INSERT a")
+    with pytest.raises(LockConflictError) as raised:
+        conflicting(unit)
+    assert raised.value.attempts == 1 and calls == [1]
+    assert conn.log == ["INSERT a", "ROLLBACK"]